@@ -1,10 +1,31 @@
 import sys
+
+if __name__ == '__main__' and '--profile-startup' in sys.argv:
+    # 必須在其他 import 之前開始記錄，才能量到所有模組的載入時間
+    import startup_profile
+    startup_profile.install()
+
 import os
-import pandas as pd
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
-from werkzeug.utils import secure_filename
-from waitress import serve
+import uuid
+import datetime
+import functools
+import importlib
+import math
+import multiprocessing
+import threading
+from urllib.parse import quote
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file, abort
+from werkzeug.utils import secure_filename, safe_join
+from waitress.server import create_server
 import database as db
+from jobs import jobs, JobQueueFull
+import thumbnails
+import archive
+import backup
+import events
+import http_cache
+import metrics
+from photo_index import PhotoIndex, initials_avatar_svg
 
 # --- 應用程式設定 ---
 # 判斷資源路徑 (適用於打包成 .exe)
@@ -25,6 +46,65 @@ if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# 設定照片與縮圖快取資料夾 (快取需可寫入，因此放在工作目錄而非打包資源路徑)
+app.config['PHOTO_FOLDER'] = os.path.join(static_folder, 'photos')
+app.config['THUMBNAIL_FOLDER'] = os.path.abspath('thumbnail_cache')
+# 資料庫備份資料夾 (定時備份，保留最新的 backup.KEEP_BACKUPS 份)
+app.config['BACKUP_FOLDER'] = os.path.abspath(backup.BACKUP_FOLDER)
+# 學期封存資料夾 (每個學期一個唯讀的資料庫檔案)
+app.config['ARCHIVE_FOLDER'] = os.path.abspath(archive.ARCHIVE_FOLDER)
+
+# 效能統計：路由、資料庫函式、樣板繪製與照片處理的耗時 (於 /metrics 提供)
+metrics.init_app(app)
+metrics.instrument_database(db)
+metrics.instrument(thumbnails, ['get_thumbnail', 'photo_version'], 'photo')
+metrics.instrument(PhotoIndex, ['rebuild'], 'photo')
+
+# 靜態檔指紋網址、API 的 ETag 與回應壓縮
+http_cache.init_app(app)
+
+# 即時更新推播 (獨立連接埠，於啟動伺服器時開始監聽) 以 session cookie 驗證登入
+app.config['EVENTS_PORT'] = events.EVENTS_PORT
+events.broadcaster.authenticate = events.flask_session_checker(app)
+
+# 啟動時建立學號 → 照片檔名索引，資料夾變動時會自動更新
+photo_index = PhotoIndex(app.config['PHOTO_FOLDER'])
+
+# 會載入 pandas / openpyxl 的模組在第一次使用時才 import (名單匯入、報表匯出、成績摘要)，
+# 伺服器開始監聽後再由背景執行緒預先載入，啟動時不需等待
+LAZY_MODULES = ('student_import', 'report_export', 'summary_cache')
+
+
+def warm_up_imports():
+    """ 預先載入延遲 import 的模組 """
+    for name in LAZY_MODULES:
+        importlib.import_module(name)
+
+
+def start_warm_up():
+    """ 在背景執行緒預先載入延遲 import 的模組 """
+    thread = threading.Thread(target=warm_up_imports, name='warm-up-imports', daemon=True)
+    thread.start()
+    return thread
+
+
+# --- 樣板輔助函式 ---
+
+@app.template_global()
+def photo_thumbnail_url(filename, size):
+    """ 產生學生照片縮圖的網址；網址含版本參數，照片更新後瀏覽器會重新下載 """
+    source_path = safe_join(app.config['PHOTO_FOLDER'], filename)
+    version = thumbnails.photo_version(source_path) if source_path and os.path.isfile(source_path) else None
+    return url_for('photo_thumbnail', size=size, filename=filename, v=version)
+
+@app.template_global()
+def student_photo_url(student, size):
+    """ 學生照片縮圖網址；沒有照片時改用本機產生的姓名頭像 """
+    filename = photo_index.lookup(student['student_id'], student['name'])
+    if filename:
+        return photo_thumbnail_url(filename, size)
+    return url_for('student_avatar', name=student['name'])
+
 
 # --- 路由 (Routes) ---
 
@@ -32,9 +112,17 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 def require_login():
     """ 檢查使用者是否已登入 """
     allowed_routes = ['login', 'static']
+    if request.endpoint == 'metrics_endpoint' and request.remote_addr in ('127.0.0.1', '::1'):
+        # 本機的監控程式 (例如 Prometheus) 不需登入即可讀取效能統計
+        return None
     if 'logged_in' not in session and request.endpoint not in allowed_routes:
         return redirect(url_for('login'))
 
+@app.teardown_request
+def release_db_transaction(exc):
+    """ 請求結束時確保該執行緒的連線沒有殘留未結束的交易 """
+    db.reset_transaction()
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     """ 登入頁面 """
@@ -61,6 +149,13 @@ def index():
     classes = db.get_all_classes()
     return render_template('index.html', classes=classes)
 
+def _seat_unseated_students(class_name, rows, cols):
+    """ 取得班級學生；學生還沒有被排過座位時 (例如剛切換佈局)，交給寫入執行緒依學號順序排入座位 """
+    students = db.get_all_students_for_class(class_name)
+    if students and students[0]['seat_row'] is None:
+        students = db.assign_initial_seats(class_name, rows, cols)
+    return students
+
 @app.route('/class/<class_name>')
 def class_dashboard(class_name):
     """ 班級主控台 """
@@ -68,27 +163,7 @@ def class_dashboard(class_name):
     layout = settings['seating_layout']
     rows, cols = map(int, layout.split('x'))
 
-    students = db.get_all_students_for_class(class_name)
-    
-    # 如果學生還沒有被排過座位，就進行初始排列
-    if students and students[0]['seat_row'] is None:
-        all_seats = []
-        for r in range(rows):
-            for c in range(cols):
-                all_seats.append((r, c))
-        
-        assignments = []
-        num_students_to_seat = min(len(students), len(all_seats))
-        for i in range(num_students_to_seat):
-            student = students[i]
-            seat = all_seats[i]
-            assignments.append((seat[0], seat[1], student['id']))
-        
-        if assignments:
-            db.batch_update_seat_positions(assignments)
-        
-        # 重新獲取學生資料以包含座位資訊
-        students = db.get_all_students_for_class(class_name)
+    students = _seat_unseated_students(class_name, rows, cols)
 
     # 建立一個二維陣列來代表座位表
     seating_grid = [[None for _ in range(cols)] for _ in range(rows)]
@@ -106,7 +181,8 @@ def class_dashboard(class_name):
         grade_items=grade_items,
         seating_grid=seating_grid,
         layout=layout,
-        students=students
+        students=students,
+        events_port=app.config['EVENTS_PORT'] if events.broadcaster.running else None
     )
 
 @app.route('/settings', methods=['GET', 'POST'])
@@ -125,34 +201,215 @@ def settings():
         
         # 處理檔案上傳
         if 'student_file' in request.files:
+            import student_import
             file = request.files['student_file']
             if file and file.filename != '':
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+                extension = os.path.splitext(file.filename)[1].lower()
+                if extension not in student_import.ALLOWED_EXTENSIONS:
+                    flash('僅支援 Excel (.xlsx) 或 CSV (.csv) 檔案！', 'danger')
+                    return redirect(url_for('settings'))
+
+                # secure_filename 會移除中文字，因此以隨機編號命名暫存檔，保留副檔名
+                filepath = os.path.join(app.config['UPLOAD_FOLDER'], uuid.uuid4().hex + extension)
                 file.save(filepath)
-                
-                # 處理匯入邏輯
+
+                # 匯入在背景工作執行 (結束後刪除暫存檔)，頁面以工作編號查詢進度與結果
+                # 仍有未封存的成績或點名紀錄時，除非勾選「不封存，直接清除」，匯入會被拒絕
                 try:
-                    df = pd.read_excel(filepath)
-                    # 假設 Excel 有 '學號', '姓名', '班級', '帳號' 四個欄位
-                    required_columns = ['學號', '姓名', '班級', '帳號']
-                    if all(col in df.columns for col in required_columns):
-                        db.clear_students_data() # 清空舊資料
-                        for index, row in df.iterrows():
-                            db.add_student(str(row['學號']), row['姓名'], row['班級'], str(row.get('帳號', '')))
-                        flash('學生資料匯入成功！', 'success')
-                    else:
-                        flash(f'Excel 檔案缺少必要的欄位 ({", ".join(required_columns)})！', 'danger')
-                except Exception as e:
-                    flash(f'處理檔案時發生錯誤: {e}', 'danger')
+                    job = jobs.submit('import', student_import.run_import_job, filepath,
+                                      discard_unarchived=request.form.get('discard_unarchived') == '1',
+                                      cleanup=functools.partial(os.remove, filepath))
+                except JobQueueFull as e:
+                    os.remove(filepath)
+                    flash(str(e), 'danger')
+                    return redirect(url_for('settings'))
+                return redirect(url_for('settings', job=job.id))
         
         return redirect(url_for('settings'))
 
     return render_template('settings.html')
 
 
+def _export_params(report, fmt):
+    """ 檢查報表種類、格式與查詢參數，回傳 (班級, 開始日期, 結束日期) """
+    import report_export
+    if report not in report_export.REPORT_TITLES or fmt not in report_export.MIMETYPES:
+        abort(404)
+    class_name = request.args.get('class_name') or None
+    start, end = request.args.get('start') or None, request.args.get('end') or None
+    try:
+        for value in (start, end):
+            if value:
+                datetime.date.fromisoformat(value)
+    except ValueError:
+        abort(400)
+    return class_name, start, end
+
+
+def _attachment(response, ascii_name, download_name):
+    """ 設定下載檔名；中文檔名需以 RFC 5987 編碼，另附 ASCII 檔名給舊瀏覽器 """
+    response.headers['Content-Disposition'] = (
+        f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(download_name)}")
+    return response
+
+
+@app.route('/reports/export/<report>.<fmt>')
+def export_report(report, fmt):
+    """
+    匯出報表 (串流下載).
+    report: grades (成績單) 或 attendance (出缺席統計)；fmt: xlsx 或 csv。
+    查詢參數 class_name 指定班級，未指定時匯出全校；出缺席統計可另外指定 start / end 日期。
+    較大的 Excel 報表建議改用 /api/jobs/export 在背景產生。
+    """
+    import report_export
+    class_name, start, end = _export_params(report, fmt)
+    rows = report_export.report_rows(report, class_name, start, end)
+    title = report_export.REPORT_TITLES[report]
+
+    download_name = f'{class_name or "全校"}_{title}.{fmt}'
+    if fmt == 'csv':
+        response = app.response_class(report_export.stream_csv(rows), mimetype=report_export.MIMETYPES[fmt])
+    else:
+        path = report_export.write_xlsx(rows, title)
+        response = app.response_class(report_export.stream_file(path), mimetype=report_export.MIMETYPES[fmt])
+        response.content_length = os.path.getsize(path)
+    return _attachment(response, f'{report}.{fmt}', download_name)
+
+@app.route('/photos/thumb/<int:size>/<path:filename>')
+def photo_thumbnail(size, filename):
+    """ 學生照片縮圖 (首次要求時產生並快取) """
+    source_path = safe_join(app.config['PHOTO_FOLDER'], filename)
+    if size not in thumbnails.THUMBNAIL_SIZES or not source_path or not os.path.isfile(source_path):
+        abort(404)
+
+    fmt = 'webp' if request.accept_mimetypes['image/webp'] else 'jpeg'
+    path, etag = thumbnails.get_thumbnail(source_path, size, app.config['THUMBNAIL_FOLDER'], fmt)
+    response = send_file(path, etag=etag, conditional=True, max_age=31536000)
+    if request.args.get('v'):
+        # 網址帶有版本參數時內容永遠不會改變
+        response.cache_control.immutable = True
+    response.vary.add('Accept')
+    return response
+
+
+@app.route('/photos/avatar/<name>.svg')
+def student_avatar(name):
+    """ 沒有照片的學生所使用的姓名頭像 """
+    response = app.response_class(initials_avatar_svg(name), mimetype='image/svg+xml')
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """ Prometheus 格式的效能統計 """
+    return app.response_class(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
 # --- API 路由 (用於 JavaScript 互動) ---
 
+def _submit_job(kind, func, *args):
+    """ 送出背景工作並回傳 202 與工作狀態；排隊的工作太多時回傳 503 """
+    try:
+        job = jobs.submit(kind, func, *args)
+    except JobQueueFull as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 503
+    return jsonify(job.to_dict()), 202, {'Location': url_for('api_job', job_id=job.id)}
+
+@app.route('/api/jobs', methods=['GET'])
+def api_jobs():
+    """ API: 列出背景工作 (可用 kind 參數篩選) """
+    return jsonify({'jobs': jobs.list(request.args.get('kind'))})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job(job_id):
+    """ API: 查詢背景工作的狀態、進度與結果 """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': '找不到此工作'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def api_cancel_job(job_id):
+    """ API: 要求取消背景工作 (執行中的工作會在下一個檢查點停止) """
+    if not jobs.cancel(job_id):
+        return jsonify({'status': 'error', 'message': '工作不存在或已結束'}), 409
+    return jsonify(jobs.get(job_id).to_dict())
+
+@app.route('/api/jobs/<job_id>/download', methods=['GET'])
+def api_job_download(job_id):
+    """ API: 下載背景工作產生的檔案 (例如匯出的報表) """
+    job = jobs.get(job_id)
+    if job is None or job.status != 'done' or job.file is None:
+        abort(404)
+    path, download_name, mimetype = job.file
+    response = send_file(path, mimetype=mimetype, conditional=True)
+    return _attachment(response, f'{job.kind}{os.path.splitext(path)[1]}', download_name)
+
+@app.route('/api/jobs/export/<report>.<fmt>', methods=['POST'])
+def api_export_job(report, fmt):
+    """ API: 在背景產生報表 (參數與 /reports/export 相同)，完成後由工作的下載網址取得 """
+    import report_export
+    class_name, start, end = _export_params(report, fmt)
+    return _submit_job('export', report_export.run_export_job, report, fmt, class_name, start, end)
+
+@app.route('/api/jobs/thumbnails', methods=['POST'])
+def api_thumbnail_job():
+    """ API: 在背景批次產生所有照片的縮圖 """
+    return _submit_job('thumbnails', thumbnails.run_prewarm_job,
+                       app.config['PHOTO_FOLDER'], app.config['THUMBNAIL_FOLDER'])
+
+@app.route('/api/jobs/backup', methods=['POST'])
+def api_backup_job():
+    """ API: 立即在背景備份資料庫 (不影響其他請求) """
+    return _submit_job('backup', backup.run_backup_job, app.config['BACKUP_FOLDER'])
+
+@app.route('/api/backups', methods=['GET'])
+def api_backups():
+    """ API: 列出資料庫備份 (新的在前) """
+    backups = backup.list_backups(app.config['BACKUP_FOLDER'])
+    return jsonify({'backups': [{k: v for k, v in b.items() if k != 'path'} for b in backups]})
+
+@app.route('/api/jobs/archive', methods=['POST'])
+def api_archive_job():
+    """ API: 在背景封存本學期的成績與點名紀錄 (學期名稱例如 114-1)，完成後目前的資料庫只保留名單與設定 """
+    data = request.get_json(silent=True) or request.form
+    label = (data.get('label') or '').strip()
+    try:
+        archive.check_label(label)
+    except archive.ArchiveError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    if os.path.exists(archive.archive_path(label, app.config['ARCHIVE_FOLDER'])):
+        return jsonify({'status': 'error', 'message': f'學期 {label} 已經封存過'}), 409
+    return _submit_job('archive', archive.run_archive_job, label, app.config['ARCHIVE_FOLDER'])
+
+@app.route('/api/archives', methods=['GET'])
+def api_archives():
+    """ API: 列出已封存的學期 (舊的在前) """
+    archives = archive.list_archives(app.config['ARCHIVE_FOLDER'])
+    return jsonify({'archives': [{k: v for k, v in a.items() if k != 'path'} for a in archives]})
+
+@app.route('/api/students/<student_id>/trend', methods=['GET'])
+def api_student_trend(student_id):
+    """ API: 學生 (學號) 跨學期的成績平均與出缺席次數，最後一筆為本學期 """
+    semesters = archive.student_trend(student_id, app.config['ARCHIVE_FOLDER'])
+    if not semesters:
+        return jsonify({'status': 'error', 'message': '找不到此學號'}), 404
+    return jsonify({'student_id': student_id, 'semesters': semesters})
+
+@app.route('/api/search', methods=['GET'])
+def api_search():
+    """ API: 全校搜尋學生 (姓名、學號、帳號) 與日常表現紀錄；q 以空白分隔多個關鍵字 """
+    query = request.args.get('q', '').strip()
+    limit = request.args.get('limit', 20, type=int)
+    students = db.search_students(query, limit)
+    notes = db.search_notes(query, limit)
+    for row in students + notes:
+        row['url'] = url_for('class_dashboard', class_name=row['class_name'])
+    return jsonify({'query': query, 'students': students, 'notes': notes})
+
 @app.route('/api/save_seating_chart', methods=['POST'])
 def api_save_seating_chart():
     """ API: 儲存整個座位表 """
@@ -169,7 +426,10 @@ def api_save_seating_chart():
             assignments_tuples.append((assign['row'], assign['col'], assign['student_id']))
     
     if assignments_tuples:
-        db.batch_update_seat_positions(assignments_tuples)
+        try:
+            db.batch_update_seat_positions(assignments_tuples)
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': '座位資料格式錯誤'}), 400
 
     return jsonify({'status': 'success'})
 
@@ -180,11 +440,13 @@ def api_update_layout():
     class_name = data.get('class_name')
     layout = data.get('layout')
     if class_name and layout in ['6x6', '8x5']:
-        db.update_class_layout(class_name, layout)
-        return jsonify({'status': 'success'})
+        # 切換佈局會清除座位並依學號重新排入，回傳新的座位供頁面直接更新
+        seats = db.relayout_class(class_name, layout)
+        return jsonify({'status': 'success', 'layout': layout, 'seats': seats})
     return jsonify({'status': 'error', 'message': 'Invalid data'}), 400
 
 @app.route('/api/grade_items', methods=['GET', 'POST'])
+@http_cache.conditional_json()
 def api_manage_grade_items():
     """ API: 管理成績項目 """
     if request.method == 'POST':
@@ -200,6 +462,7 @@ def api_manage_grade_items():
     return jsonify([dict(row) for row in items])
 
 @app.route('/api/grades/<int:item_id>', methods=['GET'])
+@http_cache.conditional_json('class_name')
 def api_get_grades(item_id):
     """ API: 根據班級和項目取得成績 """
     class_name = request.args.get('class_name')
@@ -234,9 +497,118 @@ def api_update_grade():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/api/grades/batch', methods=['POST'])
+def api_batch_update_grades():
+    """ API: 批次更新多筆成績 (單一交易) """
+    data = request.get_json(silent=True)
+    changes_data = data.get('changes') if isinstance(data, dict) else None
+
+    if not changes_data:
+        return jsonify({'status': 'error', 'message': '缺少成績資料'}), 400
+    if not isinstance(changes_data, list) or not all(isinstance(change, dict) for change in changes_data):
+        return jsonify({'status': 'error', 'message': '成績資料格式不正確'}), 400
+
+    changes = []
+    for change in changes_data:
+        score = change.get('score')
+        try:
+            student_db_id = int(change.get('student_db_id'))
+            item_id = int(change.get('item_id'))
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': '缺少學生ID或項目ID'}), 400
+        if score is not None and score != '':
+            try:
+                # inf、nan 存入後讀取成績時會輸出不合法的 JSON，一併拒絕
+                valid = math.isfinite(float(score))
+            except (TypeError, ValueError):
+                valid = False
+            if not valid:
+                return jsonify({'status': 'error', 'message': f'分數格式不正確: {score}'}), 400
+        changes.append((student_db_id, item_id, score))
+
+    try:
+        saved = db.batch_update_grades(changes)
+        return jsonify({'status': 'success', 'saved': saved})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/class/<class_name>/summary', methods=['GET'])
+@http_cache.conditional_json('class_name')
+def api_class_summary(class_name):
+    """ API: 班級學期成績摘要 (加權總成績、平均、標準差與排名) """
+    from summary_cache import summary_cache
+    summary = summary_cache.get_summary(class_name)
+    if not summary['students']:
+        return jsonify({'status': 'error', 'message': '找不到此班級的學生'}), 404
+    return jsonify(summary)
+
+@app.route('/api/summary/cache_stats', methods=['GET'])
+def api_summary_cache_stats():
+    """ API: 成績摘要快取的命中統計 """
+    from summary_cache import summary_cache
+    return jsonify(summary_cache.stats())
+
+@app.route('/api/attendance/<class_name>/<date>', methods=['GET', 'POST'])
+@http_cache.conditional_json('class_name')
+def api_class_attendance(class_name, date):
+    """ API: 讀取或儲存班級某一天的點名表 (整班一次處理) """
+    try:
+        date = datetime.date.fromisoformat(date).isoformat()
+    except ValueError:
+        return jsonify({'status': 'error', 'message': '日期格式不正確 (YYYY-MM-DD)'}), 400
+
+    if request.method == 'POST':
+        data = request.get_json(silent=True)
+        records_data = data.get('records') if isinstance(data, dict) else None
+        if not records_data:
+            return jsonify({'status': 'error', 'message': '缺少點名資料'}), 400
+        if not isinstance(records_data, list) or not all(isinstance(record, dict) for record in records_data):
+            return jsonify({'status': 'error', 'message': '點名資料格式不正確'}), 400
+
+        class_student_ids = {s['id'] for s in db.get_all_students_for_class(class_name)}
+        records = []
+        for record in records_data:
+            student_db_id = record.get('student_db_id')
+            status = record.get('status')
+            try:
+                student_db_id = int(student_db_id)
+            except (TypeError, ValueError):
+                return jsonify({'status': 'error', 'message': '缺少學生ID'}), 400
+            if student_db_id not in class_student_ids:
+                return jsonify({'status': 'error', 'message': f'學生 {student_db_id} 不屬於此班級'}), 400
+            if status not in db.ATTENDANCE_STATUSES:
+                return jsonify({'status': 'error', 'message': f'出缺席狀態不正確: {status}'}), 400
+            records.append((student_db_id, status, record.get('notes', '')))
+
+        saved = db.batch_record_attendance(date, records)
+        return jsonify({'status': 'success', 'saved': saved})
+
+    rows = db.get_class_attendance(class_name, date)
+    return jsonify({
+        'class_name': class_name,
+        'date': date,
+        'statuses': list(db.ATTENDANCE_STATUSES),
+        'students': [dict(row) for row in rows],
+    })
+
 # --- 主程式進入點 ---
 
 if __name__ == '__main__':
+    # 打包成 .exe 時，行程池的子行程會以同一個執行檔啟動
+    multiprocessing.freeze_support()
+
+    if '--profile-startup' in sys.argv:
+        # 分析啟動時間後結束，不啟動伺服器
+        startup_profile.mark('載入模組與建立應用程式')
+        if os.path.exists('teacher_app.db'):
+            for version in db.upgrade_schema():
+                print(f"資料庫結構已升級至版本 {version}。")
+            startup_profile.mark('檢查資料庫結構')
+        warm_up_imports()
+        startup_profile.mark('背景預先載入 (pandas / openpyxl)')
+        startup_profile.report()
+        sys.exit(0)
+
     # 檢查資料庫是否存在，若否，提示使用者執行 init_db.py
     if not os.path.exists('teacher_app.db'):
         print("="*50)
@@ -244,7 +616,24 @@ if __name__ == '__main__':
         print("請先執行 'python init_db.py' 來初始化資料庫。")
         print("="*50)
     else:
+        for version in db.upgrade_schema():
+            print(f"資料庫結構已升級至版本 {version}。")
         print("伺服器啟動於 http://127.0.0.1:8080")
         print("請用瀏覽器開啟此網址。")
-        serve(app, host='0.0.0.0', port=8080)
+        server = create_server(app, host='0.0.0.0', port=8080)
+        # 已開始監聽，之後才在背景載入 pandas 等模組
+        start_warm_up()
+        # 班級頁面的即時更新推播
+        try:
+            app.config['EVENTS_PORT'] = events.broadcaster.start(port=app.config['EVENTS_PORT'])
+        except OSError as e:
+            print(f"即時更新推播無法啟動 (連接埠 {app.config['EVENTS_PORT']}): {e}；班級頁面需手動重新整理。")
+        # 定時線上備份 (備份檔在 backups 資料夾，以 python backup.py --restore 還原)
+        backup.start_scheduler(app.config['BACKUP_FOLDER'])
+        try:
+            server.run()
+        finally:
+            backup.stop_scheduler()
+            events.broadcaster.stop()
+            jobs.shutdown()
 
@@ -0,0 +1,367 @@
+import datetime
+import json
+import math
+import os
+import re
+import sqlite3
+import stat
+import sys
+import time
+from pathlib import Path
+
+import database as db
+import migrations
+
+# --- 學期封存設定 ---
+# 每個學期結束時，成績與點名紀錄搬到一個唯讀的 SQLite 檔案 (例如 archives/semester-114-1.db)，
+# 目前的資料庫只保留本學期的資料，一般請求的查詢速度不受累積的學期數影響
+ARCHIVE_FOLDER = 'archives'
+ARCHIVE_PREFIX = 'semester-'
+ARCHIVE_SUFFIX = '.db'
+# 學期名稱同時作為檔名，只允許中英文、數字、底線與連字號，例如 114-1
+LABEL_PATTERN = re.compile(r'^[0-9A-Za-z_\-\u4e00-\u9fff]{1,40}$')
+# 複製到封存檔的資料表 (結構與索引與目前的資料庫相同)；全文檢索索引不複製
+ARCHIVED_TABLES = ('students', 'class_settings', 'grade_items', 'grades', 'attendance', 'attendance_monthly')
+# SQLite 預設一條連線最多附加 10 個資料庫，跨學期查詢每次附加這麼多個封存檔
+ATTACH_BATCH = 8
+# 趨勢報表中目前資料庫的學期名稱
+CURRENT_LABEL = '本學期'
+# 趨勢報表分列顯示的評量類型 (平時、定期)
+TREND_TYPES = ('平時評量', '定期評量')
+
+
+class ArchiveError(Exception):
+    """ 學期名稱不正確、已封存過，或封存檔損壞 """
+
+
+def archive_path(label, folder=None):
+    """ 學期封存檔的路徑，例如 archives/semester-114-1.db """
+    return os.path.join(folder or ARCHIVE_FOLDER, f'{ARCHIVE_PREFIX}{label}{ARCHIVE_SUFFIX}')
+
+
+def check_label(label):
+    """ 檢查學期名稱，不正確時拋出 ArchiveError """
+    if not isinstance(label, str) or not LABEL_PATTERN.match(label):
+        raise ArchiveError('學期名稱只能包含中英文、數字、底線與連字號 (例如 114-1)')
+    return label
+
+
+def _readonly_uri(path):
+    """
+    以唯讀方式開啟封存檔的 URI.
+    封存後檔案不再變動，immutable=1 讓 SQLite 略過檔案鎖定與變動檢查。
+    """
+    return Path(os.path.abspath(path)).as_uri() + '?mode=ro&immutable=1'
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _count_rows(conn, schema):
+    return {table: conn.execute(f'SELECT COUNT(*) FROM {schema}.{table}').fetchone()[0]
+            for table in ARCHIVED_TABLES}
+
+
+def _create_archive(conn, path):
+    """ 以目前資料庫的資料表與索引定義建立空白的封存檔 (不含觸發器與全文檢索索引) """
+    placeholders = ', '.join('?' * len(ARCHIVED_TABLES))
+    statements = [row[0] for row in conn.execute(
+        f"SELECT sql FROM sqlite_master WHERE type IN ('table', 'index') AND sql IS NOT NULL "
+        f"AND tbl_name IN ({placeholders}) ORDER BY type DESC, name", ARCHIVED_TABLES)]
+    archive = sqlite3.connect(path)
+    try:
+        for statement in statements:
+            archive.execute(statement)
+        archive.execute("""
+            CREATE TABLE archive_info (
+                label TEXT NOT NULL,
+                archived_at TEXT NOT NULL,
+                counts TEXT NOT NULL -- 各資料表筆數 (JSON)
+            )
+        """)
+        # 封存時依成績項目的權重計算的學期成績，與成績總表相同；趨勢報表直接讀取，不必重新計算
+        archive.execute("""
+            CREATE TABLE semester_scores (
+                student_db_id INTEGER PRIMARY KEY,
+                graded INTEGER NOT NULL,
+                average REAL,
+                regular_average REAL,
+                exam_average REAL
+            )
+        """)
+        archive.execute(f'PRAGMA user_version = {migrations.LATEST_VERSION}')
+        archive.commit()
+    finally:
+        archive.close()
+
+
+@db.exclusive_write
+def _move_semester(path, label, job=None):
+    """
+    複製本學期的資料到封存檔、檢查後清空目前資料庫的成績與點名紀錄，回傳各資料表筆數.
+    由寫入執行緒獨佔執行，複製到清除之間不會有其他寫入；清除前任何步驟失敗時目前的資料都不變。
+    """
+    conn = db.get_db_connection()
+    _create_archive(conn, path)
+    conn.execute('ATTACH DATABASE ? AS archive', (path,))
+    try:
+        with db.transaction():
+            for index, table in enumerate(ARCHIVED_TABLES):
+                if job is not None:
+                    job.progress(index, len(ARCHIVED_TABLES), f'複製 {table}')
+                conn.execute(f'INSERT INTO archive.{table} SELECT * FROM main.{table}')
+            conn.executemany('INSERT INTO archive.semester_scores VALUES (?, ?, ?, ?, ?)',
+                             [(row[0],) + row[3:] for row in _weighted_scores()])
+            counts = _count_rows(conn, 'main')
+            conn.execute('INSERT INTO archive.archive_info (label, archived_at, counts) VALUES (?, ?, ?)',
+                         (label, datetime.datetime.now().isoformat(timespec='seconds'), json.dumps(counts)))
+
+        if job is not None:
+            job.progress(len(ARCHIVED_TABLES), len(ARCHIVED_TABLES), '檢查封存檔')
+        problems = [row[0] for row in conn.execute('PRAGMA archive.integrity_check')]
+        if problems != ['ok']:
+            raise ArchiveError('封存檔完整性檢查失敗: ' + '; '.join(problems[:5]))
+        if _count_rows(conn, 'archive') != counts:
+            raise ArchiveError('封存檔的筆數與目前的資料庫不符')
+
+        if job is not None:
+            job.progress(message='清除本學期資料')
+        with db.transaction():
+            # 寫入執行緒之外的連線 (例如手動執行的腳本) 仍可能在複製後寫入，清除前再確認一次
+            if _count_rows(conn, 'main') != counts:
+                raise ArchiveError('封存期間資料有變動，請重新封存')
+            db.clear_semester_data()
+    finally:
+        conn.execute('DETACH DATABASE archive')
+    return counts
+
+
+@db.exclusive_write
+def _compact_database():
+    """ 封存後的資料庫只剩名單與設定，重整檔案以釋放空間 """
+    conn = db.get_db_connection()
+    conn.execute('VACUUM')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+
+def archive_semester(label, folder=None, job=None):
+    """
+    將本學期的成績與點名紀錄搬到該學期的唯讀封存檔，目前的資料庫只保留學生名單、座位與成績項目.
+    封存檔通過完整性檢查且筆數相符後才清除目前的資料；失敗時刪除未完成的封存檔，資料保持不變。
+    回傳 {'label', 'path', 'size', 'counts', 'seconds'}。
+    """
+    check_label(label)
+    folder = folder or ARCHIVE_FOLDER
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.abspath(archive_path(label, folder))
+    if os.path.exists(path):
+        raise ArchiveError(f'學期 {label} 已經封存過')
+    start = time.perf_counter()
+    try:
+        counts = _move_semester(path, label, job)
+    except BaseException:
+        # 清除本學期資料是最後一步，失敗時目前的資料不變，未完成的封存檔可以安全刪除
+        _remove(path)
+        _remove(path + '-journal')
+        raise
+    os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+    if job is not None:
+        # 本學期資料已經清除，之後不再檢查取消 (否則會回報為已取消、資料未變更)
+        job.message = '整理資料庫'
+    _compact_database()
+    return {
+        'label': label,
+        'path': path,
+        'size': os.path.getsize(path),
+        'counts': counts,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def _read_info(path):
+    """ 讀取封存檔的學期資訊；不是封存檔或已損壞時拋出 ArchiveError """
+    try:
+        conn = sqlite3.connect(_readonly_uri(path), uri=True)
+        try:
+            label, archived_at, counts = conn.execute(
+                'SELECT label, archived_at, counts FROM archive_info').fetchone()
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+        finally:
+            conn.close()
+    except (sqlite3.DatabaseError, TypeError) as e:
+        raise ArchiveError(f'無法讀取封存檔 {os.path.basename(path)}: {e}') from e
+    return {'label': label, 'archived_at': archived_at, 'counts': json.loads(counts), 'version': version}
+
+
+def list_archives(folder=None):
+    """ 列出已封存的學期 (舊的在前)，每筆為 {'label', 'name', 'path', 'size', 'archived_at', 'counts', 'version'} """
+    folder = folder or ARCHIVE_FOLDER
+    if not os.path.isdir(folder):
+        return []
+    archives = []
+    for name in os.listdir(folder):
+        if name.startswith(ARCHIVE_PREFIX) and name.endswith(ARCHIVE_SUFFIX):
+            path = os.path.join(folder, name)
+            try:
+                info = _read_info(path)
+            except ArchiveError:
+                # 封存中斷留下的檔案或其他檔案，略過
+                continue
+            info.update(name=name, path=path, size=os.path.getsize(path))
+            archives.append(info)
+    archives.sort(key=lambda a: (a['archived_at'], a['name']))
+    return archives
+
+
+# --- 跨學期趨勢 ---
+
+_TREND_GRADES = """
+    SELECT ? AS semester, s.class_name, s.name, w.graded, w.average, w.regular_average, w.exam_average
+    FROM {schema}.students s
+    LEFT JOIN {schema}.semester_scores w ON w.student_db_id = s.id
+    WHERE s.student_id = ?
+"""
+
+_TREND_ATTENDANCE = """
+    SELECT ? AS semester, m.status, SUM(m.count)
+    FROM {schema}.students s
+    JOIN {schema}.attendance_monthly m ON m.student_db_id = s.id
+    WHERE s.student_id = ?
+    GROUP BY m.status
+"""
+
+
+def _weighted_scores(student_id=None):
+    """
+    依成績項目的權重計算目前資料庫學生的學期成績 (與成績總表相同的 grade_summary 計算).
+    回傳 [(student_db_id, class_name, name, 已評分項目數, 學期成績, 平時評量, 定期評量), ...]，
+    未指定學號時為全校；沒有成績的分數為 None。
+    """
+    cursor = db.get_db_connection().cursor()
+    cursor.row_factory = None
+    query = ('SELECT s.id, s.student_id, s.name, s.class_name, g.item_id, g.score '
+             'FROM students s LEFT JOIN grades g ON g.student_db_id = s.id AND g.score IS NOT NULL')
+    if student_id is None:
+        rows = cursor.execute(query).fetchall()
+    else:
+        rows = cursor.execute(query + ' WHERE s.student_id = ?', (student_id,)).fetchall()
+    if not rows:
+        return []
+    # pandas 載入較慢，只在封存與查詢趨勢時才載入，不影響伺服器啟動
+    import grade_summary
+    items = grade_summary.load_items()
+    students, matrix = grade_summary.build_score_matrix(rows, list(items['id']))
+    _, type_scores, semester = grade_summary.compute_weighted_scores(matrix, items)
+    type_scores = type_scores.reindex(index=students.index, columns=list(TREND_TYPES))
+    graded = matrix.notna().sum(axis=1)
+
+    def clean(value):
+        return None if math.isnan(value) else float(value)
+
+    return [(int(student_db_id), class_name, name, int(count), clean(average), clean(regular), clean(exam))
+            for student_db_id, class_name, name, count, average, (regular, exam) in zip(
+                students.index, students['class_name'], students['name'], graded, semester,
+                type_scores.itertuples(index=False, name=None))]
+
+
+def _trend_rows(conn, template, sources, student_id):
+    """ 以 UNION ALL 一次查詢多個學期；sources 為 [(學期, schema), ...] """
+    sql = ' UNION ALL '.join(template.format(schema=schema) for _, schema in sources)
+    params = [value for label, _ in sources for value in (label, student_id)]
+    return conn.execute(sql, params).fetchall()
+
+
+def student_trend(student_id, folder=None):
+    """
+    學生跨學期的成績與出缺席趨勢 (依學號對應各學期的資料).
+    回傳依封存時間排列、最後為本學期的列表，每筆為
+    {'semester', 'class_name', 'name', 'graded', 'average', 'regular_average', 'exam_average', 'attendance'}；
+    平均為依成績項目權重計算的學期成績 (與成績總表相同)，封存的學期使用封存時計算的結果。
+    該學期沒有這位學生時略過。
+    封存檔只在這裡以另一條記憶體連線分批唯讀附加，處理一般請求的連線從不附加封存檔。
+    """
+    labels = []
+    grade_rows, attendance_rows = [], []
+    archives = list_archives(folder)
+    if archives:
+        conn = sqlite3.connect('file::memory:', uri=True)
+        try:
+            for offset in range(0, len(archives), ATTACH_BATCH):
+                batch = archives[offset:offset + ATTACH_BATCH]
+                sources = []
+                for index, info in enumerate(batch):
+                    schema = f'semester_{index}'
+                    conn.execute('ATTACH DATABASE ? AS ' + schema, (_readonly_uri(info['path']),))
+                    sources.append((info['label'], schema))
+                try:
+                    grades = _trend_rows(conn, _TREND_GRADES, sources, student_id)
+                    attendance = _trend_rows(conn, _TREND_ATTENDANCE, sources, student_id)
+                finally:
+                    for _, schema in sources:
+                        conn.execute('DETACH DATABASE ' + schema)
+                grade_rows.extend(grades)
+                attendance_rows.extend(attendance)
+                labels.extend(info['label'] for info in batch)
+        finally:
+            conn.close()
+
+    # 本學期的成績仍會變動，依目前的成績項目權重即時計算這位學生的學期成績
+    grade_rows.extend((CURRENT_LABEL,) + row[1:] for row in _weighted_scores(student_id))
+    attendance_rows.extend(_trend_rows(db.get_db_connection(), _TREND_ATTENDANCE, [(CURRENT_LABEL, 'main')], student_id))
+    labels.append(CURRENT_LABEL)
+
+    counts = {}
+    for semester, status, count in attendance_rows:
+        counts.setdefault(semester, {})[status] = count
+    by_semester = {}
+    for semester, class_name, name, graded, average, regular, exam in grade_rows:
+        by_semester[semester] = {
+            'semester': semester,
+            'class_name': class_name,
+            'name': name,
+            'graded': graded,
+            'average': None if average is None else round(average, 2),
+            'regular_average': None if regular is None else round(regular, 2),
+            'exam_average': None if exam is None else round(exam, 2),
+            'attendance': counts.get(semester, {}),
+        }
+    return [by_semester[label] for label in labels if label in by_semester]
+
+
+def run_archive_job(job, label, folder=None):
+    """ 背景工作：封存本學期 """
+    result = archive_semester(label, folder, job)
+    result['path'] = os.path.basename(result['path'])
+    result['message'] = (f'已封存學期 {label}：{result["counts"]["grades"]} 筆成績、'
+                         f'{result["counts"]["attendance"]} 筆點名紀錄')
+    return result
+
+
+if __name__ == '__main__':
+    # 用法: python archive.py <學期>        封存本學期 (例如 python archive.py 114-1，請先關閉伺服器)
+    #       python archive.py --list        列出已封存的學期
+    #       python archive.py --trend <學號> 顯示學生跨學期的趨勢
+    args = sys.argv[1:]
+    try:
+        if args[:1] == ['--list']:
+            for info in list_archives():
+                print(f"{info['label']:<12} {info['archived_at']}  {info['size'] / 1024 / 1024:8.2f} MB  "
+                      f"成績 {info['counts']['grades']} 筆、點名 {info['counts']['attendance']} 筆")
+        elif args[:1] == ['--trend'] and len(args) == 2:
+            for row in student_trend(args[1]):
+                absences = '、'.join(f'{status} {count}' for status, count in row['attendance'].items() if status != '出席')
+                print(f"{row['semester']:<12} {row['class_name']} {row['name']}  平均 {row['average']}  "
+                      f"({row['graded']} 項)  {absences or '無缺席'}")
+        elif len(args) == 1 and not args[0].startswith('--'):
+            result = archive_semester(args[0])
+            print(f"已封存至 {result['path']} ({result['size'] / 1024 / 1024:.2f} MB，{result['seconds']:.1f} 秒)")
+        else:
+            print("用法: python archive.py [<學期> | --list | --trend <學號>]")
+            sys.exit(2)
+    except ArchiveError as e:
+        print(f"錯誤：{e}")
+        sys.exit(1)
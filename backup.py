@@ -0,0 +1,316 @@
+import datetime
+import gzip
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import database as db
+import migrations
+
+logger = logging.getLogger('teacher_app.backup')
+
+# --- 備份設定 ---
+# 備份檔存放的資料夾 (與 teacher_app.db 相同，以工作目錄為準)
+BACKUP_FOLDER = 'backups'
+BACKUP_PREFIX = 'teacher_app-'
+BACKUP_SUFFIX = '.db.gz'
+# 保留最新的備份數量，較舊的自動刪除
+KEEP_BACKUPS = 14
+# 自動備份的間隔 (秒)
+BACKUP_INTERVAL = 6 * 60 * 60
+# 線上備份每一步複製的頁數 (預設頁面大小 4 KB，約 1 MB)
+PAGES_PER_STEP = 256
+# 備份的每個階段 (複製、檢查、壓縮) 都分成小段，每段之間暫停，讓處理請求的執行緒使用 CPU 與磁碟
+STEP_PAUSE = 0.005
+# 完整性檢查每執行這麼多個 SQLite 虛擬機指令就暫停一次 (約 1 ms 的工作量)
+CHECK_STEP_OPS = 20000
+# 壓縮與解壓縮每次處理的大小
+COPY_CHUNK_SIZE = 256 * 1024
+# 資料庫檔案以最快的壓縮等級就能縮小到約 1/3，較高等級只多省 1~2%，卻要多花數倍 CPU
+COMPRESS_LEVEL = 1
+
+
+class BackupError(Exception):
+    """ 備份檔損壞或不是本系統的資料庫 """
+
+
+def _backup_path(folder, now=None):
+    """ 依時間產生備份檔名，例如 backups/teacher_app-20261017-083000.db.gz """
+    now = now or datetime.datetime.now()
+    path = os.path.join(folder, f'{BACKUP_PREFIX}{now:%Y%m%d-%H%M%S}{BACKUP_SUFFIX}')
+    # 同一秒內的第二份備份加上序號，避免覆蓋
+    n = 1
+    while os.path.exists(path):
+        path = os.path.join(folder, f'{BACKUP_PREFIX}{now:%Y%m%d-%H%M%S}-{n}{BACKUP_SUFFIX}')
+        n += 1
+    return path
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _remove_database(path):
+    """ 刪除暫存的資料庫檔案；WAL 模式的複本以唯讀開啟時 SQLite 會建立 -wal 與 -shm 檔，一併刪除 """
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        _remove(path + suffix)
+
+
+def _copy_chunks(f_in, f_out, pause=0):
+    """ 分段複製檔案內容，每段之間暫停 pause 秒 """
+    while True:
+        chunk = f_in.read(COPY_CHUNK_SIZE)
+        if not chunk:
+            break
+        f_out.write(chunk)
+        if pause:
+            time.sleep(pause)
+
+
+def check_database(path, pause=0):
+    """
+    檢查資料庫檔案是否完整且可由本系統使用.
+    回傳結構版本；integrity_check 不通過、缺少資料表或版本比程式新時拋出 BackupError。
+    pause 大於 0 時檢查過程中會定期暫停，避免佔用整顆 CPU。
+    """
+    try:
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        if pause:
+            conn.set_progress_handler(lambda: time.sleep(pause), CHECK_STEP_OPS)
+        try:
+            problems = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f'無法讀取資料庫: {e}') from e
+    if problems != ['ok']:
+        raise BackupError('資料庫完整性檢查失敗: ' + '; '.join(problems[:5]))
+    if not {'settings', 'students'} <= tables:
+        raise BackupError('不是教師系統的資料庫 (缺少 settings 或 students 資料表)')
+    if version > migrations.LATEST_VERSION:
+        raise BackupError(f'備份的結構版本 {version} 比程式支援的 {migrations.LATEST_VERSION} 新')
+    return version
+
+
+def create_backup(source=None, folder=None, keep=KEEP_BACKUPS, job=None,
+                  pages=PAGES_PER_STEP, pause=STEP_PAUSE):
+    """
+    以 SQLite 線上備份 API 分段複製資料庫，檢查後壓縮成新的備份檔並刪除超過保留數量的舊備份.
+    備份期間伺服器照常讀寫：每一步只短暫讀取來源，步與步之間暫停 pause 秒。
+    keep 為 None 時不刪除舊備份。回傳 {'path', 'size', 'pages', 'seconds', 'removed'}。
+    """
+    source = source or db.DATABASE_FILE
+    folder = folder or BACKUP_FOLDER
+    os.makedirs(folder, exist_ok=True)
+    start = time.perf_counter()
+    path = _backup_path(folder)
+    copy_path = path[:-len('.gz')] + '.tmp'
+    temp_path = path + '.tmp'
+    copied = [0]
+
+    def progress(status, remaining, total):
+        copied[0] = total
+        if job is not None:
+            job.progress(total - remaining, total, f'已複製 {total - remaining} / {total} 頁')
+        if remaining and pause:
+            time.sleep(pause)
+
+    try:
+        src = sqlite3.connect(source, isolation_level=None, timeout=30)
+        dst = sqlite3.connect(copy_path)
+        try:
+            # 備份期間持有一個讀取交易：WAL 模式下寫入不受影響，而備份看到的是同一個時間點的資料；
+            # 否則每次有其他連線寫入，線上備份就會從頭開始，忙碌時可能永遠無法完成
+            src.execute('BEGIN')
+            src.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+            src.backup(dst, pages=pages, progress=progress)
+            src.execute('COMMIT')
+        finally:
+            dst.close()
+            src.close()
+        if job is not None:
+            job.progress(message='檢查中')
+        check_database(copy_path, pause)
+
+        if job is not None:
+            job.progress(message='壓縮中')
+        with open(copy_path, 'rb') as f_in, gzip.open(temp_path, 'wb', compresslevel=COMPRESS_LEVEL) as f_out:
+            _copy_chunks(f_in, f_out, pause)
+        os.replace(temp_path, path)
+    finally:
+        _remove_database(copy_path)
+        _remove(temp_path)
+
+    removed = rotate_backups(folder, keep) if keep is not None else []
+    return {
+        'path': path,
+        'size': os.path.getsize(path),
+        'pages': copied[0],
+        'seconds': round(time.perf_counter() - start, 3),
+        'removed': [os.path.basename(p) for p in removed],
+    }
+
+
+def list_backups(folder=None):
+    """ 列出備份檔 (新的在前)，每筆為 {'name', 'path', 'size', 'created'} """
+    folder = folder or BACKUP_FOLDER
+    if not os.path.isdir(folder):
+        return []
+    backups = []
+    for name in os.listdir(folder):
+        if name.startswith(BACKUP_PREFIX) and name.endswith(BACKUP_SUFFIX):
+            path = os.path.join(folder, name)
+            stat = os.stat(path)
+            backups.append({'name': name, 'path': path, 'size': stat.st_size, 'created': stat.st_mtime})
+    backups.sort(key=lambda b: (b['created'], b['name']), reverse=True)
+    return backups
+
+
+def rotate_backups(folder=None, keep=KEEP_BACKUPS):
+    """ 只保留最新的 keep 份備份，回傳被刪除的檔案路徑 """
+    removed = [b['path'] for b in list_backups(folder)[keep:]]
+    for path in removed:
+        _remove(path)
+    return removed
+
+
+def _extract(backup_path, target_path):
+    """ 將壓縮的備份解壓縮到 target_path """
+    try:
+        with gzip.open(backup_path, 'rb') as f_in, open(target_path, 'wb') as f_out:
+            _copy_chunks(f_in, f_out)
+    except (OSError, EOFError) as e:
+        raise BackupError(f'無法解壓縮備份檔: {e}') from e
+
+
+def verify_backup(backup_path):
+    """ 解壓縮到暫存檔並檢查完整性，回傳結構版本；備份損壞時拋出 BackupError """
+    temp_path = backup_path + '.verify.tmp'
+    try:
+        _extract(backup_path, temp_path)
+        return check_database(temp_path)
+    finally:
+        _remove_database(temp_path)
+
+
+def restore_backup(backup_path, target=None, folder=None):
+    """
+    以備份檔取代目前的資料庫 (需先停止伺服器).
+    備份通過完整性檢查後，先將目前的資料庫另存一份備份，再以備份 API 寫回原檔案 (WAL 檔一併正確更新)。
+    回傳 {'restored', 'previous', 'version'}；previous 為還原前自動建立的備份，原資料庫不存在時為 None。
+    """
+    target = target or db.DATABASE_FILE
+    temp_path = os.path.join(os.path.dirname(os.path.abspath(target)), 'restore.tmp')
+    try:
+        _extract(backup_path, temp_path)
+        version = check_database(temp_path)
+
+        previous = None
+        if os.path.exists(target):
+            # 不刪除舊備份：要還原的可能正是最舊的一份
+            previous = create_backup(target, folder, keep=None, pause=0)['path']
+
+        src = sqlite3.connect(temp_path)
+        dst = sqlite3.connect(target, timeout=30)
+        try:
+            src.backup(dst)
+            problems = [row[0] for row in dst.execute('PRAGMA quick_check')]
+        finally:
+            dst.close()
+            src.close()
+        if problems != ['ok']:
+            raise BackupError('還原後的資料庫檢查失敗: ' + '; '.join(problems[:5]))
+    finally:
+        _remove_database(temp_path)
+    return {'restored': backup_path, 'previous': previous, 'version': version}
+
+
+def run_backup_job(job, folder=None):
+    """ 背景工作：建立一份備份 """
+    result = create_backup(folder=folder, job=job)
+    result['path'] = os.path.basename(result['path'])
+    result['message'] = f'已備份 {result["pages"]} 頁，壓縮後 {result["size"] / 1024 / 1024:.1f} MB'
+    return result
+
+
+# --- 定時備份 ---
+
+_scheduler_stop = threading.Event()
+
+
+def _seconds_until_due(folder, interval):
+    backups = list_backups(folder)
+    if not backups:
+        return 0
+    return max(0, backups[0]['created'] + interval - time.time())
+
+
+def _scheduler_loop(folder, interval):
+    from jobs import jobs, JobQueueFull
+
+    while not _scheduler_stop.wait(_seconds_until_due(folder, interval)):
+        try:
+            job = jobs.submit('backup', run_backup_job, folder)
+        except JobQueueFull:
+            # 背景工作太多時稍後再試
+            _scheduler_stop.wait(60)
+            continue
+        while job.status not in ('done', 'failed', 'cancelled') and not _scheduler_stop.wait(1):
+            pass
+        if job.status == 'failed':
+            logger.error('自動備份失敗: %s', job.message)
+            _scheduler_stop.wait(min(interval, 600))
+
+
+def start_scheduler(folder=None, interval=BACKUP_INTERVAL):
+    """ 啟動定時備份執行緒：最新的備份超過 interval 秒時以背景工作建立新備份 """
+    _scheduler_stop.clear()
+    thread = threading.Thread(target=_scheduler_loop, args=(folder or BACKUP_FOLDER, interval),
+                              name='backup-scheduler', daemon=True)
+    thread.start()
+    return thread
+
+
+def stop_scheduler():
+    """ 停止定時備份執行緒 """
+    _scheduler_stop.set()
+
+
+if __name__ == '__main__':
+    # 用法: python backup.py                    立即建立一份備份
+    #       python backup.py --list             列出備份
+    #       python backup.py --verify <備份檔>  檢查備份是否完整
+    #       python backup.py --restore <備份檔> 以備份取代 teacher_app.db (請先關閉伺服器)
+    args = sys.argv[1:]
+    try:
+        if args[:1] == ['--list']:
+            for backup in list_backups():
+                created = datetime.datetime.fromtimestamp(backup['created'])
+                print(f"{backup['name']}  {backup['size'] / 1024 / 1024:8.2f} MB  {created:%Y-%m-%d %H:%M}")
+        elif args[:1] == ['--verify'] and len(args) == 2:
+            version = verify_backup(args[1])
+            print(f"備份完整，結構版本 {version}。")
+        elif args[:1] == ['--restore'] and len(args) == 2:
+            result = restore_backup(args[1])
+            if result['previous']:
+                print(f"還原前的資料庫已另存為 {result['previous']}")
+            print(f"已由 {result['restored']} 還原 (結構版本 {result['version']})，啟動伺服器時會自動升級結構。")
+        elif not args:
+            result = create_backup()
+            print(f"已建立備份 {result['path']} ({result['size'] / 1024 / 1024:.2f} MB，{result['seconds']:.1f} 秒)")
+            for name in result['removed']:
+                print(f"已刪除舊備份 {name}")
+        else:
+            print("用法: python backup.py [--list | --verify <備份檔> | --restore <備份檔>]")
+            sys.exit(2)
+    except BackupError as e:
+        print(f"錯誤：{e}")
+        sys.exit(1)
@@ -0,0 +1,117 @@
+"""
+負載測試：全校早自習點名，多位老師同時以 /api/attendance/<班級>/<日期> 送出整班點名.
+與逐位學生呼叫 record_attendance 的方式比較，記錄吞吐量與每班的延遲。
+
+用法: python benchmarks/bench_attendance.py [學生數] [同時點名的老師數]
+"""
+import os
+import statistics
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from common import create_schema, use_database
+import database as db
+
+CLASS_SIZE = 30
+
+
+def seed(path, n_students):
+    """ 建立每班 CLASS_SIZE 人的學生名單 """
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        'INSERT INTO students (student_id, name, class_name, account) VALUES (?, ?, ?, ?)',
+        [(f'S{i:05d}', f'學生{i}', f'C{i // CLASS_SIZE:03d}', '') for i in range(n_students)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def class_rosters():
+    """ 班級 → 該班學生 id 列表 """
+    return {name: [s['id'] for s in db.get_all_students_for_class(name)] for name in db.get_all_classes()}
+
+
+def run_teachers(n_teachers, rosters, submit):
+    """ n_teachers 個執行緒分攤所有班級，回傳 (總秒數, 每班延遲列表, 錯誤數) """
+    classes = list(rosters)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def teacher(worker):
+        mine = classes[worker::n_teachers]
+        local = []
+        for class_name in mine:
+            start = time.perf_counter()
+            ok = submit(class_name, rosters[class_name])
+            local.append(time.perf_counter() - start)
+            if not ok:
+                errors.append(class_name)
+        db.close_db_connection()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=teacher, args=(w,)) for w in range(n_teachers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies, len(errors)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    n_students = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_teachers = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    import app as teacher_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'attendance.db')
+        create_schema(path)
+        seed(path, n_students)
+        use_database(path)
+        rosters = class_rosters()
+        db.close_db_connection()
+
+        def per_student(class_name, student_ids):
+            for student_db_id in student_ids:
+                db.record_attendance(student_db_id, '2026-10-01', '出席')
+            return True
+
+        local = threading.local()
+
+        def whole_class(class_name, student_ids):
+            # 每個執行緒 (老師) 使用自己的 test client
+            if not hasattr(local, 'client'):
+                local.client = teacher_app.app.test_client()
+                with local.client.session_transaction() as session:
+                    session['logged_in'] = True
+            records = [{'student_db_id': s, 'status': '出席', 'notes': ''} for s in student_ids]
+            response = local.client.post(f'/api/attendance/{class_name}/2026-10-02', json={'records': records})
+            return response.status_code == 200
+
+        print(f'{n_students} 位學生、{len(rosters)} 個班級，{n_teachers} 位老師同時點名')
+        for label, submit in (('逐筆 record_attendance', per_student), ('整班 API', whole_class)):
+            elapsed, latencies, errors = run_teachers(n_teachers, rosters, submit)
+            print(f'{label}: 總計 {elapsed * 1000:7.1f} ms，{n_students / elapsed:8.0f} 位學生/秒，'
+                  f'每班 p50 {statistics.median(latencies) * 1000:6.1f} ms、'
+                  f'p95 {percentile(latencies, 0.95) * 1000:6.1f} ms，錯誤 {errors}')
+
+        use_database(path)
+        recorded = db.get_db_connection().execute(
+            "SELECT COUNT(*) FROM attendance WHERE date = '2026-10-02'").fetchone()[0]
+        print(f'整班 API 寫入 {recorded} 筆 (應為 {n_students})')
+        db.close_db_connection()
+
+
+if __name__ == '__main__':
+    main()
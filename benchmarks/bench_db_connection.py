@@ -0,0 +1,125 @@
+"""
+微基準測試：比較「每次呼叫都重新連線」與「執行緒共用連線 + WAL」的每秒請求數.
+
+用法: python benchmarks/bench_db_connection.py [執行緒數] [每執行緒請求數]
+"""
+import os
+import sys
+import sqlite3
+import tempfile
+import threading
+import time
+
+from common import create_schema, use_database
+import database as db
+
+CLASS_NAME = '701'
+
+
+def build_database(path):
+    """ 建立暫存資料庫，放入一個班級 35 位學生與一個成績項目 """
+    create_schema(path)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        'INSERT INTO students (student_id, name, class_name, account) VALUES (?, ?, ?, ?)',
+        [(f'S{i:04d}', f'學生{i}', CLASS_NAME, f'acc{i}') for i in range(35)]
+    )
+    conn.execute("INSERT INTO class_settings (class_name, seating_layout) VALUES (?, '6x6')", (CLASS_NAME,))
+    conn.execute("INSERT INTO grade_items (name, type) VALUES ('小考一', '平時評量')")
+    conn.commit()
+    conn.close()
+
+
+def legacy_request(path, n):
+    """ 舊版行為：每個查詢各自開關連線，每次寫入都 commit (rollback journal) """
+    def connect():
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    conn = connect()
+    conn.execute('SELECT * FROM class_settings WHERE class_name = ?', (CLASS_NAME,)).fetchone()
+    conn.close()
+    conn = connect()
+    students = conn.execute('SELECT * FROM students WHERE class_name = ? ORDER BY student_id', (CLASS_NAME,)).fetchall()
+    conn.close()
+    conn = connect()
+    conn.execute('SELECT * FROM grade_items ORDER BY type, name').fetchall()
+    conn.close()
+    conn = connect()
+    student_db_id = students[n % len(students)]['id']
+    existing = conn.execute('SELECT id FROM grades WHERE student_db_id = ? AND item_id = 1', (student_db_id,)).fetchone()
+    if existing:
+        conn.execute('UPDATE grades SET score = ? WHERE id = ?', (n % 100, existing['id']))
+    else:
+        conn.execute('INSERT INTO grades (student_db_id, item_id, score) VALUES (?, 1, ?)', (student_db_id, n % 100))
+    conn.commit()
+    conn.close()
+
+
+def pooled_request(path, n):
+    """ 新版行為：透過 database.py 的執行緒共用連線 """
+    db.get_class_settings(CLASS_NAME)
+    students = db.get_all_students_for_class(CLASS_NAME)
+    db.get_grade_items()
+    db.update_or_insert_grade(students[n % len(students)]['id'], 1, n % 100)
+
+
+def run(label, request_fn, path, threads, per_thread):
+    """
+    以多個執行緒同時送出請求，回傳 (每秒完成的請求數, 失敗的請求數).
+    個別請求失敗 (例如 database is locked) 時記錄下來並繼續，每秒請求數只計算成功完成的請求。
+    """
+    results = [{'completed': 0, 'errors': 0, 'messages': set()} for _ in range(threads)]
+
+    def worker(result):
+        for n in range(per_thread):
+            try:
+                request_fn(path, n)
+            except sqlite3.Error as e:
+                result['errors'] += 1
+                result['messages'].add(str(e))
+            else:
+                result['completed'] += 1
+        db.close_db_connection()
+
+    workers = [threading.Thread(target=worker, args=(result,)) for result in results]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    completed = sum(r['completed'] for r in results)
+    errors = sum(r['errors'] for r in results)
+    rps = completed / elapsed
+    print(f'{label:<8} {rps:10.1f} req/s  ({elapsed:.2f} 秒，完成 {completed} 筆，失敗 {errors} 筆)')
+    for message in sorted(set().union(*(r['messages'] for r in results))):
+        print(f'         錯誤: {message}')
+    return rps, errors
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, 'legacy.db')
+        pooled_path = os.path.join(tmp, 'pooled.db')
+        build_database(legacy_path)
+        build_database(pooled_path)
+        use_database(pooled_path)
+
+        print(f'執行緒數: {threads}，每執行緒請求數: {per_thread}')
+        before, before_errors = run('before', legacy_request, legacy_path, threads, per_thread)
+        after, after_errors = run('after', pooled_request, pooled_path, threads, per_thread)
+        print(f'加速倍率: {after / before:.2f}x' if before else '加速倍率: - (before 沒有完成任何請求)')
+
+    if before_errors or after_errors:
+        print(f'有請求失敗 (before {before_errors} 筆，after {after_errors} 筆)，每秒請求數只計算成功完成的請求')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+負載測試：輸入一整欄 (35 位學生) 成績時，逐筆 /api/grades/update 與單次 /api/grades/batch 的比較.
+記錄 HTTP 請求數、資料庫 COMMIT 次數與耗時。
+
+用法: python benchmarks/bench_grade_batch.py [學生數] [重複欄數]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from common import create_schema, use_database
+import database as db
+
+
+def seed(path, n_students, n_items):
+    """ 建立一個班級與多個成績項目 """
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        'INSERT INTO students (student_id, name, class_name, account) VALUES (?, ?, ?, ?)',
+        [(f'S{i:04d}', f'學生{i}', '701', '') for i in range(n_students)]
+    )
+    conn.executemany("INSERT INTO grade_items (name, type) VALUES (?, '平時評量')",
+                     [(f'小考{i}',) for i in range(n_items)])
+    conn.commit()
+    conn.close()
+
+
+def main():
+    n_students = int(sys.argv[1]) if len(sys.argv) > 1 else 35
+    n_items = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    import app as teacher_app
+    client = teacher_app.app.test_client()
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'grades.db')
+        create_schema(path)
+        seed(path, n_students, n_items)
+        use_database(path)
+
+        def per_cell(item_id):
+            for student_db_id in range(1, n_students + 1):
+                client.post('/api/grades/update',
+                            json={'student_db_id': student_db_id, 'item_id': item_id, 'score': 80})
+            return n_students
+
+        def batched(item_id):
+            changes = [{'student_db_id': s, 'item_id': item_id, 'score': 90} for s in range(1, n_students + 1)]
+            client.post('/api/grades/batch', json={'changes': changes})
+            return 1
+
+        print(f'每欄 {n_students} 位學生，共 {n_items} 欄')
+        for label, enter_column in (('逐筆', per_cell), ('批次', batched)):
+            # 寫入由寫入執行緒執行，每一批寫入 commit 一次
+            batches_before = db.write_queue_stats()['batches']
+            requests_sent = 0
+            start = time.perf_counter()
+            for item_id in range(1, n_items + 1):
+                requests_sent += enter_column(item_id)
+            elapsed = time.perf_counter() - start
+            commits = db.write_queue_stats()['batches'] - batches_before
+            print(f'{label}: 每欄 {requests_sent / n_items:5.1f} 個請求、'
+                  f'{commits / n_items:5.1f} 次 COMMIT、{elapsed / n_items * 1000:7.2f} ms')
+        db.close_db_connection()
+
+
+if __name__ == '__main__':
+    main()
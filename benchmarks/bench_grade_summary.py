@@ -0,0 +1,67 @@
+"""
+基準測試：以合成資料 (預設 2,000 位學生、50 個成績項目) 計算全校學期成績摘要.
+
+用法: python benchmarks/bench_grade_summary.py [學生數] [項目數]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from common import create_schema, use_database
+import database as db
+import grade_summary
+
+
+def seed(path, n_students, n_items, class_size=30):
+    """ 建立學生、含子項目的成績項目與約 95% 填寫率的成績 """
+    rng = random.Random(42)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        'INSERT INTO students (student_id, name, class_name, account) VALUES (?, ?, ?, ?)',
+        [(f'S{i:05d}', f'學生{i}', f'C{i // class_size:03d}', '') for i in range(n_students)]
+    )
+    items = []
+    for i in range(1, n_items + 1):
+        item_type = '定期評量' if i % 10 == 0 else '平時評量'
+        # 每 5 個平時評量中，後 3 個是第 1 個的子項目
+        parent = i - (i % 5 - 1) if item_type == '平時評量' and i % 5 in (2, 3, 4) else None
+        items.append((i, f'項目{i}', item_type, parent, rng.choice([None, 20, 30, 50])))
+    conn.executemany('INSERT INTO grade_items (id, name, type, parent_id, percentage) VALUES (?, ?, ?, ?, ?)', items)
+    conn.executemany(
+        'INSERT INTO grades (student_db_id, item_id, score) VALUES (?, ?, ?)',
+        [(s, i, rng.randint(40, 100)) for s in range(1, n_students + 1) for i in range(1, n_items + 1)
+         if rng.random() < 0.95]
+    )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    n_students = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_items = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'summary.db')
+        create_schema(path)
+        seed(path, n_students, n_items)
+        use_database(path)
+
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            summary = grade_summary.compute_summary()
+            timings.append(time.perf_counter() - start)
+        print(f'{n_students} 位學生 × {n_items} 個項目，{len(summary["classes"])} 個班級')
+        print(f'全校摘要: 最快 {min(timings) * 1000:.1f} ms，平均 {sum(timings) / len(timings) * 1000:.1f} ms')
+
+        start = time.perf_counter()
+        grade_summary.compute_summary('C000')
+        print(f'單一班級摘要: {(time.perf_counter() - start) * 1000:.1f} ms')
+        db.close_db_connection()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+基準測試：名單匯入在背景工作執行時，其他請求的延遲.
+比較三種情況下並行用戶端讀取成績欄的 p50 / p95 延遲：
+  1. 沒有匯入
+  2. 匯入在工作執行緒解析 (與處理請求的執行緒共用 GIL)
+  3. 匯入在行程池解析 (只有寫入資料庫在本行程)
+
+用法: python benchmarks/bench_jobs.py [名單列數] [並行用戶端數]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from common import use_database
+from run_suite import WaitressServer, _login, grades_get, run_waitress
+from synthetic_school import generate_school, make_students
+import database as db
+
+# 每個用戶端的讀取次數，需足以涵蓋整個匯入期間
+READS_PER_CLIENT = 300
+
+
+def write_large_roster(workbook_path, n_rows):
+    """ 產生 n_rows 列的匯入名單 """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('學生名單')
+    sheet.append(['學號', '姓名', '班級', '帳號'])
+    for student_id, name, class_name, account in make_students(-(-n_rows // 30), 30, random.Random(1))[:n_rows]:
+        sheet.append([student_id, name, class_name, account])
+    workbook.save(workbook_path)
+
+
+def run_case(app, server, cookie, context, roster, n_clients, mode):
+    """ mode 為 None (不匯入)、'thread' 或 'process'；回傳 (讀取延遲統計, 匯入秒數) """
+    import student_import
+    from jobs import jobs
+
+    import_seconds = None
+    job = None
+    if mode is not None:
+        student_import.PROCESS_PARSE_MIN_BYTES = 0 if mode == 'process' else float('inf')
+        # 每次匯入都使用新的暫存檔 (工作結束後會被刪除)
+        path = f'{roster}.{mode}.xlsx'
+        with open(roster, 'rb') as src, open(path, 'wb') as dst:
+            dst.write(src.read())
+        job = jobs.submit('import', student_import.run_import_job, path, discard_unarchived=True,
+                          cleanup=lambda: os.remove(path))
+        while job.status == 'queued':
+            time.sleep(0.001)
+
+    # 在匯入進行期間持續讀取
+    result = run_waitress(server.port, cookie, grades_get, context, n_clients, READS_PER_CLIENT, seed=7)
+
+    if job is not None:
+        while job.status not in ('done', 'failed', 'cancelled'):
+            time.sleep(0.01)
+        if job.status != 'done':
+            raise RuntimeError(f'匯入失敗: {job.message}')
+        import_seconds = job.finished - job.started
+    return result, import_seconds
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    n_clients = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    import app as teacher_app
+    from jobs import jobs
+    app = teacher_app.app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'school.db')
+        school = generate_school(path, n_classes=6, class_size=30, n_items=10, n_days=20)
+        roster = os.path.join(tmp, 'roster.xlsx')
+        write_large_roster(roster, n_rows)
+        use_database(path)
+
+        # 匯入會替換名單，讀取的班級與成績項目使用匯入後仍存在的資料
+        context = {'classes': school['classes'], 'leaf_items': [2, 3, 4, 5, 6]}
+        print(f'名單 {n_rows} 列 ({os.path.getsize(roster) / 1024:.0f} KB)，{n_clients} 個用戶端並行讀取成績欄')
+        print(f'{"情況":<16} {"p50":>8} {"p95":>8} {"吞吐量/s":>9} {"匯入秒數":>8}')
+
+        with WaitressServer(app, threads=4) as server:
+            cookie = _login(server.port)
+            for label, mode in (('沒有匯入', None), ('執行緒解析', 'thread'), ('行程池解析', 'process')):
+                if mode == 'process':
+                    # 子行程的啟動時間只發生一次，不計入比較
+                    jobs.run_in_process(os.getpid).result()
+                result, seconds = run_case(app, server, cookie, context, roster, n_clients, mode)
+                print(f'{label:<16} {result["p50_ms"]:8.2f} {result["p95_ms"]:8.2f} {result["throughput_rps"]:9.1f} '
+                      f'{"-" if seconds is None else f"{seconds:8.2f}":>8}')
+        jobs.shutdown()
+        db.close_db_connection()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+測量效能統計 (metrics.py) 的額外負擔.
+1. 同一組請求在啟用與停用統計時的耗時 (交錯執行多輪，比較最快與中位數，減少雜訊)
+2. 單次計時包裝與單條 SQL 計數的成本
+
+用法: python benchmarks/bench_metrics_overhead.py [每輪請求數] [輪數]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from common import create_schema, use_database
+from bench_grade_summary import seed
+import database as db
+import metrics
+
+
+def per_call(func, n=20000):
+    """ 呼叫 n 次的平均秒數 """
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - start) / n
+
+
+def main():
+    n_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    n_rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    import app as teacher_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'metrics.db')
+        create_schema(path)
+        seed(path, 600, 20)
+        use_database(path)
+        class_name = db.get_all_classes()[0]
+
+        client = teacher_app.app.test_client()
+        with client.session_transaction() as session:
+            session['logged_in'] = True
+
+        urls = {
+            '儀表板頁面': f'/class/{class_name}',
+            '成績欄 API': f'/api/grades/1?class_name={class_name}',
+            '點名表 API': f'/api/attendance/{class_name}/2026-10-01',
+        }
+        print(f'每輪 {n_requests} 個請求，啟用與停用交錯各 {n_rounds} 輪 (微秒/請求)')
+        for label, url in urls.items():
+            timings = {True: [], False: []}
+            for _ in range(n_rounds):
+                for enabled in (False, True):
+                    metrics.registry.enabled = enabled
+                    start = time.perf_counter()
+                    for _ in range(n_requests):
+                        client.get(url)
+                    timings[enabled].append((time.perf_counter() - start) / n_requests * 1e6)
+            fastest = {k: min(v) for k, v in timings.items()}
+            median = {k: statistics.median(v) for k, v in timings.items()}
+            print(f'{label}: 最快 停用 {fastest[False]:7.1f} / 啟用 {fastest[True]:7.1f} '
+                  f'(+{(fastest[True] / fastest[False] - 1) * 100:4.1f}%)，'
+                  f'中位數 停用 {median[False]:7.1f} / 啟用 {median[True]:7.1f} '
+                  f'(+{(median[True] / median[False] - 1) * 100:4.1f}%)')
+
+        # 單次呼叫的成本：計時包裝 (含直方圖記錄) 與 SQL trace callback
+        metrics.registry.enabled = True
+        def noop():
+            return None
+        wrapped = metrics.timed('bench', 'noop', noop)
+        conn = db.get_db_connection()
+        wrapper_cost = per_call(wrapped, 200000) - per_call(noop, 200000)
+        traced = per_call(lambda: conn.execute('SELECT 1'))
+        conn.set_trace_callback(None)
+        untraced = per_call(lambda: conn.execute('SELECT 1'))
+        print(f'計時包裝每次呼叫約 {wrapper_cost * 1e6:.2f} 微秒，SQL 計數每條指令約 {(traced - untraced) * 1e6:.2f} 微秒')
+        db.close_db_connection()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+測量班級儀表板「第一次」與「再次」造訪時傳輸的位元組數.
+模擬瀏覽器快取：immutable 且未過期的網址不再請求，其他網址帶 If-None-Match 重新驗證。
+「未啟用」欄位為不壓縮、不使用快取時每次造訪都要下載的量 (本次修改前的行為)。
+
+用法: python benchmarks/bench_repeat_visit.py [班級人數] [成績項目數]
+"""
+import gzip
+import os
+import re
+import sys
+import tempfile
+
+from common import create_schema, use_database
+from bench_grade_summary import seed
+import database as db
+
+
+class BrowserCache:
+    """ 極簡的瀏覽器 HTTP 快取 """
+
+    def __init__(self, client, accept_encoding):
+        self.client = client
+        self.accept_encoding = accept_encoding
+        self.entries = {}
+
+    def get(self, url):
+        """ 取得網址內容，回傳 (傳輸位元組數, 狀態說明) """
+        entry = self.entries.get(url)
+        if entry and entry['immutable']:
+            return 0, '快取'
+        headers = {'Accept-Encoding': self.accept_encoding} if self.accept_encoding else {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        response = self.client.get(url, headers=headers)
+        if response.status_code == 304:
+            return 0, '304'
+        cache_control = response.headers.get('Cache-Control', '')
+        self.entries[url] = {
+            'etag': response.headers.get('ETag'),
+            'immutable': 'immutable' in cache_control and 'max-age' in cache_control,
+        }
+        return len(response.data), response.headers.get('Content-Encoding', '-')
+
+
+def page_assets(html):
+    """ 頁面引用的本機靜態檔與圖片網址 """
+    urls = re.findall(r'(?:src|href)="(/(?:static|photos)/[^"]+)"', html)
+    return list(dict.fromkeys(url.replace('&amp;', '&') for url in urls))
+
+
+def visit(client, cache, class_name, item_id):
+    """ 造訪一次儀表板 (頁面、靜態檔與頁面載入時呼叫的 API)，回傳 {網址: (位元組, 狀態)} """
+    headers = {'Accept-Encoding': cache.accept_encoding} if cache.accept_encoding else {}
+    page = client.get(f'/class/{class_name}', headers=headers)
+    body = page.data
+    html = (gzip.decompress(body) if page.headers.get('Content-Encoding') == 'gzip' else body).decode('utf-8')
+    results = {f'/class/{class_name}': (len(page.data), page.headers.get('Content-Encoding', '-'))}
+    urls = page_assets(html) + [
+        '/api/grade_items',
+        f'/api/grades/{item_id}?class_name={class_name}',
+        f'/api/class/{class_name}/summary',
+        f'/api/attendance/{class_name}/2026-10-01',
+    ]
+    for url in urls:
+        results[url] = cache.get(url)
+    return results
+
+
+def main():
+    class_size = int(sys.argv[1]) if len(sys.argv) > 1 else 35
+    n_items = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    import app as teacher_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'visit.db')
+        create_schema(path)
+        seed(path, class_size, n_items, class_size=class_size)
+        use_database(path)
+        class_name = db.get_all_classes()[0]
+
+        client = teacher_app.app.test_client()
+        with client.session_transaction() as session:
+            session['logged_in'] = True
+
+        plain = BrowserCache(client, None)
+        baseline = visit(client, plain, class_name, 1)
+        plain.entries.clear()
+
+        cache = BrowserCache(client, 'gzip, deflate, br')
+        first = visit(client, cache, class_name, 1)
+        repeat = visit(client, cache, class_name, 1)
+        # 其他老師修改了一筆成績後再次造訪：只有該班的 API 需要重新下載
+        db.update_or_insert_grade(1, 1, 77)
+        after_write = visit(client, cache, class_name, 1)
+        db.close_db_connection()
+
+    print(f'{"網址":60s} {"未啟用":>8s} {"第一次":>14s} {"再次造訪":>12s} {"成績修改後":>12s}')
+    for url in baseline:
+        cells = [f'{baseline[url][0]:8d}'] + [f'{r[url][0]:7d} {r[url][1]:>5s}' for r in (first, repeat, after_write)]
+        print(f'{url[:60]:60s} ' + ' '.join(cells))
+    totals = [sum(size for size, _ in r.values()) for r in (baseline, first, repeat, after_write)]
+    print(f'{"合計":60s} {totals[0]:8d} {totals[1]:13d} {totals[2]:13d} {totals[3]:13d}')
+    print(f'再次造訪傳輸量為未啟用時的 {totals[2] / totals[0] * 100:.1f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+基準測試：5k 位學生的成績單與出缺席統計匯出，記錄首位元組時間 (TTFB)、總時間與峰值記憶體.
+
+用法: python benchmarks/bench_report_export.py [學生數] [成績項目數] [點名天數]
+"""
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from common import create_schema, use_database
+from bench_grade_summary import seed
+import database as db
+
+
+def seed_attendance(path, n_students, n_days):
+    """ 每位學生每天一筆點名紀錄 """
+    rng = random.Random(3)
+    start = datetime.date(2026, 9, 1)
+    statuses = ['出席'] * 90 + ['遲到'] * 4 + ['事假'] * 2 + ['病假'] * 3 + ['曠課']
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        'INSERT INTO attendance (student_db_id, date, status) VALUES (?, ?, ?)',
+        ((s, (start + datetime.timedelta(days=d)).isoformat(), rng.choice(statuses))
+         for d in range(n_days) for s in range(1, n_students + 1))
+    )
+    conn.commit()
+    conn.close()
+
+
+def read_stream(client, url):
+    """ 逐段讀取串流回應，回傳 (TTFB 秒數, 總秒數, 位元組數) """
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    first_byte = None
+    size = 0
+    for chunk in response.response:
+        if first_byte is None and chunk:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+    response.close()
+    return first_byte, time.perf_counter() - start, size
+
+
+def measure(client, url):
+    """ 先計時，再另外以 tracemalloc 量測峰值記憶體 (tracemalloc 會拖慢執行) """
+    first_byte, total, size = read_stream(client, url)
+    tracemalloc.start()
+    read_stream(client, url)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first_byte, total, size, peak
+
+
+def main():
+    n_students = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_items = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    n_days = int(sys.argv[3]) if len(sys.argv) > 3 else 60
+
+    import app as teacher_app
+    client = teacher_app.app.test_client()
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'export.db')
+        create_schema(path)
+        seed(path, n_students, n_items)
+        seed_attendance(path, n_students, n_days)
+        use_database(path)
+
+        print(f'{n_students} 位學生、{n_items} 個成績項目、{n_days} 天點名紀錄')
+        for url in ('/reports/export/grades.csv', '/reports/export/grades.xlsx',
+                    '/reports/export/attendance.csv', '/reports/export/attendance.xlsx'):
+            first_byte, total, size, peak = measure(client, url)
+            print(f'{url:<32} TTFB {first_byte * 1000:8.1f} ms  總計 {total:6.2f} 秒  '
+                  f'{size / 1024:8.0f} KB  峰值記憶體 {peak / 1024 / 1024:6.1f} MB')
+        db.close_db_connection()
+
+
+if __name__ == '__main__':
+    main()
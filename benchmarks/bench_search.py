@@ -0,0 +1,74 @@
+"""
+基準測試：全校搜尋學生與日常表現紀錄.
+比較以 LIKE 掃描原始資料表與 FTS5 trigram 索引 (/api/search 使用的 search_students / search_notes) 的查詢時間。
+
+用法: python benchmarks/bench_search.py [班級數] [點名天數]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from common import use_database
+from synthetic_school import NOTES, generate_school
+import database as db
+
+REPEAT = 20
+
+
+def like_students(conn, term):
+    pattern = f'%{term}%'
+    return conn.execute(
+        'SELECT id FROM students WHERE name LIKE ? OR student_id LIKE ? OR account LIKE ? '
+        'ORDER BY class_name, student_id LIMIT 20', (pattern, pattern, pattern)).fetchall()
+
+
+def like_notes(conn, term):
+    return conn.execute(
+        'SELECT a.id FROM attendance a JOIN students s ON s.id = a.student_db_id '
+        'WHERE a.daily_performance_notes LIKE ? ORDER BY a.date DESC LIMIT 20', (f'%{term}%',)).fetchall()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        func(*args)
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main():
+    n_classes = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    n_days = int(sys.argv[2]) if len(sys.argv) > 2 else 540
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'school.db')
+        generate_school(path, n_classes=n_classes, class_size=30, n_items=10, n_days=n_days)
+        use_database(path)
+        conn = sqlite3.connect(path)
+        n_attendance = conn.execute('SELECT COUNT(*) FROM attendance').fetchone()[0]
+        student_id, name, account = conn.execute(
+            'SELECT student_id, name, account FROM students ORDER BY id DESC LIMIT 1').fetchone()
+        print(f'{n_classes * 30} 位學生、{n_attendance} 筆點名紀錄，每項查詢 {REPEAT} 次取平均')
+        print(f'{"查詢":<28} {"LIKE 掃描 ms":>12} {"FTS5 ms":>10} {"倍數":>7}')
+
+        cases = [
+            (f'學生 姓名 {name}', like_students, db.search_students, name),
+            (f'學生 姓名兩字 {name[1:]}', like_students, db.search_students, name[1:]),
+            (f'學生 學號前綴 {student_id[:5]}', like_students, db.search_students, student_id[:5]),
+            (f'學生 帳號 {account}', like_students, db.search_students, account),
+            (f'表現 {NOTES[0]}', like_notes, db.search_notes, NOTES[0]),
+            (f'表現 兩字 {NOTES[0][:2]}', like_notes, db.search_notes, NOTES[0][:2]),
+            ('表現 不存在的片語', like_notes, db.search_notes, '不存在的片語'),
+        ]
+        for label, baseline, indexed, term in cases:
+            assert len(indexed(term)) == len(baseline(conn, term)), label
+            before = timed(baseline, conn, term)
+            after = timed(indexed, term)
+            print(f'{label:<28} {before:12.2f} {after:10.2f} {before / after:6.1f}x')
+        conn.close()
+        db.close_db_connection()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+基準測試：以合成的 10k 列名單比較逐列匯入、批次匯入與分段串流匯入 (.xlsx / .csv).
+同時記錄每種方式的峰值記憶體 (tracemalloc)。
+
+用法: python benchmarks/bench_student_import.py [列數]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from common import create_schema, use_database
+import database as db
+import student_import
+
+
+def build_workbook(path, n_rows):
+    """ 產生包含 n_rows 位學生的名單 (多一個無關欄位，模擬實際檔案) """
+    df = pd.DataFrame({
+        '學號': range(100000, 100000 + n_rows),
+        '姓名': [f'學生{i}' for i in range(n_rows)],
+        '班級': [f'{7 + i // 3000}年{(i // 30) % 100 + 1}班' for i in range(n_rows)],
+        '帳號': [f'acc{i:05d}' for i in range(n_rows)],
+        '備註': ['' for _ in range(n_rows)],
+    })
+    df.to_excel(path, index=False)
+    df.to_csv(os.path.splitext(path)[0] + '.csv', index=False)
+
+
+def legacy_import(workbook):
+    """ 舊版匯入：整份讀入後以 iterrows 逐列呼叫 add_student，每列各自 commit """
+    df = pd.read_excel(workbook)
+    db.clear_students_data()
+    for index, row in df.iterrows():
+        db.add_student(str(row['學號']), row['姓名'], row['班級'], str(row.get('帳號', '')))
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workbook = os.path.join(tmp, 'roster.xlsx')
+        build_workbook(workbook, n_rows)
+        csv_file = os.path.join(tmp, 'roster.csv')
+
+        cases = (
+            ('逐列 xlsx', lambda: legacy_import(workbook)),
+            ('批次 xlsx', lambda: student_import.import_roster(pd.read_excel(workbook))),
+            ('串流 xlsx', lambda: student_import.import_roster_file(workbook)),
+            ('串流 csv', lambda: student_import.import_roster_file(csv_file)),
+        )
+        print(f'名單列數: {n_rows}')
+        for index, (label, run) in enumerate(cases):
+            path = os.path.join(tmp, f'case{index}.db')
+            create_schema(path)
+            use_database(path)
+            tracemalloc.start()
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f'{label:<10} {elapsed:8.3f} 秒  ({n_rows / elapsed:8.0f} 列/秒)  峰值記憶體 {peak / 1024 / 1024:7.1f} MB')
+        db.close_db_connection()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+壓力測試：50 位老師同時寫入 (成績、座位、點名、座位表佈局).
+比較「各執行緒自己的連線各自 commit」與「單一寫入執行緒 + group commit」的吞吐量、延遲與鎖定錯誤數。
+
+用法: python benchmarks/bench_write_queue.py [寫入者數] [每位寫入次數]
+"""
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from common import use_database
+from synthetic_school import generate_school
+import database as db
+
+
+def writer(index, n_writes, students_by_class, item_ids, barrier, latencies, errors):
+    """ 一位老師：隨機寫入自己班級的成績、座位與點名 """
+    rng = random.Random(index)
+    class_name = sorted(students_by_class)[index % len(students_by_class)]
+    students = students_by_class[class_name]
+    barrier.wait()
+    for n in range(n_writes):
+        kind = rng.random()
+        start = time.perf_counter()
+        try:
+            if kind < 0.6:
+                db.update_or_insert_grade(rng.choice(students), rng.choice(item_ids), rng.randint(40, 100))
+            elif kind < 0.8:
+                db.record_attendance(rng.choice(students), f'2026-10-{rng.randint(1, 28):02d}', rng.choice(db.ATTENDANCE_STATUSES))
+            elif kind < 0.95:
+                seats = rng.sample(students, min(6, len(students)))
+                db.batch_update_seat_positions([(i // 6, i % 6, s) for i, s in enumerate(seats)])
+            elif kind < 0.98:
+                # 整班整欄成績一次儲存
+                db.batch_update_grades([(s, item, rng.randint(40, 100)) for s in students for item in item_ids[:5]])
+            else:
+                db.update_class_layout(class_name, rng.choice(('6x6', '8x5')))
+        except sqlite3.OperationalError as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+    db.close_db_connection()
+
+
+def run(path, n_writers, n_writes, use_queue):
+    db.WRITE_QUEUE_ENABLED = use_queue
+    use_database(path)
+    conn = sqlite3.connect(path)
+    students_by_class = {}
+    for student_db_id, class_name in conn.execute('SELECT id, class_name FROM students'):
+        students_by_class.setdefault(class_name, []).append(student_db_id)
+    item_ids = [row[0] for row in conn.execute(
+        'SELECT id FROM grade_items WHERE id NOT IN (SELECT parent_id FROM grade_items WHERE parent_id IS NOT NULL)')]
+    conn.close()
+    for class_name in students_by_class:
+        db.get_class_settings(class_name)
+
+    latencies, errors = [], []
+    barrier = threading.Barrier(n_writers + 1)
+    threads = [threading.Thread(target=writer, args=(i, n_writes, students_by_class, item_ids, barrier, latencies, errors))
+               for i in range(n_writers)]
+    for thread in threads:
+        thread.start()
+    before = db.write_queue_stats()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    after = db.write_queue_stats()
+    db.close_db_connection()
+
+    latencies.sort()
+    batches = after['batches'] - before['batches']
+    return {
+        'writes': len(latencies),
+        'errors': len(errors),
+        'throughput': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) * 1000 if latencies else 0,
+        'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0,
+        'max': latencies[-1] * 1000 if latencies else 0,
+        'per_batch': (after['writes'] - before['writes']) / batches if batches else None,
+        'sample_error': errors[0] if errors else '',
+    }
+
+
+def main():
+    n_writers = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    n_writes = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f'{n_writers} 位寫入者，每位 {n_writes} 次寫入')
+        print(f'{"方式":<20} {"成功":>6} {"鎖定錯誤":>8} {"寫入/秒":>9} {"p50 ms":>8} {"p95 ms":>8} {"最大 ms":>8} {"每批寫入":>8}')
+        for label, use_queue in (('各自 commit', False), ('寫入執行緒', True)):
+            path = os.path.join(tmp, f'{use_queue}.db')
+            generate_school(path, n_classes=25, class_size=30, n_items=20, n_days=30)
+            result = run(path, n_writers, n_writes, use_queue)
+            per_batch = '-' if result['per_batch'] is None else f'{result["per_batch"]:.1f}'
+            print(f'{label:<20} {result["writes"]:6d} {result["errors"]:8d} {result["throughput"]:9.0f} '
+                  f'{result["p50"]:8.2f} {result["p95"]:8.2f} {result["max"]:8.1f} {per_batch:>8}')
+            if result['sample_error']:
+                print(f'  例如: {result["sample_error"]}')
+        db.WRITE_QUEUE_ENABLED = True
+
+
+if __name__ == '__main__':
+    main()
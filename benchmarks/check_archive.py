@@ -0,0 +1,183 @@
+"""
+檢查學期封存：累積多個學期的封存檔後，一般請求的速度與目前資料庫的大小不隨學期數增加.
+
+  1. 每個學期結束時封存，再寫入下一學期的成績與點名紀錄，量測班級頁與讀取成績欄的 p50
+  2. 封存期間持續有老師修改成績：寫入在封存結束後照常完成，沒有錯誤
+  3. 跨學期趨勢與直接讀取各封存檔重新計算的結果相同 (學期成績依成績項目權重計算；學期數超過一次可附加的數量時分批附加)
+  4. 封存檔為唯讀，重複的學期名稱被拒絕
+
+任何一項不符就以非零狀態結束。請在專案根目錄執行 (需要 templates 資料夾)。
+
+用法: python benchmarks/check_archive.py [學期數] [班級數] [每學期點名天數]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from common import use_database
+from run_suite import build_context, class_dashboard, grades_get, run_in_process
+from synthetic_school import SEMESTER_START, add_semester, generate_school, write_photo_stubs, write_roster_workbook
+import archive
+import database as db
+import grade_summary
+
+REQUESTS = 200
+# 允許的 p50 上限：第一學期的 p50 × P50_RATIO + P50_SLACK_MS
+P50_RATIO = 1.3
+P50_SLACK_MS = 0.5
+# 目前資料庫的大小上限：第一學期的大小 × SIZE_RATIO
+SIZE_RATIO = 1.2
+
+
+def semester_label(index):
+    """ 第 index 個學期 (0 起算) 的名稱，例如 114-1、114-2、115-1 """
+    return f'{114 + index // 2}-{index % 2 + 1}'
+
+
+def semester_start(index):
+    return SEMESTER_START.replace(year=SEMESTER_START.year + (index + 1) // 2,
+                                  month=2 if index % 2 else SEMESTER_START.month)
+
+
+def hot_path(app, context):
+    rng = random.Random(7)
+    return {name: run_in_process(app, make_request, context, REQUESTS, rng)
+            for name, make_request in (('班級頁', class_dashboard), ('成績欄', grades_get))}
+
+
+def direct_trend(path, student_id):
+    """
+    不經 ATTACH，直接開啟單一資料庫計算學生的學期成績與缺席次數.
+    學期成績由原始成績依成績項目權重重新計算，不讀取封存時存下的結果。
+    """
+    conn = sqlite3.connect(path)
+    items = pd.read_sql_query('SELECT id, name, type, parent_id, percentage FROM grade_items ORDER BY type, name', conn)
+    rows = conn.execute(
+        'SELECT s.id, s.student_id, s.name, s.class_name, g.item_id, g.score FROM students s '
+        'LEFT JOIN grades g ON g.student_db_id = s.id AND g.score IS NOT NULL WHERE s.student_id = ?',
+        (student_id,)).fetchall()
+    _, matrix = grade_summary.build_score_matrix(rows, list(items['id']))
+    semester = grade_summary.compute_weighted_scores(matrix, items)[2].iloc[0]
+    average = None if pd.isna(semester) else round(float(semester), 2)
+    absences = conn.execute(
+        "SELECT COUNT(*) FROM attendance a JOIN students s ON s.id = a.student_db_id "
+        "WHERE s.student_id = ? AND a.status != '出席'", (student_id,)).fetchone()[0]
+    conn.close()
+    return average, absences
+
+
+def main():
+    n_semesters = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    n_classes = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    n_days = int(sys.argv[3]) if len(sys.argv) > 3 else 90
+
+    import app as teacher_app
+    app = teacher_app.app
+    failures = []
+
+    def check(condition, message):
+        print(f'  {"ok  " if condition else "FAIL"} {message}')
+        if not condition:
+            failures.append(message)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'school.db')
+        photo_dir = os.path.join(tmp, 'photos')
+        roster_path = os.path.join(tmp, 'roster.xlsx')
+        folder = os.path.join(tmp, 'archives')
+        generate_school(path, n_classes=n_classes, class_size=30, n_items=20, n_days=n_days)
+        write_photo_stubs(photo_dir, path, ratio=0)
+        write_roster_workbook(roster_path, path)
+        use_database(path)
+        context = build_context(path, photo_dir, roster_path)
+
+        print(f'{n_classes * 30} 位學生，每學期 {n_days} 個上課日、{REQUESTS} 次請求取 p50')
+        print(f'{"封存學期數":>8} {"資料庫 MB":>9} {"封存檔合計 MB":>12} {"封存秒數":>8} {"班級頁 p50":>10} {"成績欄 p50":>10}')
+        rows = []
+        for index in range(n_semesters + 1):
+            latency = hot_path(app, context)
+            archives = archive.list_archives(folder)
+            size = os.path.getsize(path) / 1024 / 1024
+            archived = sum(info['size'] for info in archives) / 1024 / 1024
+            seconds = rows[-1]['seconds'] if rows else None
+            rows.append({'latency': latency, 'size': size, 'seconds': None})
+            print(f'{len(archives):8d} {size:9.2f} {archived:12.2f} {"-" if seconds is None else f"{seconds:8.2f}":>8} '
+                  f'{latency["班級頁"]["p50_ms"]:10.2f} {latency["成績欄"]["p50_ms"]:10.2f}')
+            if index == n_semesters:
+                break
+
+            # 封存期間持續修改成績 (寫入在佇列中等候封存結束)
+            stop = threading.Event()
+            writes = {'count': 0, 'errors': 0, 'max_ms': 0.0}
+
+            def writer():
+                rng = random.Random(index)
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    try:
+                        db.update_or_insert_grade(rng.choice(context['students'][context['classes'][0]]),
+                                                  rng.choice(context['leaf_items']), rng.randint(40, 100))
+                        writes['count'] += 1
+                    except Exception:
+                        writes['errors'] += 1
+                    writes['max_ms'] = max(writes['max_ms'], (time.perf_counter() - start) * 1000)
+                    time.sleep(0.002)
+
+            thread = threading.Thread(target=writer)
+            thread.start()
+            try:
+                result = archive.archive_semester(semester_label(index), folder)
+            finally:
+                stop.set()
+                thread.join()
+            rows[-1].update(seconds=result['seconds'], writes=writes)
+            # 封存後到下一學期開始前寫入的成績留在新學期，先清掉再產生下一學期的資料
+            db.clear_semester_data()
+            add_semester(path, n_days=n_days, start=semester_start(index + 1), seed=index + 1)
+
+        first, last = rows[0], rows[-1]
+        print('\n驗證:')
+        for name in ('班級頁', '成績欄'):
+            limit = first['latency'][name]['p50_ms'] * P50_RATIO + P50_SLACK_MS
+            check(last['latency'][name]['p50_ms'] <= limit,
+                  f'{name} p50 {first["latency"][name]["p50_ms"]:.2f} → {last["latency"][name]["p50_ms"]:.2f} ms '
+                  f'(上限 {limit:.2f} ms)')
+        check(last['size'] <= first['size'] * SIZE_RATIO,
+              f'目前資料庫 {first["size"]:.2f} → {last["size"]:.2f} MB (上限 {first["size"] * SIZE_RATIO:.2f} MB)')
+        write_stats = [row['writes'] for row in rows if 'writes' in row]
+        check(not any(w['errors'] for w in write_stats),
+              f'封存期間的 {sum(w["count"] for w in write_stats)} 筆成績寫入全部成功 '
+              f'(最長等候 {max(w["max_ms"] for w in write_stats):.0f} ms)')
+
+        archives = archive.list_archives(folder)
+        student_id = sqlite3.connect(path).execute('SELECT student_id FROM students LIMIT 1').fetchone()[0]
+        start = time.perf_counter()
+        trend = archive.student_trend(student_id, folder)
+        trend_ms = (time.perf_counter() - start) * 1000
+        expected = [direct_trend(info['path'], student_id) for info in archives] + [direct_trend(path, student_id)]
+        actual = [(row['average'], sum(c for s, c in row['attendance'].items() if s != '出席')) for row in trend]
+        check([row['semester'] for row in trend] == [info['label'] for info in archives] + [archive.CURRENT_LABEL],
+              f'趨勢包含 {len(archives)} 個封存學期與本學期 ({trend_ms:.1f} ms)')
+        check(actual == expected, '各學期的加權學期成績與缺席次數與直接讀取封存檔重新計算的結果相同')
+        check(all(os.stat(info['path']).st_mode & 0o222 == 0 for info in archives), '封存檔皆為唯讀')
+        try:
+            archive.archive_semester(semester_label(0), folder)
+            duplicate_rejected = False
+        except archive.ArchiveError:
+            duplicate_rejected = True
+        check(duplicate_rejected and db.get_db_connection().execute('SELECT COUNT(*) FROM grades').fetchone()[0] > 0,
+              '重複的學期名稱被拒絕且資料不變')
+        db.close_db_connection()
+
+    print('通過' if not failures else f'{len(failures)} 項失敗')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+一致性檢查：隨機點名、改狀態與刪除紀錄後，比較 attendance_monthly 統計表與原始點名紀錄的計數.
+並比較讀取統計表與直接掃描原始紀錄的出缺席統計耗時 (隨點名天數增加)。
+
+用法: python benchmarks/check_attendance_rollup.py [學生數] [修改次數]
+"""
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+from common import create_schema, use_database
+from bench_grade_summary import seed
+from bench_report_export import seed_attendance
+import database as db
+
+TERM_START = datetime.date(2026, 9, 1)
+
+
+def raw_stats(class_name=None, start_date=None, end_date=None):
+    """ 直接掃描原始點名紀錄計算 (統計表加入前的作法)，作為正確答案與效能比較基準 """
+    counts = ', '.join(f"COUNT(CASE WHEN a.status = '{status}' THEN 1 END)" for status in db.ATTENDANCE_STATUSES)
+    conditions, params = ['a.student_db_id = s.id'], []
+    if start_date:
+        conditions.append('a.date >= ?')
+        params.append(start_date)
+    if end_date:
+        conditions.append('a.date <= ?')
+        params.append(end_date)
+    query = (f'SELECT s.class_name, s.student_id, s.name, {counts} '
+             f'FROM students s LEFT JOIN attendance a ON {" AND ".join(conditions)}')
+    if class_name is not None:
+        query += ' WHERE s.class_name = ?'
+        params.append(class_name)
+    query += ' GROUP BY s.id ORDER BY s.class_name, s.student_id'
+    return [tuple(row) for row in db.get_db_connection().execute(query, params)]
+
+
+def random_date(rng, n_days):
+    return (TERM_START + datetime.timedelta(days=rng.randint(0, n_days + 40))).isoformat()
+
+
+def check_consistency(n_students, n_edits, rng):
+    """ 隨機寫入後比較統計表與原始紀錄，回傳不一致數 """
+    n_days = 60
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'rollup.db')
+        create_schema(path)
+        seed(path, n_students, 1)
+        seed_attendance(path, n_students, n_days)
+        use_database(path)
+
+        conn = db.get_db_connection()
+        for _ in range(n_edits):
+            action = rng.random()
+            if action < 0.7:
+                # 整批點名 (包含改變既有紀錄的狀態)
+                date = random_date(rng, n_days)
+                records = [(rng.randint(1, n_students), rng.choice(db.ATTENDANCE_STATUSES), '')
+                           for _ in range(rng.randint(1, 20))]
+                db.batch_record_attendance(date, records)
+            elif action < 0.85:
+                with db.transaction() as tx:
+                    tx.execute('DELETE FROM attendance WHERE student_db_id = ? AND date = ?',
+                               (rng.randint(1, n_students), random_date(rng, n_days)))
+            else:
+                # 直接修改日期 (跨月) 也要正確移動計數
+                with db.transaction() as tx:
+                    tx.execute('UPDATE OR IGNORE attendance SET date = ? WHERE student_db_id = ? AND date = ?',
+                               (random_date(rng, n_days), rng.randint(1, n_students), random_date(rng, n_days)))
+
+        failures = 0
+        stored = conn.execute('SELECT * FROM attendance_monthly ORDER BY 1, 2, 3').fetchall()
+        db.rebuild_attendance_rollup()
+        rebuilt = conn.execute('SELECT * FROM attendance_monthly ORDER BY 1, 2, 3').fetchall()
+        if [tuple(r) for r in stored] != [tuple(r) for r in rebuilt]:
+            failures += 1
+            print('逐筆更新的統計表與重建結果不一致')
+
+        classes = db.get_all_classes()
+        ranges = [(None, None), ('2026-09-01', '2026-09-30'), ('2026-09-01', None), (None, '2026-10-31')]
+        for _ in range(40):
+            a, b = sorted([random_date(rng, n_days), random_date(rng, n_days)])
+            ranges.append((a, b))
+            ranges.append((b, a))
+        for start_date, end_date in ranges:
+            class_name = rng.choice(classes + [None])
+            expected = raw_stats(class_name, start_date, end_date)
+            actual = list(db.iter_attendance_stats(class_name, start_date, end_date))
+            if expected != actual:
+                failures += 1
+                print(f'不一致: 班級 {class_name} {start_date} ~ {end_date}')
+        db.close_db_connection()
+    print(f'{n_edits} 次隨機寫入後檢查 {len(ranges)} 個日期區間，{failures} 個不一致。')
+    return failures
+
+
+def time_term_stats(n_students):
+    """ 比較全校整學期統計在不同點名天數下的耗時 """
+    print(f'{n_students} 位學生的全校出缺席統計:')
+    for n_days in (30, 90, 180):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'term.db')
+            create_schema(path)
+            seed(path, n_students, 1)
+            seed_attendance(path, n_students, n_days)
+            use_database(path)
+            db.get_db_connection().execute('ANALYZE')
+
+            timings = {}
+            for label, query in (('原始紀錄', lambda: raw_stats(None, '2026-09-01', None)),
+                                 ('月統計表', lambda: list(db.iter_attendance_stats(None, '2026-09-01', None)))):
+                best = float('inf')
+                for _ in range(3):
+                    start = time.perf_counter()
+                    query()
+                    best = min(best, time.perf_counter() - start)
+                timings[label] = best
+            db.close_db_connection()
+        print(f'  {n_days:3d} 天: ' + '，'.join(f'{k} {v * 1000:7.1f} ms' for k, v in timings.items()))
+
+
+def main():
+    n_students = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_edits = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    failures = check_consistency(300, n_edits, random.Random(11))
+    time_term_stats(n_students)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+檢查線上備份不會拖慢請求：並行用戶端讀寫成績時，比較沒有備份與持續備份期間的 p99 延遲.
+另外列出「一次複製整個資料庫、檢查與壓縮都不暫停」(pages=-1, pause=0) 作為對照。
+
+分段備份期間的 p99 超過 基準 p99 × 比例 + 容許毫秒 時以非零狀態結束。
+
+用法: python benchmarks/check_backup_latency.py [班級數] [點名天數] [並行用戶端數]
+"""
+import os
+import sys
+import tempfile
+import threading
+
+from common import use_database
+from run_suite import WaitressServer, _login, build_context, grades_get, grades_update, run_waitress
+from synthetic_school import generate_school, write_photo_stubs, write_roster_workbook
+import backup
+import database as db
+
+REQUESTS_PER_CLIENT = 150
+# 允許的 p99 上限：基準 p99 × P99_RATIO + P99_SLACK_MS
+P99_RATIO = 1.5
+P99_SLACK_MS = 10.0
+
+
+def mixed_request(rng, context):
+    """ 八成讀取成績欄、兩成修改成績 """
+    return (grades_get if rng.random() < 0.8 else grades_update)(rng, context)
+
+
+def measure(server, cookie, context, n_clients, folder=None, **backup_options):
+    """ 量測請求延遲；指定 folder 時在量測期間不斷建立備份，回傳 (延遲統計, 備份結果列表) """
+    results = []
+    stop = threading.Event()
+
+    def backup_loop():
+        while not stop.is_set():
+            results.append(backup.create_backup(folder=folder, keep=2, **backup_options))
+
+    thread = None
+    if folder is not None:
+        thread = threading.Thread(target=backup_loop)
+        thread.start()
+    try:
+        latency = run_waitress(server.port, cookie, mixed_request, context, n_clients, REQUESTS_PER_CLIENT, seed=11)
+    finally:
+        stop.set()
+        if thread is not None:
+            thread.join()
+    return latency, results
+
+
+def main():
+    n_classes = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    n_days = int(sys.argv[2]) if len(sys.argv) > 2 else 180
+    n_clients = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    import app as teacher_app
+    app = teacher_app.app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'school.db')
+        photo_dir = os.path.join(tmp, 'photos')
+        roster_path = os.path.join(tmp, 'roster.xlsx')
+        folder = os.path.join(tmp, 'backups')
+        generate_school(path, n_classes=n_classes, class_size=30, n_items=20, n_days=n_days)
+        write_photo_stubs(photo_dir, path, ratio=0)
+        write_roster_workbook(roster_path, path)
+        use_database(path)
+        context = build_context(path, photo_dir, roster_path)
+        print(f'資料庫 {os.path.getsize(path) / 1024 / 1024:.1f} MB，{n_clients} 個用戶端並行讀寫成績')
+        print(f'{"情況":<20} {"請求":>6} {"錯誤":>4} {"p50":>8} {"p99":>8} {"吞吐量/s":>9} {"備份數":>6} {"每份秒數":>8}')
+
+        rows = {}
+        with WaitressServer(app, threads=4) as server:
+            cookie = _login(server.port)
+            cases = (
+                ('沒有備份', {}),
+                ('分段線上備份', {'folder': folder}),
+                ('不分段不暫停 (對照)', {'folder': folder, 'pages': -1, 'pause': 0}),
+            )
+            for label, options in cases:
+                latency, results = measure(server, cookie, context, n_clients, **options)
+                rows[label] = latency
+                seconds = sum(r['seconds'] for r in results) / len(results) if results else None
+                print(f'{label:<20} {latency["requests"]:6d} {latency["errors"]:4d} {latency["p50_ms"]:8.2f} '
+                      f'{latency["p99_ms"]:8.2f} {latency["throughput_rps"]:9.1f} {len(results):6d} '
+                      f'{"-" if seconds is None else f"{seconds:8.2f}":>8}')
+        db.close_db_connection()
+
+        latest = backup.list_backups(folder)[0]['path']
+        backup.verify_backup(latest)
+
+    baseline, online = rows['沒有備份']['p99_ms'], rows['分段線上備份']['p99_ms']
+    limit = baseline * P99_RATIO + P99_SLACK_MS
+    failures = []
+    if online > limit:
+        failures.append(f'備份期間 p99 {online:.2f} ms 超過上限 {limit:.2f} ms')
+    if rows['分段線上備份']['errors']:
+        failures.append(f'備份期間有 {rows["分段線上備份"]["errors"]} 個請求失敗')
+    for failure in failures:
+        print(f'  失敗: {failure}')
+    print(f'p99 上限 {limit:.2f} ms (基準 × {P99_RATIO} + {P99_SLACK_MS:.0f} ms)：'
+          + ('通過' if not failures else f'{len(failures)} 項失敗'))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
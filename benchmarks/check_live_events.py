@@ -0,0 +1,190 @@
+"""
+檢查班級即時更新推播：大量閒置的 SSE 連線不佔用 waitress 的工作執行緒，且更新能送到正確的班級.
+
+  1. 未登入或來自其他主機的頁面被拒絕
+  2. 開啟遠多於 waitress 工作執行緒數的連線後，一般請求的延遲不受影響
+  3. 修改成績後，同班的所有連線都收到更新，其他班級不會收到；並量測送達時間
+  4. 切換佈局後依序收到 layout 與 seats 事件
+  5. 斷線期間的更新在重新連線 (Last-Event-ID) 後補送
+
+任何一項不符就以非零狀態結束。
+
+用法: python benchmarks/check_live_events.py [每班連線數]
+"""
+import http.client
+import json
+import os
+import queue
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from common import use_database
+from run_suite import WaitressServer, _login, build_context, grades_get, run_waitress
+from synthetic_school import generate_school, write_photo_stubs, write_roster_workbook
+import database as db
+
+WAITRESS_THREADS = 2
+EVENT_TIMEOUT = 5
+
+
+class SSEClient:
+    """ 以 socket 讀取 SSE 串流，收到的事件放入 queue """
+
+    def __init__(self, port, class_name, cookie, origin=None, last_event_id=None):
+        from urllib.parse import quote
+        self.sock = socket.create_connection(('127.0.0.1', port))
+        headers = [f'GET /api/class/{quote(class_name)}/events HTTP/1.1', f'Host: 127.0.0.1:{port}',
+                   'Accept: text/event-stream', f'Origin: {origin or "http://127.0.0.1:8080"}']
+        if cookie:
+            headers.append(f'Cookie: {cookie}')
+        if last_event_id:
+            headers.append(f'Last-Event-ID: {last_event_id}')
+        self.sock.sendall(('\r\n'.join(headers) + '\r\n\r\n').encode('utf-8'))
+        self.file = self.sock.makefile('rb')
+        self.status = int(self.file.readline().split()[1])
+        while self.file.readline() not in (b'\r\n', b''):
+            pass
+        self.events = queue.Queue()
+        self.last_event_id = None
+        if self.status == 200:
+            threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        event, data = None, []
+        try:
+            for raw in self.file:
+                line = raw.decode('utf-8').rstrip('\n')
+                if not line:
+                    if data:
+                        self.events.put((event or 'message', json.loads('\n'.join(data)), time.perf_counter()))
+                    event, data = None, []
+                elif line.startswith('id: '):
+                    self.last_event_id = line[4:]
+                elif line.startswith('event: '):
+                    event = line[7:]
+                elif line.startswith('data: '):
+                    data.append(line[6:])
+        except (OSError, ValueError):
+            pass
+
+    def next_event(self, timeout=EVENT_TIMEOUT):
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+def post_json(port, cookie, url, payload):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('POST', url, body=json.dumps(payload),
+                 headers={'Content-Type': 'application/json', 'Cookie': cookie})
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response.status, json.loads(body)
+
+
+def main():
+    per_class = int(sys.argv[1]) if len(sys.argv) > 1 else 25
+
+    import app as teacher_app
+    from events import broadcaster
+    app = teacher_app.app
+    failures = []
+
+    def check(condition, message):
+        print(f'  {"ok  " if condition else "FAIL"} {message}')
+        if not condition:
+            failures.append(message)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'school.db')
+        photo_dir = os.path.join(tmp, 'photos')
+        roster_path = os.path.join(tmp, 'roster.xlsx')
+        generate_school(path, n_classes=4, class_size=30, n_items=5, n_days=5)
+        write_photo_stubs(photo_dir, path, ratio=0)
+        write_roster_workbook(roster_path, path)
+        use_database(path)
+        context = build_context(path, photo_dir, roster_path)
+        target, other = context['classes'][0], context['classes'][1]
+
+        events_port = broadcaster.start(host='127.0.0.1', port=0)
+        with WaitressServer(app, WAITRESS_THREADS) as server:
+            cookie = _login(server.port)
+
+            print('驗證:')
+            check(SSEClient(events_port, target, None).status == 401, '未登入的連線回應 401')
+            check(SSEClient(events_port, target, cookie, origin='http://evil.example').status == 403,
+                  '其他主機的頁面回應 403')
+
+            baseline = run_waitress(server.port, cookie, grades_get, context, 4, 50, seed=3)
+            clients = [SSEClient(events_port, class_name, cookie)
+                       for class_name in (target, other) for _ in range(per_class)]
+            time.sleep(0.2)
+            loaded = run_waitress(server.port, cookie, grades_get, context, 4, 50, seed=3)
+            print(f'\n{len(clients)} 條閒置推播連線，waitress 只有 {WAITRESS_THREADS} 個工作執行緒:')
+            print(f'  讀取成績 p50 {baseline["p50_ms"]:.2f} → {loaded["p50_ms"]:.2f} ms，'
+                  f'p95 {baseline["p95_ms"]:.2f} → {loaded["p95_ms"]:.2f} ms')
+            check(all(c.status == 200 for c in clients), '所有推播連線都已建立')
+            check(loaded['errors'] == 0 and loaded['requests'] == baseline['requests'], '一般請求全部成功')
+            check(broadcaster.stats()['subscribers'] == len(clients), '推播伺服器登記了所有連線')
+
+            print('\n成績更新:')
+            target_clients, other_clients = clients[:per_class], clients[per_class:]
+            student_db_id = context['students'][target][0]
+            item_id = context['leaf_items'][0]
+            sent = time.perf_counter()
+            status, _ = post_json(server.port, cookie, '/api/grades/update',
+                                  {'student_db_id': student_db_id, 'item_id': item_id, 'score': 88})
+            received = [c.next_event() for c in target_clients]
+            delays = sorted((r[2] - sent) * 1000 for r in received if r)
+            check(status == 200, '更新請求成功')
+            check(all(r and r[0] == 'grades' and r[1]['changes'] == [[student_db_id, item_id, 88.0]] for r in received),
+                  f'同班 {len(target_clients)} 條連線都收到成績更新')
+            if delays:
+                print(f'       送達時間 (含請求處理) 中位數 {delays[len(delays) // 2]:.1f} ms，最慢 {delays[-1]:.1f} ms')
+            check(all(c.next_event(timeout=0.3) is None for c in other_clients), '其他班級沒有收到')
+
+            print('\n切換佈局:')
+            status, body = post_json(server.port, cookie, '/api/update_layout', {'class_name': target, 'layout': '8x5'})
+            first, second = target_clients[0].next_event(), target_clients[0].next_event()
+            check(status == 200 and len(body['seats']) == len(context['students'][target]), '佈局 API 回傳重新排好的座位')
+            check(first and first[0] == 'layout' and first[1] == {'layout': '8x5'}, '收到 layout 事件')
+            check(second and second[0] == 'seats' and sorted(map(tuple, second[1]['changes'])) == sorted(map(tuple, body['seats'])),
+                  '接著收到與 API 相同的 seats 事件')
+
+            print('\n斷線補送:')
+            client = target_clients[1]
+            while client.next_event(timeout=0.2):
+                pass
+            last_event_id = client.last_event_id
+            client.close()
+            post_json(server.port, cookie, '/api/grades/update', {'student_db_id': student_db_id, 'item_id': item_id, 'score': 61})
+            reconnected = SSEClient(events_port, target, cookie, last_event_id=last_event_id)
+            missed = reconnected.next_event()
+            check(missed and missed[0] == 'grades' and missed[1]['changes'][0][2] == 61.0, '重新連線後補送錯過的成績更新')
+            stale = SSEClient(events_port, target, cookie, last_event_id='00000000-1')
+            event = stale.next_event()
+            check(event and event[0] == 'resync', '無法補送時要求頁面重新載入')
+
+            for client in clients + [reconnected, stale]:
+                client.close()
+        broadcaster.stop()
+        db.close_db_connection()
+
+    print('通過' if not failures else f'{len(failures)} 項失敗')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
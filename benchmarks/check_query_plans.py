@@ -0,0 +1,124 @@
+"""
+檢查熱門查詢是否都使用索引 (EXPLAIN QUERY PLAN).
+
+實際呼叫 database.py 的函式，記錄它們送出的 SQL，再逐一分析查詢計畫；
+只要有任何查詢對資料表做全表掃描或需要暫存 B-tree 排序，就以非零狀態結束。
+
+用法: python benchmarks/check_query_plans.py
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+
+from common import create_schema, use_database
+import database as db
+
+# 小型設定表，全表掃描不影響效能
+SMALL_TABLES = {'settings', 'grade_items', 'class_settings'}
+# 熱門的寫入指令必須出現在記錄中；寫入改由寫入執行緒的連線送出後，只追蹤目前連線會漏掉它們
+REQUIRED_STATEMENTS = (
+    'DELETE FROM grades WHERE student_db_id',
+    'INSERT INTO grades',
+    'INSERT INTO attendance',
+)
+
+
+def seed(path):
+    """ 放入足夠的資料讓查詢規劃器做出實際的選擇 """
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        'INSERT INTO students (student_id, name, class_name, account) VALUES (?, ?, ?, ?)',
+        [(f'S{i:05d}', f'學生{i}', f'C{i % 40}', '') for i in range(1200)]
+    )
+    conn.execute("INSERT INTO grade_items (name, type) VALUES ('小考一', '平時評量')")
+    conn.commit()
+    conn.close()
+    # 讓規劃器取得統計資訊
+    conn = sqlite3.connect(path)
+    conn.execute('ANALYZE')
+    conn.close()
+
+
+def exercise():
+    """ 呼叫熱門路徑上的函式 """
+    students = db.get_all_students_for_class('C1')
+    ids = [s['id'] for s in students]
+    db.get_student_grades_by_item(ids, 1)
+    db.update_or_insert_grade(ids[0], 1, 90)
+    db.update_or_insert_grade(ids[0], 1, 95)
+    db.update_or_insert_grade(ids[0], 1, '')
+    db.record_attendance(ids[0], '2026-09-01', '出席')
+    db.record_attendance(ids[0], '2026-09-01', '遲到')
+    list(db.iter_attendance_stats('C1', '2026-09-05', '2026-10-10'))
+    db.record_attendance(ids[1], '2026-09-01', '出席', '上課專心')
+    db.search_students('S0001')
+    db.search_notes('上課專心')
+
+
+def problems_in_plan(conn, sql):
+    """ 回傳查詢計畫中有問題的步驟 """
+    problems = []
+    details = {}
+    full_text_match = False
+    for node_id, parent_id, _, detail in conn.execute('EXPLAIN QUERY PLAN ' + sql):
+        details[node_id] = detail
+        words = detail.split()
+        # 全文檢索 (MATCH) 只回傳符合的少數列，之後的排序是對這些結果排序
+        full_text_match = full_text_match or ('VIRTUAL TABLE INDEX' in detail and ':M' in detail)
+        # 子查詢的中間結果已經過索引篩選，掃描它不算全表掃描
+        if (words[:1] == ['SCAN'] and words[1] not in SMALL_TABLES and 'INDEX' not in detail
+                and not words[1].startswith('(subquery')):
+            problems.append(detail)
+        # 只對子查詢中間結果排序 (例如先分組再與學生表合併) 也不算
+        parent = details.get(parent_id, '')
+        if 'TEMP B-TREE' in detail and not parent.startswith(('MATERIALIZE', 'CO-ROUTINE')) and not full_text_match:
+            problems.append(detail)
+    return problems
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'plans.db')
+        create_schema(path)
+        seed(path)
+        use_database(path)
+
+        # 每條新連線 (包括寫入執行緒的連線) 都記錄送出的 SQL
+        statements = []
+        tracing = [True]
+
+        def trace(sql):
+            if tracing[0]:
+                statements.append(sql)
+
+        db.add_connection_hook(lambda conn: conn.set_trace_callback(trace))
+        conn = db.get_db_connection()
+        exercise()
+        tracing[0] = False
+
+        # FTS5 內部讀取自己的影子資料表 (以 'main'.'xxx_config' 形式出現) 不在檢查範圍；
+        # 新增或更新 (INSERT ... ON CONFLICT) 需以唯一索引找出衝突的列，也一併檢查
+        queries = sorted({s for s in statements
+                          if (s.split()[0].upper() in ('SELECT', 'UPDATE', 'DELETE') or 'ON CONFLICT' in s)
+                          and "'main'." not in s})
+        failures = 0
+        for required in REQUIRED_STATEMENTS:
+            if not any(sql.startswith(required) for sql in queries):
+                print(f'FAIL 沒有記錄到寫入指令 {required}')
+                failures += 1
+        for sql in queries:
+            problems = problems_in_plan(conn, sql)
+            mark = 'FAIL' if problems else 'ok  '
+            print(f'{mark} {" ".join(sql.split())[:100]}')
+            for detail in problems:
+                print(f'       -> {detail}')
+            failures += bool(problems)
+        db.close_db_connection()
+
+    print(f'共檢查 {len(queries)} 個查詢，{failures} 個未使用索引或未記錄。')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+檢查伺服器啟動時不會載入 pandas：在乾淨的子行程中 import app、啟動 waitress，
+確認 /login 已能回應而 pandas 尚未載入；接著執行背景預先載入，確認需要 pandas 的成績摘要仍可正常使用。
+
+任何一項不符就以非零狀態結束。
+
+用法: python benchmarks/check_startup.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl')
+
+# app.py 以工作目錄尋找樣板，子行程需在專案根目錄執行
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(path):
+    """ 子行程：量測啟動並回報哪些較重的模組已被載入 """
+    import http.client
+    import threading
+    import time
+
+    start = time.perf_counter()
+    from common import create_schema, use_database
+    create_schema(path)
+    use_database(path)
+
+    import_start = time.perf_counter()
+    import app as teacher_app
+    from waitress.server import create_server
+    server = create_server(teacher_app.app, host='127.0.0.1', port=0)
+    threading.Thread(target=server.run, daemon=True).start()
+    listening = time.perf_counter()
+
+    conn = http.client.HTTPConnection('127.0.0.1', server.effective_port)
+    conn.request('GET', '/login')
+    response = conn.getresponse()
+    response.read()
+    first_response = time.perf_counter()
+    loaded_at_login = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    teacher_app.start_warm_up().join()
+    warmed_up = time.perf_counter()
+    loaded_after_warm_up = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    # 延遲載入後，成績摘要 (pandas) 與變更通知仍需正常運作
+    client = teacher_app.app.test_client()
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+    summary = client.get('/api/summary/cache_stats')
+    server.close()
+
+    print(json.dumps({
+        'login_status': response.status,
+        'summary_status': summary.status_code,
+        'import_app_ms': (listening - import_start) * 1000,
+        'first_response_ms': (first_response - start) * 1000,
+        'warm_up_ms': (warmed_up - first_response) * 1000,
+        'loaded_at_login': loaded_at_login,
+        'loaded_after_warm_up': loaded_after_warm_up,
+    }))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', os.path.join(tmp, 'startup.db')],
+            capture_output=True, text=True, cwd=ROOT)
+    if result.returncode != 0:
+        print(result.stdout + result.stderr)
+        return 1
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    print(f'import app 並開始監聽: {report["import_app_ms"]:7.1f} ms')
+    print(f'第一個 /login 回應:     {report["first_response_ms"]:7.1f} ms (含建立資料庫)')
+    print(f'背景預先載入:           {report["warm_up_ms"]:7.1f} ms')
+
+    failures = []
+    if report['login_status'] != 200:
+        failures.append(f'/login 回應 {report["login_status"]}')
+    if report['loaded_at_login']:
+        failures.append(f'/login 回應時已載入 {", ".join(report["loaded_at_login"])}')
+    if 'pandas' not in report['loaded_after_warm_up']:
+        failures.append('背景預先載入後 pandas 仍未載入')
+    if report['summary_status'] != 200:
+        failures.append(f'成績摘要快取統計回應 {report["summary_status"]}')
+
+    for failure in failures:
+        print(f'  失敗: {failure}')
+    print('通過' if not failures else f'{len(failures)} 項失敗')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--child':
+        child(sys.argv[2])
+    else:
+        sys.exit(main())
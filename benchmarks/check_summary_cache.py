@@ -0,0 +1,163 @@
+"""
+一致性檢查：隨機修改成績後，比較快取的班級摘要與完整重新計算的結果.
+也檢查寫入進行中同時建立的快取，並比較快取命中與完整計算的耗時。
+
+用法: python benchmarks/check_summary_cache.py [修改次數]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from common import create_schema, use_database
+from bench_grade_summary import seed
+import database as db
+import grade_summary
+from summary_cache import SummaryCache
+
+TOLERANCE = 0.011  # 輸出四捨五入到小數第二位，允許最後一位的差異
+
+
+def differences(cached, fresh, path=''):
+    """ 遞迴比較兩份摘要，回傳不一致的欄位路徑 """
+    if isinstance(fresh, dict):
+        keys = set(cached) | set(fresh)
+        return [d for k in sorted(keys, key=str) for d in differences(cached.get(k), fresh.get(k), f'{path}/{k}')]
+    if isinstance(fresh, list):
+        if len(cached) != len(fresh):
+            return [f'{path}: 長度 {len(cached)} != {len(fresh)}']
+        return [d for i, (a, b) in enumerate(zip(cached, fresh)) for d in differences(a, b, f'{path}[{i}]')]
+    if isinstance(fresh, float) and isinstance(cached, (int, float)):
+        return [] if abs(cached - fresh) <= TOLERANCE else [f'{path}: {cached} != {fresh}']
+    return [] if cached == fresh else [f'{path}: {cached!r} != {fresh!r}']
+
+
+def check_concurrent_builds(classes, n_edits, rounds=5):
+    """
+    寫入進行中在鎖外建立快取：建立期間 commit 的成績變更也要反映在快取中.
+    每一輪使用新的快取，讀取執行緒在寫入期間建立所有班級的快取；寫入結束後與完整計算比較。
+    回傳 (不一致的班級數, 每格成績變更在寫入執行緒上的平均處理毫秒數)。
+    """
+    caches = [SummaryCache() for _ in range(rounds)]
+    spent = {'seconds': 0.0, 'cells': 0}
+
+    def listener(event, payload):
+        start = time.perf_counter()
+        for cache in caches:
+            cache.on_change(event, payload)
+        if event == 'grades':
+            spent['seconds'] += time.perf_counter() - start
+            spent['cells'] += len(payload) * len(caches)
+
+    db.add_change_listener(listener)
+    done = threading.Event()
+
+    def writer():
+        rng = random.Random(11)
+        for _ in range(n_edits):
+            db.update_or_insert_grade(rng.randint(1, 300), rng.randint(1, 20), rng.choice(['', rng.randint(0, 100)]))
+        done.set()
+
+    def reader(cache):
+        for class_name in classes:
+            cache.get_summary(class_name)
+        db.close_db_connection()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    for cache in caches:
+        readers = [threading.Thread(target=reader, args=(cache,)) for _ in range(2)]
+        for r in readers:
+            r.start()
+        for r in readers:
+            r.join()
+    thread.join()
+
+    failures = 0
+    for class_name in classes:
+        fresh = grade_summary.compute_summary(class_name)
+        for index, cache in enumerate(caches):
+            diffs = differences(cache.get_summary(class_name), fresh)
+            if diffs:
+                failures += 1
+                print(f'第 {index + 1} 個快取的班級 {class_name} 不一致: {diffs[:5]}')
+    return failures, spent['seconds'] / max(spent['cells'], 1) * 1000
+
+
+def check_without_items(tmp):
+    """ 尚未建立成績項目時 (例如剛匯入名單)，摘要仍列出班級的每位學生，回傳不符的說明列表 """
+    path = os.path.join(tmp, 'no_items.db')
+    create_schema(path)
+    use_database(path)
+    db.insert_students([(str(i), f'學生{i}', '701', '') for i in range(1, 4)])
+    problems = []
+    for label, summary in (('完整計算', grade_summary.compute_summary('701')), ('快取', SummaryCache().get_summary('701'))):
+        students = [(s['student_id'], s['scores'], s['average']) for s in summary['students']]
+        if students != [(str(i), {}, None) for i in range(1, 4)]:
+            problems.append(f'沒有成績項目時{label}的學生列表不正確: {students}')
+    db.close_db_connection()
+    return problems
+
+
+def main():
+    n_edits = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.db')
+        create_schema(path)
+        seed(path, 300, 20)
+        use_database(path)
+
+        cache = SummaryCache()
+        db.add_change_listener(cache.on_change)
+        classes = db.get_all_classes()
+        for class_name in classes:
+            cache.get_summary(class_name)
+
+        # 隨機修改、清除成績 (單筆與批次)，期間穿插讀取
+        for _ in range(n_edits):
+            if rng.random() < 0.2:
+                changes = [(rng.randint(1, 300), rng.randint(1, 20), rng.choice(['', rng.randint(0, 100)]))
+                           for _ in range(rng.randint(2, 10))]
+                db.batch_update_grades(changes)
+            else:
+                db.update_or_insert_grade(rng.randint(1, 300), rng.randint(1, 20),
+                                          rng.choice(['', None, rng.randint(0, 100), rng.random() * 100]))
+            if rng.random() < 0.1:
+                cache.get_summary(rng.choice(classes))
+
+        concurrent_failures, change_ms = check_concurrent_builds(classes, n_edits)
+
+        failures = 0
+        cached_seconds = fresh_seconds = 0.0
+        for class_name in classes:
+            start = time.perf_counter()
+            cached = cache.get_summary(class_name)
+            cached_seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            fresh = grade_summary.compute_summary(class_name)
+            fresh_seconds += time.perf_counter() - start
+            diffs = differences(cached, fresh)
+            if diffs:
+                failures += 1
+                print(f'班級 {class_name} 不一致: {diffs[:5]}')
+        db.close_db_connection()
+
+        print(f'{n_edits} 次隨機修改後檢查 {len(classes)} 個班級，{failures} 個不一致。')
+        print(f'快取統計: {cache.stats()}')
+        print(f'讀取 {len(classes)} 個班級摘要: 快取 {cached_seconds * 1000:.1f} ms，完整計算 {fresh_seconds * 1000:.1f} ms')
+        print(f'寫入期間建立快取: {concurrent_failures} 個不一致；寫入執行緒更新快取平均 {change_ms:.3f} ms/格')
+        failures += concurrent_failures
+
+        problems = check_without_items(tmp)
+        for problem in problems:
+            print(problem)
+        print(f'沒有成績項目的班級: {"通過" if not problems else "失敗"}')
+    return 1 if failures or problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""
+基準測試共用的輔助函式.
+"""
+import contextlib
+import io
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import database as db
+import init_db
+
+
+def create_schema(path):
+    """ 在指定路徑建立空白資料庫 (不輸出 init_db 的訊息) """
+    init_db.DATABASE_FILE = path
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db.setup_database()
+
+
+def use_database(path):
+    """ 讓 database.py 改用指定的資料庫檔案 """
+    db.close_db_connection()
+    db.DATABASE_FILE = path
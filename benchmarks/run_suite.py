@@ -0,0 +1,393 @@
+"""
+基準測試套件：建立合成學校後，分別以 Flask test client (同一行程、循序) 與實際的 waitress 伺服器
+(多個並行用戶端) 測試主要端點，回報 p50 / p95 / p99 延遲與吞吐量。
+
+結果可存成 JSON 基準 (--save)，之後以 --compare 比較；p95 延遲或吞吐量退步超過門檻時以非零狀態結束。
+
+用法:
+  python benchmarks/run_suite.py --save baseline.json
+  python benchmarks/run_suite.py --compare baseline.json [--threshold 0.2]
+"""
+import argparse
+import datetime
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs, quote, urlsplit
+
+from common import ROOT, use_database
+from synthetic_school import generate_school, write_photo_stubs, write_roster_workbook
+import database as db
+import init_db
+
+
+# --- 測試情境 ---
+# 每個情境由 make_request(rng, context) 產生 (method, url, body, headers)
+
+def _json_request(url, payload):
+    return 'POST', url, json.dumps(payload).encode('utf-8'), {'Content-Type': 'application/json'}
+
+
+def _multipart(field, filename, content, fields=None):
+    """ 組成 multipart/form-data 請求內容；fields 為其他一般欄位 {名稱: 值} """
+    boundary = uuid.uuid4().hex
+    body = b''.join(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8')
+                    for name, value in (fields or {}).items())
+    body += (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+             f'Content-Type: application/octet-stream\r\n\r\n').encode('utf-8') + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+
+def class_dashboard(rng, context):
+    return 'GET', f'/class/{rng.choice(context["classes"])}', None, {}
+
+
+def grades_get(rng, context):
+    class_name = rng.choice(context['classes'])
+    return 'GET', f'/api/grades/{rng.choice(context["leaf_items"])}?class_name={class_name}', None, {}
+
+
+def grades_update(rng, context):
+    student_db_id = rng.choice(context['students'][rng.choice(context['classes'])])
+    return _json_request('/api/grades/update', {
+        'student_db_id': student_db_id, 'item_id': rng.choice(context['leaf_items']), 'score': rng.randint(40, 100)})
+
+
+def save_seating_chart(rng, context):
+    students = list(context['students'][rng.choice(context['classes'])])
+    rng.shuffle(students)
+    assignments = [{'student_id': s, 'row': i // 6, 'col': i % 6} for i, s in enumerate(students[:36])]
+    return _json_request('/api/save_seating_chart', {'assignments': assignments})
+
+
+def photo_thumbnail(rng, context):
+    return 'GET', f'/photos/thumb/128/{quote(rng.choice(context["photos"]))}', None, {}
+
+
+def import_excel(rng, context):
+    # 測試資料庫有成績與點名紀錄，匯入時明確選擇不封存直接清除
+    body, headers = _multipart('student_file', 'roster.xlsx', context['roster'], {'discard_unarchived': '1'})
+    return 'POST', '/settings', body, headers
+
+
+# (名稱, 產生請求的函式, 可否並行)；匯入會替換整份名單，因此最後執行且不並行
+SCENARIOS = [
+    ('class_dashboard', class_dashboard, True),
+    ('grades_get', grades_get, True),
+    ('grades_update', grades_update, True),
+    ('save_seating_chart', save_seating_chart, True),
+    ('photo_thumbnail', photo_thumbnail, True),
+    ('import_excel', import_excel, False),
+]
+
+
+# --- 統計 ---
+
+def percentile(sorted_values, p):
+    """ 最近排名法的百分位數 """
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies, errors, wall_seconds):
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(values) * 1000, 3),
+        'throughput_rps': round(len(values) / wall_seconds, 1),
+    }
+
+
+def _is_ok(status):
+    # 匯入以 302 轉址回設定頁
+    return 200 <= status < 400
+
+
+def _wait_for_job(send, location):
+    """
+    回應若轉址到背景工作 (例如匯入完成後的 /settings?job=編號)，輪詢到工作結束為止，
+    延遲因此包含背景處理的時間。回傳工作是否成功 (沒有背景工作時為 True)。
+    """
+    job_id = parse_qs(urlsplit(location or '').query).get('job')
+    if not job_id:
+        return True
+    while True:
+        _, _, body = send('GET', f'/api/jobs/{job_id[0]}', None, {})
+        job = json.loads(body)
+        if job['status'] in ('done', 'failed', 'cancelled'):
+            return job['status'] == 'done'
+        time.sleep(0.005)
+
+
+def _timed_request(send, make_request, rng, context):
+    """ 送出一個請求 (含等待背景工作)，回傳 (耗時, 是否成功) """
+    method, url, body, headers = make_request(rng, context)
+    start = time.perf_counter()
+    status, location, _ = send(method, url, body, headers)
+    ok = _is_ok(status) and _wait_for_job(send, location)
+    return time.perf_counter() - start, ok
+
+
+# --- Flask test client (同一行程) ---
+
+def run_in_process(app, make_request, context, n_requests, rng):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+
+    def send(method, url, body, headers):
+        response = client.open(url, method=method, data=body, headers=headers)
+        return response.status_code, response.headers.get('Location'), response.get_data()
+
+    for _ in range(min(3, n_requests)):  # 暖機
+        _timed_request(send, make_request, rng, context)
+
+    latencies, errors = [], 0
+    wall_start = time.perf_counter()
+    for _ in range(n_requests):
+        elapsed, ok = _timed_request(send, make_request, rng, context)
+        latencies.append(elapsed)
+        errors += not ok
+    return summarize(latencies, errors, time.perf_counter() - wall_start)
+
+
+# --- waitress 伺服器 (並行用戶端) ---
+
+class WaitressServer:
+    """ 在背景執行緒啟動 waitress，使用系統分配的連接埠 """
+
+    def __init__(self, app, threads):
+        from waitress.server import create_server
+        logging.getLogger('waitress').setLevel(logging.ERROR)
+        self.server = create_server(app, host='127.0.0.1', port=0, threads=threads)
+        self.port = self.server.effective_port
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        # 先停止工作執行緒再關閉監聽，避免關閉中仍有請求寫入已關閉的 trigger
+        self.server.task_dispatcher.shutdown()
+        self.server.close()
+
+
+def _login(port):
+    """ 以預設密碼登入，回傳 session cookie """
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('POST', '/login', body=f'password={init_db.DEFAULT_PASSWORD}',
+                 headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    cookie = response.getheader('Set-Cookie', '').split(';', 1)[0]
+    conn.close()
+    if not cookie:
+        raise RuntimeError('登入失敗，無法取得 session cookie')
+    return cookie
+
+
+def run_waitress(port, cookie, make_request, context, n_clients, requests_per_client, seed):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    barrier = threading.Barrier(n_clients + 1)
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        conn = http.client.HTTPConnection('127.0.0.1', port)
+
+        def send(method, url, body, headers):
+            conn.request(method, url, body=body, headers=dict(headers, Cookie=cookie))
+            response = conn.getresponse()
+            return response.status, response.getheader('Location'), response.read()
+
+        local = []
+        local_errors = 0
+        barrier.wait()
+        for _ in range(requests_per_client):
+            try:
+                elapsed, ok = _timed_request(send, make_request, rng, context)
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                conn.close()
+                continue
+            local.append(elapsed)
+            local_errors += not ok
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(n_clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - wall_start)
+
+
+# --- 基準檔 ---
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(baseline, results, threshold):
+    """ 與基準比較，回傳退步的項目數 """
+    regressions = 0
+    print(f'\n與基準比較 ({baseline["environment"].get("commit")} @ {baseline["environment"]["timestamp"]})，'
+          f'門檻 {threshold * 100:.0f}%:')
+    for key, current in results.items():
+        old = baseline['results'].get(key)
+        if old is None:
+            print(f'  {key:<40} (基準中沒有此項目)')
+            continue
+        p95_change = current['p95_ms'] / old['p95_ms'] - 1 if old['p95_ms'] else 0.0
+        rps_change = current['throughput_rps'] / old['throughput_rps'] - 1 if old['throughput_rps'] else 0.0
+        regressed = p95_change > threshold or rps_change < -threshold
+        regressions += regressed
+        print(f'  {key:<40} p95 {old["p95_ms"]:8.2f} → {current["p95_ms"]:8.2f} ms ({p95_change * 100:+6.1f}%)  '
+              f'吞吐量 {old["throughput_rps"]:7.1f} → {current["throughput_rps"]:7.1f}/s ({rps_change * 100:+6.1f}%)'
+              f'{"  ← 退步" if regressed else ""}')
+    return regressions
+
+
+# --- 主程式 ---
+
+def build_context(path, photo_dir, roster_path):
+    conn = sqlite3.connect(path)
+    students = {}
+    for student_db_id, class_name in conn.execute('SELECT id, class_name FROM students ORDER BY class_name, student_id'):
+        students.setdefault(class_name, []).append(student_db_id)
+    leaf_items = [row[0] for row in conn.execute(
+        'SELECT id FROM grade_items WHERE id NOT IN (SELECT parent_id FROM grade_items WHERE parent_id IS NOT NULL)')]
+    conn.close()
+    with open(roster_path, 'rb') as f:
+        roster = f.read()
+    return {
+        'classes': sorted(students),
+        'students': students,
+        'leaf_items': leaf_items,
+        'photos': sorted(os.listdir(photo_dir)),
+        'roster': roster,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='教師系統基準測試套件')
+    parser.add_argument('--classes', type=int, default=15, help='班級數')
+    parser.add_argument('--class-size', type=int, default=30, help='每班人數')
+    parser.add_argument('--items', type=int, default=20, help='成績項目數')
+    parser.add_argument('--days', type=int, default=90, help='點名天數')
+    parser.add_argument('--requests', type=int, default=200, help='test client 每個情境的請求數')
+    parser.add_argument('--clients', type=int, default=8, help='waitress 並行用戶端數')
+    parser.add_argument('--requests-per-client', type=int, default=25, help='waitress 每個用戶端的請求數')
+    parser.add_argument('--threads', type=int, default=4, help='waitress 工作執行緒數')
+    parser.add_argument('--import-requests', type=int, default=3, help='Excel 匯入的請求數')
+    parser.add_argument('--scenarios', help='只執行指定的情境 (以逗號分隔)')
+    parser.add_argument('--seed', type=int, default=2026)
+    parser.add_argument('--save', help='將結果存成 JSON 基準檔')
+    parser.add_argument('--compare', help='與 JSON 基準檔比較')
+    parser.add_argument('--threshold', type=float, default=0.2, help='判定退步的比例門檻')
+    args = parser.parse_args()
+
+    import app as teacher_app
+    from photo_index import PhotoIndex
+    app = teacher_app.app
+
+    selected = set(args.scenarios.split(',')) if args.scenarios else None
+    scenarios = [s for s in SCENARIOS if selected is None or s[0] in selected]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'school.db')
+        photo_dir = os.path.join(tmp, 'photos')
+        roster_path = os.path.join(tmp, 'roster.xlsx')
+
+        start = time.perf_counter()
+        school = generate_school(path, args.classes, args.class_size, args.items, args.days, seed=args.seed)
+        photos = write_photo_stubs(photo_dir, path, seed=args.seed)
+        write_roster_workbook(roster_path, path)
+        print(f'合成學校: {len(school["classes"])} 個班級、{school["students"]} 位學生、'
+              f'{school["grade_items"]} 個成績項目、{school["days"]} 天點名、{photos} 張照片 '
+              f'({time.perf_counter() - start:.1f} 秒)')
+
+        use_database(path)
+        app.config['PHOTO_FOLDER'] = photo_dir
+        app.config['THUMBNAIL_FOLDER'] = os.path.join(tmp, 'thumbnails')
+        app.config['UPLOAD_FOLDER'] = tmp
+        teacher_app.photo_index = PhotoIndex(photo_dir)
+        context = build_context(path, photo_dir, roster_path)
+
+        results = {}
+        print(f'\n{"項目":<40} {"請求":>6} {"錯誤":>4} {"p50":>8} {"p95":>8} {"p99":>8} {"吞吐量/s":>9}')
+
+        def report(key, result):
+            results[key] = result
+            print(f'{key:<40} {result["requests"]:6d} {result["errors"]:4d} {result["p50_ms"]:8.2f} '
+                  f'{result["p95_ms"]:8.2f} {result["p99_ms"]:8.2f} {result["throughput_rps"]:9.1f}')
+
+        rng = random.Random(args.seed)
+        with WaitressServer(app, args.threads) as server:
+            cookie = _login(server.port)
+            for name, make_request, concurrent in scenarios:
+                n = args.requests if concurrent else args.import_requests
+                report(f'test_client/{name}', run_in_process(app, make_request, context, n, rng))
+                if concurrent:
+                    report(f'waitress/{name} x{args.clients}', run_waitress(
+                        server.port, cookie, make_request, context, args.clients, args.requests_per_client, args.seed))
+                else:
+                    report(f'waitress/{name} x1', run_waitress(
+                        server.port, cookie, make_request, context, 1, args.import_requests, args.seed))
+        db.close_db_connection()
+
+    output = {
+        'environment': environment(),
+        'parameters': {k: v for k, v in vars(args).items() if k not in ('save', 'compare')},
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+        print(f'\n結果已存至 {args.save}')
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('parameters') != output['parameters']:
+            print('警告：基準檔的測試參數與本次不同，比較結果僅供參考。')
+        return 1 if compare(baseline, results, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+合成學校資料產生器：在指定的資料庫建立班級、學生、成績項目、一學期的成績與點名紀錄，
+並可產生學生照片檔 (小尺寸 JPEG) 與匯入用的 Excel 名單。
+相同的參數與亂數種子永遠產生相同的資料，基準測試結果才能互相比較。
+
+用法: python benchmarks/synthetic_school.py 輸出資料庫路徑 [班級數] [每班人數]
+"""
+import datetime
+import os
+import random
+import sqlite3
+import sys
+
+from common import create_schema
+
+SURNAMES = '陳林黃張李王吳劉蔡楊許鄭謝郭洪曾邱廖賴周徐蘇葉莊呂江何蕭羅高潘簡朱鍾彭游詹胡施沈余盧梁趙顏柯翁魏'
+GIVEN_CHARS = '宥承宸睿恩妍晴宇翔佑庭芯安瑜心廷柏彥婕涵品昀翊冠欣語嘉子芷萱軒哲凱俊博'
+
+STATUS_WEIGHTS = (('出席', 930), ('遲到', 30), ('事假', 12), ('病假', 20), ('曠課', 8))
+NOTES = ('上課專心', '主動幫忙', '忘記帶作業', '上課聊天', '表現優良', '協助整理教室')
+
+SEMESTER_START = datetime.date(2026, 9, 1)
+
+
+def school_days(n_days, start=SEMESTER_START):
+    """ 從 start 起的 n_days 個上課日 (週一到週五) """
+    days = []
+    day = start
+    while len(days) < n_days:
+        if day.weekday() < 5:
+            days.append(day.isoformat())
+        day += datetime.timedelta(days=1)
+    return days
+
+
+def make_students(n_classes, class_size, rng):
+    """
+    產生 (學號, 姓名, 班級, 帳號) 列表.
+    班級平均分配在七、八、九年級，學號開頭為入學年度 (民國年)。
+    """
+    students = []
+    per_grade = -(-n_classes // 3)
+    for index in range(n_classes):
+        grade = 7 + index // per_grade
+        class_name = f'{grade}{index % per_grade + 1:02d}'
+        entry_year = 115 - (grade - 6)
+        for seat in range(class_size):
+            student_id = f'{entry_year}{(index % per_grade) * class_size + seat + 1:04d}'
+            name = rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN_CHARS) for _ in range(2))
+            students.append((student_id, name, class_name, f's{student_id}'))
+    return students
+
+
+def make_grade_items(n_items):
+    """
+    產生成績項目 (id, 名稱, 類型, parent_id, 佔比).
+    約每 10 項有一次段考 (定期評量)；平時評量中「小考」為父項目，其後的小考為子項目。
+    """
+    items = []
+    quiz_parent = None
+    for item_id in range(1, n_items + 1):
+        if item_id % 10 == 0:
+            items.append((item_id, f'第{item_id // 10}次段考', '定期評量', None, None))
+        elif item_id % 10 == 1:
+            quiz_parent = item_id
+            items.append((item_id, f'小考{item_id // 10 + 1}', '平時評量', None, 60))
+        elif item_id % 10 in (2, 3, 4, 5):
+            items.append((item_id, f'小考{item_id // 10 + 1}-{item_id % 10 - 1}', '平時評量', quiz_parent, None))
+        else:
+            items.append((item_id, f'作業{item_id}', '平時評量', None, 40))
+    return items
+
+
+def _write_records(conn, student_db_ids, items, days, rng):
+    """ 寫入一學期的成績 (每位學生每個可評分項目，約 5% 缺考) 與 days 每天的點名紀錄 """
+    ability = [rng.gauss(75, 12) for _ in student_db_ids]
+    graded_items = [item for item in items if not any(child[3] == item[0] for child in items)]
+    conn.executemany(
+        'INSERT INTO grades (student_db_id, item_id, score) VALUES (?, ?, ?)',
+        ((student_db_id, item[0], max(0, min(100, round(level + rng.gauss(0, 10)))))
+         for student_db_id, level in zip(student_db_ids, ability) for item in graded_items if rng.random() < 0.95)
+    )
+
+    statuses = [status for status, _ in STATUS_WEIGHTS]
+    weights = [weight for _, weight in STATUS_WEIGHTS]
+    conn.executemany(
+        'INSERT INTO attendance (student_db_id, date, status, daily_performance_notes) VALUES (?, ?, ?, ?)',
+        ((student_db_id, day, rng.choices(statuses, weights)[0], rng.choice(NOTES) if rng.random() < 0.05 else '')
+         for day in days for student_db_id in student_db_ids)
+    )
+
+
+def generate_school(path, n_classes=20, class_size=30, n_items=20, n_days=90, seed=2026):
+    """
+    在 path 建立一所合成學校，回傳摘要 dict (班級列表、學生數等).
+    成績依每位學生的程度加上隨機變化，約 5% 缺考；點名紀錄涵蓋 n_days 個上課日。
+    """
+    rng = random.Random(seed)
+    create_schema(path)
+    students = make_students(n_classes, class_size, rng)
+    items = make_grade_items(n_items)
+    days = school_days(n_days)
+
+    conn = sqlite3.connect(path)
+    conn.executemany('INSERT INTO students (student_id, name, class_name, account) VALUES (?, ?, ?, ?)', students)
+    conn.executemany('INSERT INTO grade_items (id, name, type, parent_id, percentage) VALUES (?, ?, ?, ?, ?)', items)
+    _write_records(conn, list(range(1, len(students) + 1)), items, days, rng)
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+
+    return {
+        'classes': sorted({student[2] for student in students}),
+        'students': len(students),
+        'grade_items': len(items),
+        'days': len(days),
+    }
+
+
+def add_semester(path, n_days=90, start=SEMESTER_START, seed=2026):
+    """
+    在已有名單與成績項目的資料庫加入一學期的成績與點名紀錄 (例如封存上學期之後的新學期).
+    已有同一學生、同一項目的成績時會失敗，因此先封存或清空上學期的成績。
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    student_db_ids = [row[0] for row in conn.execute('SELECT id FROM students ORDER BY id')]
+    items = conn.execute('SELECT id, name, type, parent_id, percentage FROM grade_items ORDER BY id').fetchall()
+    _write_records(conn, student_db_ids, items, school_days(n_days, start), rng)
+    conn.commit()
+    conn.close()
+
+
+def write_photo_stubs(photo_dir, path, ratio=0.8, size=(300, 400), seed=2026):
+    """
+    依資料庫中的學生產生照片檔 ({學號}_{姓名}.jpg)，約 ratio 比例的學生有照片.
+    照片為單色 JPEG，只用於測試照片索引與縮圖產生。
+    """
+    from PIL import Image
+
+    rng = random.Random(seed)
+    os.makedirs(photo_dir, exist_ok=True)
+    conn = sqlite3.connect(path)
+    rows = conn.execute('SELECT student_id, name FROM students ORDER BY id').fetchall()
+    conn.close()
+    count = 0
+    for student_id, name in rows:
+        if rng.random() >= ratio:
+            continue
+        color = tuple(rng.randrange(256) for _ in range(3))
+        Image.new('RGB', size, color).save(os.path.join(photo_dir, f'{student_id}_{name}.jpg'), quality=85)
+        count += 1
+    return count
+
+
+def write_roster_workbook(workbook_path, path):
+    """ 將資料庫中的學生名單寫成匯入用的 Excel 檔 (與學校系統匯出的欄位相同) """
+    from openpyxl import Workbook
+
+    conn = sqlite3.connect(path)
+    rows = conn.execute('SELECT student_id, name, class_name, account FROM students ORDER BY id').fetchall()
+    conn.close()
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('學生名單')
+    sheet.append(['學號', '姓名', '班級', '帳號'])
+    for row in rows:
+        sheet.append(list(row))
+    workbook.save(workbook_path)
+    return len(rows)
+
+
+if __name__ == '__main__':
+    output = sys.argv[1] if len(sys.argv) > 1 else 'synthetic_school.db'
+    n_classes = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    class_size = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+    summary = generate_school(output, n_classes, class_size)
+    print(f'已建立 {output}: {len(summary["classes"])} 個班級、{summary["students"]} 位學生、'
+          f'{summary["grade_items"]} 個成績項目、{summary["days"]} 天點名紀錄')
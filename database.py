@@ -1,60 +1,423 @@
+import datetime
+import functools
+import logging
+import queue
 import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import ExitStack, contextmanager
 import bcrypt
+import migrations
 
 DATABASE_FILE = 'teacher_app.db'
 
-def get_db_connection():
-    """ 建立並返回一個帶有 row_factory 的資料庫連線，以便將結果作為字典返回 """
-    conn = sqlite3.connect(DATABASE_FILE)
+logger = logging.getLogger('teacher_app.database')
+
+# 每個連線建立時套用的 PRAGMA 設定
+# WAL 讓讀取不會被寫入阻擋；synchronous=NORMAL 在 WAL 下只在 checkpoint 時 fsync
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA cache_size = -16000',   # 約 16 MB 頁面快取
+    'PRAGMA mmap_size = 268435456', # 256 MB 記憶體映射
+    'PRAGMA temp_store = MEMORY',
+)
+
+_local = threading.local()
+
+# 資料變更的監聽函式 (例如快取)，於交易成功 commit 後才會被呼叫
+_change_listeners = []
+
+# 新連線建立後呼叫的函式 (例如效能統計)
+_connection_hooks = []
+
+# 送出寫入時在呼叫端執行緒呼叫的函式 (例如效能統計)，回傳寫入執行緒執行該筆寫入時要進入的 context manager
+_write_context_hooks = []
+
+def _open_connection(path):
+    """ 開啟新的資料庫連線並套用 PRAGMA 設定 """
+    # isolation_level=None: 交易由 transaction() 明確控制
+    conn = sqlite3.connect(path, isolation_level=None)
     conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    for hook in _connection_hooks:
+        hook(conn)
+    return conn
+
+def get_db_connection():
+    """
+    取得目前執行緒專屬的資料庫連線 (重複使用，不需關閉).
+    waitress 的每個工作執行緒會保留一條連線，避免每次查詢都重新連線。
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.path != DATABASE_FILE:
+        if conn is not None:
+            conn.close()
+        conn = _open_connection(DATABASE_FILE)
+        _local.conn = conn
+        _local.path = DATABASE_FILE
+        _local.tx_depth = 0
+        _local.pending_changes = []
     return conn
 
+def close_db_connection():
+    """ 關閉目前執行緒的資料庫連線 (用於腳本結束或切換資料庫檔案) """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+        _local.tx_depth = 0
+        _local.pending_changes = []
+
+def add_change_listener(listener):
+    """
+    註冊資料變更監聽函式 listener(event, payload).
+    event 為 'grades'、'attendance'、'seats'、'layout'、'students' 或 'grade_items'；只有在交易成功 commit 後才會通知。
+    """
+    _change_listeners.append(listener)
+
+def add_connection_hook(hook):
+    """ 註冊 hook(conn)，每條新連線建立並套用 PRAGMA 後呼叫 """
+    _connection_hooks.append(hook)
+
+def add_write_context_hook(hook):
+    """
+    註冊 hook()，每次把寫入交給寫入執行緒時在呼叫端執行緒呼叫.
+    回傳的 context manager (None 表示不需要) 會在寫入執行緒執行該筆寫入時進入，
+    例如讓寫入的 SQL 指令計入送出它的請求。
+    """
+    _write_context_hooks.append(hook)
+
+def _notify_change(event, payload=None):
+    """ 記錄一筆資料變更，待最外層交易 commit 後通知監聽函式 """
+    _local.pending_changes.append((event, payload))
+
+def _dispatch_changes():
+    """
+    交易 commit 後依序通知所有監聽函式.
+    資料已經 commit，監聽函式的錯誤只記錄下來，不影響其他監聽函式，也不讓寫入被當成失敗。
+    """
+    changes, _local.pending_changes = _local.pending_changes, []
+    for event, payload in changes:
+        for listener in _change_listeners:
+            try:
+                listener(event, payload)
+            except Exception:
+                logger.exception('資料變更 %s 的監聽函式 %r 失敗', event, listener)
+
+@contextmanager
+def transaction():
+    """
+    寫入交易範圍. 巢狀呼叫時會併入最外層的交易，只在最外層 commit 一次；
+    發生例外則整個交易 rollback。
+    使用 BEGIN IMMEDIATE 先取得寫入鎖，避免「先讀後寫」時因其他寫入者而失敗。
+    """
+    conn = get_db_connection()
+    depth = _local.tx_depth
+    if depth == 0:
+        conn.execute('BEGIN IMMEDIATE')
+    _local.tx_depth = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        _local.tx_depth = depth
+        if depth == 0:
+            conn.rollback()
+            _local.pending_changes = []
+        raise
+    _local.tx_depth = depth
+    if depth == 0:
+        try:
+            conn.commit()
+        except BaseException:
+            # COMMIT 失敗 (例如磁碟已滿) 時交易仍未結束，必須 rollback，之後的 BEGIN 才不會失敗
+            reset_transaction()
+            raise
+        _dispatch_changes()
+
+# --- 單一寫入執行緒 (group commit) ---
+# 多位老師同時寫入時，各自的連線會競爭 SQLite 的寫入鎖，可能等到逾時而出現 database is locked。
+# 寫入函式改交給單一寫入執行緒依序執行，同時到達的寫入合併在同一個交易中 commit。
+
+WRITE_QUEUE_ENABLED = True
+# 連續有寫入到達時，收集這段時間內的寫入一起 commit；單獨的寫入不等待
+GROUP_COMMIT_WINDOW = 0.002
+MAX_GROUP_SIZE = 100
+
+class _WriteQueue:
+    """
+    寫入佇列與寫入執行緒.
+    同一批寫入在同一個交易中執行，每筆寫入各有一個 SAVEPOINT：
+    某筆寫入失敗只會復原它自己，並把例外交給該呼叫者的 Future，其他寫入照常 commit。
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        # 收集批次時取出的獨佔寫入，留到下一輪單獨執行
+        self._held = None
+        self.batches = 0
+        self.writes = 0
+
+    def submit(self, func, args, kwargs, exclusive=False):
+        """ 送出寫入，回傳 Future；exclusive 為 True 時單獨執行且不包在交易中 """
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+        contexts = [context for context in (hook() for hook in _write_context_hooks) if context is not None]
+        self._queue.put((func, args, kwargs, future, exclusive, contexts))
+        return future
+
+    def is_writer_thread(self):
+        return threading.current_thread() is self._thread
+
+    def _collect(self, first, wait):
+        """ 取出同一批的寫入；wait 為 True 時最多等待 GROUP_COMMIT_WINDOW 秒讓更多寫入加入 """
+        batch = [first]
+        deadline = time.monotonic() + (GROUP_COMMIT_WINDOW if wait else 0)
+        while len(batch) < MAX_GROUP_SIZE:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[4]:
+                self._held = item
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        busy = False
+        while True:
+            first, self._held = self._held or self._queue.get(), None
+            if first[4]:
+                self._execute_exclusive(first)
+                busy = False
+                continue
+            batch = self._collect(first, busy)
+            # 上一批不只一筆代表正有多人同時寫入，下一批才值得等待
+            busy = len(batch) > 1
+            self._execute(batch)
+
+    @staticmethod
+    def _call(func, args, kwargs, contexts):
+        """ 在送出端登記的 context 中執行一筆寫入 """
+        with ExitStack() as stack:
+            for context in contexts:
+                stack.enter_context(context)
+            return func(*args, **kwargs)
+
+    def _execute_exclusive(self, item):
+        """ 獨佔寫入：不開交易直接執行，期間其他寫入在佇列中等候 """
+        func, args, kwargs, future, _, contexts = item
+        try:
+            result = self._call(func, args, kwargs, contexts)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            # 獨佔寫入自行管理交易，例外時可能留下未結束的交易
+            reset_transaction()
+
+    def _execute(self, batch):
+        results = []
+        try:
+            with transaction() as conn:
+                for func, args, kwargs, future, _, contexts in batch:
+                    pending = len(_local.pending_changes)
+                    conn.execute('SAVEPOINT queued_write')
+                    try:
+                        result = self._call(func, args, kwargs, contexts)
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO queued_write')
+                        conn.execute('RELEASE queued_write')
+                        del _local.pending_changes[pending:]
+                        results.append((future, None, e))
+                    else:
+                        conn.execute('RELEASE queued_write')
+                        results.append((future, result, None))
+        except Exception as e:
+            # BEGIN 或 COMMIT 失敗，整批寫入都沒有生效；結束未完成的交易，寫入執行緒才能繼續處理下一批
+            reset_transaction()
+            for _, _, _, future, _, _ in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.writes += len(batch)
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def stats(self):
+        """ 已 commit 的批次數與寫入數 """
+        return {'batches': self.batches, 'writes': self.writes}
+
+_write_queue = _WriteQueue()
+
+def _runs_inline():
+    """ 已在寫入執行緒或呼叫者自己的交易中時直接執行，維持原本的交易範圍 """
+    return (not WRITE_QUEUE_ENABLED or _write_queue.is_writer_thread()
+            or getattr(_local, 'tx_depth', 0) > 0)
+
+def queued_write(func):
+    """
+    寫入函式的裝飾器：交給寫入執行緒執行並等待結果 (例外也會在呼叫端拋出).
+    func.submit(...) 則不等待，直接回傳 concurrent.futures.Future。
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _runs_inline():
+            return func(*args, **kwargs)
+        return _write_queue.submit(func, args, kwargs).result()
+
+    def submit(*args, **kwargs):
+        if not _runs_inline():
+            return _write_queue.submit(func, args, kwargs)
+        future = Future()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    wrapper.submit = submit
+    return wrapper
+
+def exclusive_write(func):
+    """
+    需要獨佔資料庫的寫入 (例如 ATTACH 其他資料庫、VACUUM) 的裝飾器.
+    由寫入執行緒在交易之外單獨執行並等待結果；執行期間其他寫入在佇列中等候，不會穿插其中。
+    func 需自行以 transaction() 控制交易，不可在呼叫者的交易中使用。
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, 'tx_depth', 0) > 0:
+            raise RuntimeError(f'{func.__name__} 不可在交易中呼叫')
+        if not WRITE_QUEUE_ENABLED or _write_queue.is_writer_thread():
+            return func(*args, **kwargs)
+        return _write_queue.submit(func, args, kwargs, exclusive=True).result()
+
+    return wrapper
+
+def write_queue_stats():
+    """ 寫入執行緒的統計 (平均每批寫入數可看出合併的效果) """
+    return _write_queue.stats()
+
+def reset_transaction():
+    """ 請求結束時呼叫：若有未結束的交易 (例如例外中斷)，將其 rollback """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+    _local.tx_depth = 0
+    _local.pending_changes = []
+
+def upgrade_schema():
+    """ 將資料庫就地升級到最新結構版本，回傳套用的版本號列表 """
+    return migrations.migrate(get_db_connection())
+
 # --- 使用者與密碼相關 ---
 
 def verify_password(password):
     """ 驗證密碼是否正確 """
     conn = get_db_connection()
     setting = conn.execute('SELECT hashed_password FROM settings WHERE id = 1').fetchone()
-    conn.close()
     if setting:
         return bcrypt.checkpw(password.encode('utf-8'), setting['hashed_password'])
     return False
 
 def update_password(new_password):
-    """ 更新使用者密碼 """
-    hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
-    conn = get_db_connection()
-    conn.execute('UPDATE settings SET hashed_password = ? WHERE id = 1', (hashed_password,))
-    conn.commit()
-    conn.close()
+    """ 更新使用者密碼 (雜湊在呼叫端計算，不佔用寫入執行緒) """
+    _store_password_hash(bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()))
+
+@queued_write
+def _store_password_hash(hashed_password):
+    with transaction() as conn:
+        conn.execute('UPDATE settings SET hashed_password = ? WHERE id = 1', (hashed_password,))
 
 # --- 學生資料相關 ---
 
+def count_semester_data():
+    """ 目前資料庫 (尚未封存) 的成績與點名紀錄筆數，回傳 {'grades': 筆數, 'attendance': 筆數} """
+    conn = get_db_connection()
+    grades, attendance = conn.execute(
+        'SELECT (SELECT COUNT(*) FROM grades), (SELECT COUNT(*) FROM attendance)').fetchone()
+    return {'grades': grades, 'attendance': attendance}
+
+@queued_write
 def clear_students_data():
     """ 清空所有學生資料，用於重新匯入 """
-    conn = get_db_connection()
-    # 由於有外鍵關聯，需要先刪除關聯的資料
-    conn.execute('DELETE FROM grades')
-    conn.execute('DELETE FROM attendance')
-    conn.execute('DELETE FROM students')
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        # 由於有外鍵關聯，需要先刪除關聯的資料
+        conn.execute('DELETE FROM grades')
+        conn.execute('DELETE FROM attendance')
+        conn.execute('DELETE FROM students')
+        _notify_change('students')
 
+@queued_write
+def clear_semester_data():
+    """
+    清空本學期的成績與點名紀錄 (學期封存後使用)，保留學生名單、座位與成績項目給下學期.
+    出缺席月統計與全文檢索索引直接清空；刪除點名紀錄時暫時移除它的觸發器 (同一交易中重建)，
+    不必為每一筆紀錄執行觸發器。
+    """
+    with transaction() as conn:
+        conn.execute('DELETE FROM grades')
+        conn.execute('DELETE FROM attendance_monthly')
+        conn.execute('DELETE FROM notes_fts')
+        triggers = conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'attendance'").fetchall()
+        for name, _ in triggers:
+            conn.execute(f'DROP TRIGGER "{name}"')
+        conn.execute('DELETE FROM attendance')
+        for _, sql in triggers:
+            conn.execute(sql)
+        _notify_change('students')
+
+@queued_write
 def add_student(student_id, name, class_name, account):
     """ 新增單一學生資料 """
-    conn = get_db_connection()
-    conn.execute('INSERT INTO students (student_id, name, class_name, account) VALUES (?, ?, ?, ?)',
-                 (student_id, name, class_name, account))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('INSERT INTO students (student_id, name, class_name, account) VALUES (?, ?, ?, ?)',
+                     (student_id, name, class_name, account))
+        _notify_change('students')
+
+@queued_write
+def insert_students(rows):
+    """
+    批次新增學生資料，回傳新增筆數.
+    rows 是一個元組的可迭代物件: (student_id, name, class_name, account)
+    """
+    with transaction() as conn:
+        count = conn.executemany('INSERT INTO students (student_id, name, class_name, account) VALUES (?, ?, ?, ?)', rows).rowcount
+        _notify_change('students')
+    return count
     
 def get_all_classes():
     """ 取得所有不重複的班級名稱 """
     conn = get_db_connection()
     classes = conn.execute('SELECT DISTINCT class_name FROM students ORDER BY class_name').fetchall()
-    conn.close()
     return [c['class_name'] for c in classes]
 
+def get_student_classes(student_db_ids):
+    """ 查詢學生所屬的班級，回傳 {student_db_id: class_name} """
+    student_db_ids = list(student_db_ids)
+    if not student_db_ids:
+        return {}
+    placeholders = ','.join('?' for _ in student_db_ids)
+    conn = get_db_connection()
+    rows = conn.execute(f'SELECT id, class_name FROM students WHERE id IN ({placeholders})', student_db_ids).fetchall()
+    return {row['id']: row['class_name'] for row in rows}
+
 def get_all_students_for_class(class_name):
     """ 根據班級名稱取得所有學生，按學號排序 """
     conn = get_db_connection()
@@ -62,18 +425,32 @@ def get_all_students_for_class(class_name):
         'SELECT * FROM students WHERE class_name = ? ORDER BY student_id',
         (class_name,)
     ).fetchall()
-    conn.close()
     return students
 
+@queued_write
 def batch_update_seat_positions(assignments):
     """
     批次更新學生座位.
     assignments 是一個元組列表: (seat_row, seat_col, student_db_id)
     """
-    conn = get_db_connection()
-    conn.executemany('UPDATE students SET seat_row = ?, seat_col = ? WHERE id = ?', assignments)
-    conn.commit()
-    conn.close()
+    assignments = [(int(seat_row), int(seat_col), int(student_db_id)) for seat_row, seat_col, student_db_id in assignments]
+    with transaction() as conn:
+        conn.executemany('UPDATE students SET seat_row = ?, seat_col = ? WHERE id = ?', assignments)
+        _notify_change('seats', [(student_db_id, seat_row, seat_col) for seat_row, seat_col, student_db_id in assignments])
+
+@queued_write
+def assign_initial_seats(class_name, rows, cols):
+    """
+    班級學生還沒有被排過座位時 (例如剛切換佈局)，依學號順序排入 rows x cols 的座位.
+    已排過座位時不寫入。回傳班級學生 (含座位)。
+    """
+    with transaction():
+        students = get_all_students_for_class(class_name)
+        if students and students[0]['seat_row'] is None:
+            seats = [(r, c) for r in range(rows) for c in range(cols)]
+            batch_update_seat_positions([(r, c, student['id']) for student, (r, c) in zip(students, seats)])
+            students = get_all_students_for_class(class_name)
+    return students
 
 # --- 班級設定相關 ---
 
@@ -83,91 +460,350 @@ def get_class_settings(class_name):
     settings = conn.execute('SELECT * FROM class_settings WHERE class_name = ?', (class_name,)).fetchone()
     if not settings:
         # 如果沒有設定，就建立一個預設的
-        conn.execute('INSERT INTO class_settings (class_name, seating_layout) VALUES (?, ?)', (class_name, '6x6'))
-        conn.commit()
+        _create_class_settings(class_name)
         settings = conn.execute('SELECT * FROM class_settings WHERE class_name = ?', (class_name,)).fetchone()
-    conn.close()
     return settings
 
+@queued_write
+def _create_class_settings(class_name, layout='6x6'):
+    with transaction() as conn:
+        conn.execute('INSERT OR IGNORE INTO class_settings (class_name, seating_layout) VALUES (?, ?)', (class_name, layout))
+
+@queued_write
 def update_class_layout(class_name, layout):
     """ 更新班級的座位表佈局 """
-    conn = get_db_connection()
-    # 切換佈局時，同時清除所有座位安排，因為位置無法轉移
-    conn.execute('UPDATE students SET seat_row = NULL, seat_col = NULL WHERE class_name = ?', (class_name,))
-    conn.execute('UPDATE class_settings SET seating_layout = ? WHERE class_name = ?', (layout, class_name))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        # 切換佈局時，同時清除所有座位安排，因為位置無法轉移
+        conn.execute('UPDATE students SET seat_row = NULL, seat_col = NULL WHERE class_name = ?', (class_name,))
+        conn.execute('UPDATE class_settings SET seating_layout = ? WHERE class_name = ?', (layout, class_name))
+        _notify_change('layout', (class_name, layout))
 
+@queued_write
+def relayout_class(class_name, layout):
+    """
+    切換班級的座位表佈局，並在同一個交易中依學號重新排入座位 (佈局改變後原本的位置無法轉移).
+    回傳新的座位列表: [student_db_id, seat_row, seat_col]
+    """
+    rows, cols = map(int, layout.split('x'))
+    with transaction():
+        update_class_layout(class_name, layout)
+        students = assign_initial_seats(class_name, rows, cols)
+    return [[s['id'], s['seat_row'], s['seat_col']] for s in students if s['seat_row'] is not None]
 
 # --- 成績相關 ---
 
+@queued_write
 def add_grade_item(name, type, parent_id=None, percentage=None):
     """ 新增成績項目 """
-    conn = get_db_connection()
-    conn.execute('INSERT INTO grade_items (name, type, parent_id, percentage) VALUES (?, ?, ?, ?)',
-                 (name, type, parent_id, percentage))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('INSERT INTO grade_items (name, type, parent_id, percentage) VALUES (?, ?, ?, ?)',
+                     (name, type, parent_id, percentage))
+        _notify_change('grade_items')
 
 def get_grade_items():
     """ 取得所有成績項目 """
     conn = get_db_connection()
     items = conn.execute('SELECT * FROM grade_items ORDER BY type, name').fetchall()
-    conn.close()
     return items
 
 def get_student_grades_by_item(student_db_ids, item_id):
     """ 根據學生ID列表和成績項目ID取得成績 """
-    conn = get_db_connection()
     # 建立一個 {student_id: score} 的字典
     grades = {}
     if not student_db_ids:
         return grades
         
+    conn = get_db_connection()
     placeholders = ','.join('?' for _ in student_db_ids)
     query = f'SELECT student_db_id, score FROM grades WHERE item_id = ? AND student_db_id IN ({placeholders})'
     
-    params = [item_id] + student_db_ids
+    params = [item_id] + list(student_db_ids)
     results = conn.execute(query, params).fetchall()
     
     for row in results:
         grades[row['student_db_id']] = row['score']
         
-    conn.close()
     return grades
 
+def get_class_grade_rows(class_name=None):
+    """
+    以單一查詢取得班級 (未指定時為全校) 所有學生及其成績，用於計算學期成績.
+    回傳元組列表: (student_db_id, student_id, name, class_name, item_id, score)
+    沒有任何成績的學生也會出現一次，其 item_id 與 score 為 None。
+    """
+    # 大量資料直接取回元組，省去逐列建立 sqlite3.Row 的成本
+    cursor = get_db_connection().cursor()
+    cursor.row_factory = None
+    query = ('SELECT s.id, s.student_id, s.name, s.class_name, g.item_id, g.score '
+             'FROM students s LEFT JOIN grades g ON g.student_db_id = s.id AND g.score IS NOT NULL')
+    if class_name is None:
+        return cursor.execute(query).fetchall()
+    return cursor.execute(query + ' WHERE s.class_name = ?', (class_name,)).fetchall()
+
+def iter_grade_rows_by_class(class_name=None, batch_size=1000):
+    """
+    依班級、學號順序逐批讀出學生及其成績 (串流匯出用，不會一次載入全部資料).
+    產生元組: (student_db_id, student_id, name, class_name, item_id, score)
+    """
+    cursor = get_db_connection().cursor()
+    cursor.row_factory = None
+    query = ('SELECT s.id, s.student_id, s.name, s.class_name, g.item_id, g.score '
+             'FROM students s LEFT JOIN grades g ON g.student_db_id = s.id AND g.score IS NOT NULL')
+    if class_name is None:
+        cursor.execute(query + ' ORDER BY s.class_name, s.student_id')
+    else:
+        cursor.execute(query + ' WHERE s.class_name = ? ORDER BY s.student_id', (class_name,))
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
 def update_or_insert_grade(student_db_id, item_id, score):
     """ 新增或更新一個學生的成績 """
-    conn = get_db_connection()
-    # 檢查成績是否已存在
-    existing = conn.execute('SELECT id FROM grades WHERE student_db_id = ? AND item_id = ?', 
-                            (student_db_id, item_id)).fetchone()
-    
-    if score == '' or score is None:
-        # 如果分數是空的，則刪除紀錄
-        if existing:
-            conn.execute('DELETE FROM grades WHERE id = ?', (existing['id'],))
-    else:
-        if existing:
-            conn.execute('UPDATE grades SET score = ? WHERE id = ?', (score, existing['id']))
-        else:
-            conn.execute('INSERT INTO grades (student_db_id, item_id, score) VALUES (?, ?, ?)',
-                         (student_db_id, item_id, score))
-    conn.commit()
-    conn.close()
+    batch_update_grades([(student_db_id, item_id, score)])
+
+@queued_write
+def batch_update_grades(changes):
+    """
+    在單一交易中批次新增、更新或刪除成績.
+    changes 是一個元組列表: (student_db_id, item_id, score)；score 為空時刪除該筆成績。
+    同一格成績出現多次時以最後一次為準。回傳處理的成績格數。
+    """
+    latest = {}
+    for student_db_id, item_id, score in changes:
+        latest[(int(student_db_id), int(item_id))] = None if (score == '' or score is None) else float(score)
+
+    deletes = [key for key, score in latest.items() if score is None]
+    upserts = [(s, i, score) for (s, i), score in latest.items() if score is not None]
+
+    with transaction() as conn:
+        if deletes:
+            conn.executemany('DELETE FROM grades WHERE student_db_id = ? AND item_id = ?', deletes)
+        if upserts:
+            conn.executemany(
+                'INSERT INTO grades (student_db_id, item_id, score) VALUES (?, ?, ?) '
+                'ON CONFLICT (student_db_id, item_id) DO UPDATE SET score = excluded.score',
+                upserts
+            )
+        _notify_change('grades', [(s, i, score) for (s, i), score in latest.items()])
+    return len(latest)
     
-# --- 點名與日常表現相關 (此處僅為範例，需擴充) ---
+# --- 點名與日常表現相關 ---
+
+ATTENDANCE_STATUSES = ('出席', '遲到', '事假', '病假', '曠課')
+
+def _month_of(day):
+    return f'{day.year:04d}-{day.month:02d}'
+
+def _split_month_range(start_date=None, end_date=None):
+    """
+    將日期區間拆成「完整月份」與「不足一個月的零頭日期」.
+    回傳 (第一個完整月份, 最後一個完整月份, [(起日, 迄日), ...])；月份為 'YYYY-MM'，None 表示不設限。
+    """
+    start = datetime.date.fromisoformat(start_date) if start_date else None
+    end = datetime.date.fromisoformat(end_date) if end_date else None
+    first_month = last_month = None
+    partial_ranges = []
+
+    if start is not None:
+        first_month = _month_of(start)
+        if start.day != 1:
+            # 起日所在月份只取一部分，由原始紀錄計算
+            next_month = (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+            range_end = next_month - datetime.timedelta(days=1)
+            if end is not None and end < range_end:
+                range_end = end
+            if start <= range_end:
+                partial_ranges.append((start.isoformat(), range_end.isoformat()))
+            first_month = _month_of(next_month)
+
+    if end is not None:
+        last_month = _month_of(end)
+        if (end + datetime.timedelta(days=1)).day != 1:
+            # 迄日所在月份只取一部分；若與起日同月且已列入上面的零頭就不重複計算
+            month_start = end.replace(day=1)
+            if start is None or start <= month_start:
+                partial_ranges.append((month_start.isoformat(), end.isoformat()))
+            last_month = _month_of(month_start - datetime.timedelta(days=1))
+
+    return first_month, last_month, partial_ranges
+
+@queued_write
+def rebuild_attendance_rollup():
+    """ 由原始點名紀錄重新產生出缺席月統計表，回傳統計列數 """
+    with transaction() as conn:
+        for sql in migrations.REBUILD_ATTENDANCE_MONTHLY:
+            conn.execute(sql)
+        return conn.execute('SELECT COUNT(*) FROM attendance_monthly').fetchone()[0]
+
+def iter_attendance_stats(class_name=None, start_date=None, end_date=None, batch_size=1000):
+    """
+    依班級、學號順序逐批讀出每位學生各出缺席狀態的次數.
+    產生元組: (class_name, student_id, name, 出席, 遲到, 事假, 病假, 曠課)
+    完整月份讀取 attendance_monthly 統計表，只有起訖日期所在、未涵蓋整個月的部分才讀取原始點名紀錄，
+    因此查詢時間不會隨學期天數增加。
+    """
+    first_month, last_month, partial_ranges = _split_month_range(start_date, end_date)
+    # 指定班級時，每個來源都先篩選該班學生，才能使用以 student_db_id 開頭的索引
+    student_filter = []
+    if class_name is not None:
+        student_filter.append(('student_db_id IN (SELECT id FROM students WHERE class_name = ?)', class_name))
+
+    sources, params = [], []
+    def add_source(select, conditions):
+        where = ' AND '.join(sql for sql, _ in conditions) or '1'
+        sources.append(f'{select} WHERE {where}')
+        params.extend(value for _, value in conditions)
+
+    if first_month is None or last_month is None or first_month <= last_month:
+        month_conditions = []
+        if first_month is not None:
+            month_conditions.append(('month >= ?', first_month))
+        if last_month is not None:
+            month_conditions.append(('month <= ?', last_month))
+        add_source('SELECT student_db_id, status, count FROM attendance_monthly', student_filter + month_conditions)
+    for range_start, range_end in partial_ranges:
+        add_source('SELECT student_db_id, status, 1 AS count FROM attendance',
+                   student_filter + [('date >= ?', range_start), ('date <= ?', range_end)])
+    if not sources:
+        # 起日晚於迄日，沒有任何紀錄
+        sources.append('SELECT student_db_id, status, count FROM attendance_monthly WHERE 0')
+
+    counts = ', '.join(f"SUM(CASE WHEN status = '{status}' THEN count ELSE 0 END) AS c{i}"
+                       for i, status in enumerate(ATTENDANCE_STATUSES))
+    columns = ', '.join(f'COALESCE(c.c{i}, 0)' for i in range(len(ATTENDANCE_STATUSES)))
+    query = (f'SELECT s.class_name, s.student_id, s.name, {columns} FROM students s '
+             f'LEFT JOIN (SELECT student_db_id, {counts} FROM ({" UNION ALL ".join(sources)}) '
+             f'GROUP BY student_db_id) c ON c.student_db_id = s.id')
+    if class_name is not None:
+        query += ' WHERE s.class_name = ?'
+        params.append(class_name)
+    query += ' ORDER BY s.class_name, s.student_id'
+
+    cursor = get_db_connection().cursor()
+    cursor.row_factory = None
+    cursor.execute(query, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
+def get_class_attendance(class_name, date):
+    """
+    以單一查詢取得班級某一天的點名表 (含尚未點名的學生)，按學號排序.
+    尚未點名的學生其 status 與 notes 為 None。
+    """
+    conn = get_db_connection()
+    return conn.execute(
+        'SELECT s.id, s.student_id, s.name, a.status, a.daily_performance_notes AS notes '
+        'FROM students s LEFT JOIN attendance a ON a.student_db_id = s.id AND a.date = ? '
+        'WHERE s.class_name = ? ORDER BY s.student_id',
+        (date, class_name)
+    ).fetchall()
+
+@queued_write
+def batch_record_attendance(date, records):
+    """
+    在單一交易中紀錄多位學生同一天的出缺席狀況.
+    records 是一個元組列表: (student_db_id, status, notes)；已有紀錄時更新，否則新增。
+    """
+    rows = [(int(student_db_id), date, status, notes or '') for student_db_id, status, notes in records]
+    with transaction() as conn:
+        conn.executemany(
+            'INSERT INTO attendance (student_db_id, date, status, daily_performance_notes) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (student_db_id, date) DO UPDATE SET '
+            'status = excluded.status, daily_performance_notes = excluded.daily_performance_notes',
+            rows
+        )
+        _notify_change('attendance', rows)
+    return len(rows)
 
 def record_attendance(student_db_id, date, status, notes=""):
     """ 紀錄單一學生的出缺席狀況 """
-    conn = get_db_connection()
-    # 檢查當天是否已有紀錄，若有則更新，否則新增
-    existing = conn.execute('SELECT id FROM attendance WHERE student_db_id = ? AND date = ?', (student_db_id, date)).fetchone()
-    if existing:
-        conn.execute('UPDATE attendance SET status = ?, daily_performance_notes = ? WHERE id = ?', (status, notes, existing['id']))
+    batch_record_attendance(date, [(student_db_id, status, notes)])
+
+# --- 全文檢索 ---
+# students_fts / notes_fts 以 trigram 建立索引 (結構版本 4)，由觸發器與資料表同步。
+# 三個字元以上的關鍵字使用索引；一兩個字的關鍵字 (例如兩個字的名字) 無法用 trigram 索引，改以 LIKE 比對：
+# 學生直接比對學生表 (很小)，備註則比對只含非空白紀錄的檢索表，仍比掃描整個點名表快。
+
+SEARCH_MAX_TERMS = 5
+SEARCH_MAX_LIMIT = 100
+
+def _search_terms(query):
+    """ 以空白分隔的關鍵字 (全部都需符合) """
+    return [term for term in (query or '').split() if term][:SEARCH_MAX_TERMS]
+
+def _search_condition(table, like_columns, terms):
+    """
+    產生 WHERE 條件與參數.
+    長關鍵字合併成一個 MATCH 使用 table 的索引，短關鍵字以 LIKE 比對 like_columns 中的任一欄位。
+    """
+    conditions, params = [], []
+    long_terms = [term for term in terms if len(term) >= 3]
+    if long_terms:
+        # 每個關鍵字以雙引號包成片語，避免被當成 FTS5 查詢語法
+        conditions.append(f'{table} MATCH ?')
+        params.append(' '.join('"{}"'.format(term.replace('"', '""')) for term in long_terms))
+    for term in terms:
+        if len(term) < 3:
+            pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            conditions.append('(' + ' OR '.join(f"{column} LIKE ? ESCAPE '\\'" for column in like_columns) + ')')
+            params.extend([pattern] * len(like_columns))
+    return ' AND '.join(conditions), params
+
+def _search_limit(limit):
+    return max(1, min(int(limit), SEARCH_MAX_LIMIT))
+
+def _excerpt(text, terms, width=40):
+    """ 擷取第一個關鍵字附近的文字 """
+    lowered = text.lower()
+    positions = [lowered.find(term.lower()) for term in terms]
+    position = min((p for p in positions if p >= 0), default=0)
+    start = max(0, position - width // 4)
+    end = start + width
+    return ('…' if start else '') + text[start:end] + ('…' if end < len(text) else '')
+
+def search_students(query, limit=20):
+    """ 以姓名、學號或帳號搜尋全校學生 (子字串比對，不分大小寫) """
+    terms = _search_terms(query)
+    if not terms:
+        return []
+    if any(len(term) >= 3 for term in terms):
+        where, params = _search_condition('students_fts', ('s.name', 's.student_id', 's.account'), terms)
+        source = 'students_fts CROSS JOIN students s ON s.id = students_fts.rowid'
     else:
-        conn.execute('INSERT INTO attendance (student_db_id, date, status, daily_performance_notes) VALUES (?, ?, ?, ?)',
-                     (student_db_id, date, status, notes))
-    conn.commit()
-    conn.close()
+        where, params = _search_condition(None, ('s.name', 's.student_id', 's.account'), terms)
+        source = 'students s'
+    conn = get_db_connection()
+    rows = conn.execute(
+        f'SELECT s.id, s.student_id, s.name, s.class_name, s.account FROM {source} '
+        f'WHERE {where} ORDER BY s.class_name, s.student_id LIMIT ?',
+        params + [_search_limit(limit)]
+    ).fetchall()
+    return [dict(row) for row in rows]
 
+def search_notes(query, limit=20):
+    """ 搜尋日常表現紀錄，新的在前；每筆附上學生資料與關鍵字附近的摘錄 """
+    terms = _search_terms(query)
+    if not terms:
+        return []
+    where, params = _search_condition('notes_fts', ('notes_fts.notes',), terms)
+    conn = get_db_connection()
+    rows = conn.execute(
+        'SELECT a.id, a.date, a.status, a.daily_performance_notes AS notes, '
+        's.id AS student_db_id, s.student_id, s.name, s.class_name '
+        'FROM notes_fts CROSS JOIN attendance a ON a.id = notes_fts.rowid '
+        'JOIN students s ON s.id = a.student_db_id '
+        f'WHERE {where} ORDER BY a.date DESC LIMIT ?',
+        params + [_search_limit(limit)]
+    ).fetchall()
+    return [dict(row, excerpt=_excerpt(row['notes'], terms)) for row in rows]
@@ -0,0 +1,270 @@
+import asyncio
+import collections
+import json
+import logging
+import re
+import threading
+import uuid
+from http.cookies import SimpleCookie
+from urllib.parse import unquote, urlsplit
+
+import database as db
+
+logger = logging.getLogger('teacher_app.events')
+
+# --- 即時更新推播設定 (Server-Sent Events) ---
+# waitress 的每個請求都佔用一個工作執行緒，長時間開著的 SSE 連線會把工作執行緒用光；
+# 因此推播由獨立的連接埠提供，所有連線都由同一個執行緒的 asyncio 事件迴圈持有，閒置的連線不佔用任何執行緒
+EVENTS_PORT = 8081
+# 沒有事件時定期送出註解，避免連線被防火牆或瀏覽器視為閒置而中斷
+KEEPALIVE_INTERVAL = 15
+# 連線中斷後瀏覽器重新連線的等待時間 (毫秒)
+RETRY_MS = 3000
+MAX_SUBSCRIBERS = 500
+# 每條連線尚未送出的事件上限，超過時中斷該連線 (瀏覽器重新連線後由最近的事件補送)
+SUBSCRIBER_QUEUE_SIZE = 256
+# 保留最近的事件，供重新連線的瀏覽器依 Last-Event-ID 補送
+REPLAY_EVENTS = 1000
+REQUEST_TIMEOUT = 5
+MAX_HEADER_BYTES = 16 * 1024
+
+EVENTS_PATH = re.compile(r'^/api/class/([^/]+)/events$')
+
+
+class _Subscriber:
+    """ 一條 SSE 連線 """
+
+    def __init__(self, class_name, task):
+        self.class_name = class_name
+        self.queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self.task = task
+
+
+class EventBroadcaster:
+    """
+    班級即時更新的推播伺服器.
+    publish() 可在任何執行緒呼叫；事件依班級送給訂閱該班級的連線 (class_name 為 None 時送給所有連線)。
+    authenticate(cookie_header) 回傳 False 時拒絕連線。
+    """
+
+    def __init__(self, authenticate=None):
+        self.authenticate = authenticate
+        self.epoch = uuid.uuid4().hex[:8]
+        self.port = None
+        self.published = 0
+        self.dropped = 0
+        self._loop = None
+        self._thread = None
+        self._seq = 0
+        self._history = collections.deque(maxlen=REPLAY_EVENTS)
+        self._subscribers = set()
+
+    @property
+    def running(self):
+        return self._loop is not None
+
+    def start(self, host='0.0.0.0', port=EVENTS_PORT):
+        """ 在背景執行緒啟動推播伺服器並回傳實際的連接埠；無法監聽時拋出 OSError """
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                server = loop.run_until_complete(
+                    asyncio.start_server(self._handle, host, port, limit=MAX_HEADER_BYTES))
+            except OSError as e:
+                errors.append(e)
+                loop.close()
+                ready.set()
+                return
+            self.port = server.sockets[0].getsockname()[1]
+            self._loop = loop
+            ready.set()
+            try:
+                loop.run_forever()
+            finally:
+                server.close()
+                tasks = asyncio.all_tasks(loop)
+                for task in tasks:
+                    task.cancel()
+                loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+                loop.close()
+
+        self._thread = threading.Thread(target=run, name='sse-broadcast', daemon=True)
+        self._thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+        return self.port
+
+    def stop(self):
+        """ 關閉所有連線並停止推播伺服器 """
+        loop, self._loop = self._loop, None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join(timeout=5)
+
+    def publish(self, class_name, event, data):
+        """ 推播一個事件 (執行緒安全)；伺服器未啟動時不做任何事 """
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._broadcast, class_name, event, data)
+
+    def stats(self):
+        """ 目前的連線數與推播統計 """
+        return {'subscribers': len(self._subscribers), 'published': self.published, 'dropped': self.dropped}
+
+    # --- 以下在事件迴圈的執行緒中執行 ---
+
+    def _frame(self, seq, event, data):
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        return f'id: {self.epoch}-{seq}\nevent: {event}\ndata: {payload}\n\n'.encode('utf-8')
+
+    def _broadcast(self, class_name, event, data):
+        self._seq += 1
+        self.published += 1
+        frame = self._frame(self._seq, event, data)
+        self._history.append((self._seq, class_name, frame))
+        for subscriber in list(self._subscribers):
+            if class_name is not None and subscriber.class_name != class_name:
+                continue
+            try:
+                subscriber.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # 讀取太慢的連線直接中斷，瀏覽器重新連線時會補送
+                self.dropped += 1
+                self._subscribers.discard(subscriber)
+                subscriber.task.cancel()
+
+    def _replay(self, last_event_id, class_name):
+        """ 重新連線時需補送的事件；無法補送 (伺服器已重新啟動或事件已被移出) 時回傳 None """
+        epoch, _, seq = last_event_id.partition('-')
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self._seq:
+            return None
+        seq = int(seq)
+        if seq < self._seq and (not self._history or self._history[0][0] > seq + 1):
+            return None
+        return [frame for event_seq, event_class, frame in self._history
+                if event_seq > seq and (event_class is None or event_class == class_name)]
+
+    async def _handle(self, reader, writer):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), REQUEST_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+
+        lines = head.decode('latin-1').split('\r\n')
+        request_line = lines[0].split(' ')
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        match = EVENTS_PATH.match(urlsplit(request_line[1]).path) if len(request_line) == 3 else None
+
+        # 推播使用另一個連接埠，瀏覽器視為跨來源請求；只接受來自同一台主機的頁面
+        origin = headers.get('origin')
+        if origin and urlsplit(origin).hostname != urlsplit(f'//{headers.get("host", "")}').hostname:
+            return await self._reject(writer, '403 Forbidden')
+        cors = (f'Access-Control-Allow-Origin: {origin}\r\nAccess-Control-Allow-Credentials: true\r\n'
+                'Vary: Origin\r\n' if origin else '')
+        if request_line[0] != 'GET' or match is None:
+            return await self._reject(writer, '404 Not Found', cors)
+        if self.authenticate is not None and not self.authenticate(headers.get('cookie', '')):
+            return await self._reject(writer, '401 Unauthorized', cors)
+        if len(self._subscribers) >= MAX_SUBSCRIBERS:
+            return await self._reject(writer, '503 Service Unavailable', cors)
+
+        class_name = unquote(match.group(1))
+        subscriber = _Subscriber(class_name, asyncio.current_task())
+        self._subscribers.add(subscriber)
+        try:
+            writer.write(('HTTP/1.1 200 OK\r\n'
+                          'Content-Type: text/event-stream; charset=utf-8\r\n'
+                          'Cache-Control: no-cache\r\n'
+                          f'{cors}\r\n'
+                          f'retry: {RETRY_MS}\n\n').encode('utf-8'))
+            last_event_id = headers.get('last-event-id')
+            frames = self._replay(last_event_id, class_name) if last_event_id else []
+            if frames is None:
+                # 無法補送：通知頁面重新載入資料
+                frames = [self._frame(self._seq, 'resync', {})]
+            elif not frames:
+                # 先送出目前的事件編號，之後斷線重連時才知道要從哪裡補送
+                frames = [f'id: {self.epoch}-{self._seq}\n\n'.encode('ascii')]
+            writer.writelines(frames)
+            await writer.drain()
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    frame = b': keepalive\n\n'
+                writer.write(frame)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._subscribers.discard(subscriber)
+            writer.close()
+
+    async def _reject(self, writer, status, extra_headers=''):
+        writer.write(f'HTTP/1.1 {status}\r\nContent-Length: 0\r\nConnection: close\r\n{extra_headers}\r\n'.encode('latin-1'))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    # --- 資料變更通知 ---
+
+    def on_change(self, event, payload):
+        """ database.py 的資料變更通知：轉成每個班級的小量更新事件 """
+        if not self.running:
+            return
+        try:
+            if event in ('grades', 'attendance', 'seats'):
+                classes = db.get_student_classes({row[0] for row in payload})
+                by_class = collections.defaultdict(list)
+                for row in payload:
+                    if row[0] in classes:
+                        by_class[classes[row[0]]].append(list(row))
+                for class_name, rows in by_class.items():
+                    self.publish(class_name, event, {'changes': rows})
+            elif event == 'layout':
+                class_name, layout = payload
+                self.publish(class_name, 'layout', {'layout': layout})
+            else:
+                # 名單或成績項目變動影響所有班級
+                self.publish(None, event, {})
+        except Exception:
+            logger.exception('推播資料變更 %s 失敗', event)
+
+
+def flask_session_checker(app):
+    """ 以 Flask 的 session cookie 判斷是否已登入，供推播伺服器驗證連線 """
+
+    def authenticate(cookie_header):
+        cookie = SimpleCookie()
+        try:
+            cookie.load(cookie_header)
+        except Exception:
+            return False
+        morsel = cookie.get(app.config['SESSION_COOKIE_NAME'])
+        if morsel is None:
+            return False
+        serializer = app.session_interface.get_signing_serializer(app)
+        try:
+            session = serializer.loads(morsel.value, max_age=int(app.permanent_session_lifetime.total_seconds()))
+        except Exception:
+            return False
+        return bool(session.get('logged_in'))
+
+    return authenticate
+
+
+# 應用程式共用的推播伺服器 (由 app.py 啟動)
+broadcaster = EventBroadcaster()
+db.add_change_listener(broadcaster.on_change)
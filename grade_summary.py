@@ -0,0 +1,231 @@
+import numpy as np
+import pandas as pd
+import database as db
+
+# --- 學期成績計算設定 ---
+# 平時評量與定期評量在學期總成績中的佔比 (%)
+TYPE_WEIGHTS = {'平時評量': 50, '定期評量': 50}
+
+
+def _weighted_nanmean(matrix, weights):
+    """
+    依權重計算每一列的平均，缺考 (NaN) 的項目不列入，其權重也不計入分母.
+    matrix: (學生數, 項目數) 的 ndarray；weights: (項目數,) 的 ndarray。
+    整列都沒有成績時結果為 NaN。
+    """
+    present = ~np.isnan(matrix)
+    numerator = np.where(present, matrix, 0.0) @ weights
+    denominator = present @ weights
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def _item_weights(items):
+    """
+    項目權重 (items 以 id 為索引).
+    同一層 (同一個父項目；頂層為同一評量類型) 的項目中，有設定佔比的使用佔比，
+    未設定的平分剩下的佔比 (100% 減去已設定的合計)；整層都沒有設定、或已設定的合計達 100% 時，
+    同一層的項目平均分配。
+    """
+    percentage = items['percentage'].astype(float)
+    is_set = percentage.notna() & (percentage > 0)
+    levels = {}
+    for item_id, parent_id, item_type in zip(items.index, items['parent_id'], items['type']):
+        has_parent = pd.notna(parent_id) and parent_id != item_id and parent_id in items.index
+        levels.setdefault(('parent', int(parent_id)) if has_parent else ('type', item_type), []).append(item_id)
+
+    weights = {}
+    for ids in levels.values():
+        given = [item_id for item_id in ids if is_set[item_id]]
+        missing = [item_id for item_id in ids if not is_set[item_id]]
+        remainder = 100.0 - percentage[given].sum()
+        if not given or (missing and remainder <= 0):
+            weights.update(dict.fromkeys(ids, 1.0))
+        else:
+            weights.update(percentage[given].to_dict())
+            weights.update(dict.fromkeys(missing, remainder / len(missing) if missing else 0.0))
+    return pd.Series(weights, dtype=float).reindex(items.index)
+
+
+def build_score_matrix(rows, item_ids):
+    """
+    將 (student_db_id, student_id, name, class_name, item_id, score) 列表轉成
+    學生資料表與 學生 × 成績項目 的分數矩陣 (缺考為 NaN).
+    """
+    df = pd.DataFrame(rows, columns=['id', 'student_id', 'name', 'class_name', 'item_id', 'score'])
+    students = (df[['id', 'student_id', 'name', 'class_name']]
+                .drop_duplicates('id')
+                .sort_values(['class_name', 'student_id'])
+                .set_index('id'))
+    graded = df.dropna(subset=['item_id'])
+    matrix = (graded.pivot(index='id', columns='item_id', values='score')
+              .reindex(index=students.index, columns=item_ids)
+              .astype(float))
+    return students, matrix
+
+
+class WeightPlan:
+    """
+    成績項目的階層權重整理成的計算順序，建立一次後可重複套用在任意列數的分數矩陣.
+    有子項目的項目，其分數為子項目的加權平均 (由最深層往上計算)；
+    各評量類型為該類型頂層項目的加權平均；學期成績為各類型依 type_weights 的加權平均。
+    columns 為分數矩陣的欄位 (成績項目 ID) 順序，未指定時與 items 相同。
+    """
+
+    def __init__(self, items, type_weights=None, columns=None):
+        type_weights = TYPE_WEIGHTS if type_weights is None else type_weights
+        items = items.set_index('id')
+        weights = _item_weights(items)
+        col_of = {item_id: col for col, item_id in enumerate(items.index if columns is None else columns)}
+
+        # 計算每個項目的深度，深層的父項目先計算
+        parents = items['parent_id'].dropna().astype(int)
+        parents = parents[parents.isin(items.index)]
+        depth = {}
+        def item_depth(item_id):
+            if item_id not in depth:
+                parent = parents.get(item_id)
+                depth[item_id] = 0 if parent is None or parent == item_id else item_depth(parent) + 1
+            return depth[item_id]
+
+        # [(父項目欄, 子項目欄, 子項目權重), ...]
+        children = parents.groupby(parents).groups
+        self.parents = []
+        for parent_id in sorted(children, key=item_depth, reverse=True):
+            child_ids = list(children[parent_id])
+            self.parents.append((col_of[parent_id], [col_of[i] for i in child_ids], weights[child_ids].to_numpy()))
+
+        # [(頂層項目欄, 權重), ...]，與 type_names 對應
+        top_level = items.index[~items.index.isin(parents.index)]
+        self.type_names = []
+        self.types = []
+        for item_type, group in items.loc[top_level].groupby('type'):
+            ids = list(group.index)
+            self.type_names.append(item_type)
+            self.types.append(([col_of[i] for i in ids], weights[ids].to_numpy()))
+
+        used = [index for index, name in enumerate(self.type_names) if type_weights.get(name, 0) > 0]
+        self.semester_types = used
+        self.semester_weights = np.array([float(type_weights[self.type_names[index]]) for index in used])
+
+    def apply(self, matrix):
+        """
+        套用到 (學生數, 項目數) 的分數 ndarray (缺考為 NaN)，不修改傳入的矩陣.
+        回傳 (項目分數, 類型分數, 學期成績) 三個 ndarray；類型分數的欄位順序同 type_names。
+        """
+        scores = np.array(matrix, dtype=float)
+        for parent_col, child_cols, weights in self.parents:
+            scores[:, parent_col] = _weighted_nanmean(scores[:, child_cols], weights)
+        type_scores = np.empty((len(scores), len(self.types)))
+        for index, (cols, weights) in enumerate(self.types):
+            type_scores[:, index] = _weighted_nanmean(scores[:, cols], weights)
+        if self.semester_types:
+            semester = _weighted_nanmean(type_scores[:, self.semester_types], self.semester_weights)
+        else:
+            semester = np.full(len(scores), np.nan)
+        return scores, type_scores, semester
+
+
+def compute_weighted_scores(matrix, items, type_weights=None):
+    """
+    套用成績項目的階層權重 (見 WeightPlan).
+    回傳 (項目分數矩陣, 類型分數 DataFrame, 學期成績 Series)，索引皆為學生。
+    """
+    plan = WeightPlan(items, type_weights, list(matrix.columns))
+    scores, type_scores, semester = plan.apply(matrix.to_numpy(dtype=float))
+    return (pd.DataFrame(scores, index=matrix.index, columns=matrix.columns),
+            pd.DataFrame(type_scores, index=matrix.index, columns=plan.type_names),
+            pd.Series(semester, index=matrix.index))
+
+
+def _clean(value):
+    """ 轉成可輸出為 JSON 的數值，NaN 轉為 None 並四捨五入到小數第二位 """
+    if value is None or pd.isna(value):
+        return None
+    return round(float(value), 2)
+
+
+def _json_records(frame):
+    """ 將 DataFrame 轉為 dict 列表 (每列一筆)，數值四捨五入到小數第二位，NaN 轉為 None """
+    if frame.columns.empty:
+        # 沒有任何欄位時 to_dict('records') 回傳空列表，但每位學生仍需要一筆 (例如尚未建立成績項目)
+        return [{} for _ in range(len(frame))]
+    rounded = frame.astype(float).round(2)
+    return rounded.astype(object).where(rounded.notna(), None).to_dict('records')
+
+
+def load_items():
+    """ 取得所有成績項目的 DataFrame """
+    return pd.DataFrame([dict(row) for row in db.get_grade_items()],
+                        columns=['id', 'name', 'type', 'parent_id', 'percentage'])
+
+
+def format_summary(class_name, type_weights, items, students, scores, type_scores, semester,
+                   class_stats, item_means, item_stds):
+    """
+    將計算結果整理成 API 輸出的 dict.
+    class_stats 以班級為索引，含 mean / std / count 欄位；
+    item_means、item_stds 以班級為索引、成績項目為欄位。
+    """
+    class_of = students['class_name']
+    rank = semester.groupby(class_of).rank(ascending=False, method='min')
+
+    item_records = items.to_dict('records')
+    score_records = _json_records(scores.rename(columns=str))
+    type_records = _json_records(type_scores)
+    average = _json_records(semester.to_frame('average'))
+    ranks = rank.astype('Int64').astype(object).where(rank.notna(), None).tolist()
+    student_list = [
+        {'id': int(student_db_id), 'student_id': student_id, 'name': name, 'class_name': student_class,
+         'scores': item_scores, 'type_scores': type_score, 'average': avg['average'], 'rank': student_rank}
+        for student_db_id, student_id, name, student_class, item_scores, type_score, avg, student_rank in zip(
+            students.index, students['student_id'], students['name'], students['class_name'],
+            score_records, type_records, average, ranks)
+    ]
+
+    item_keys = [str(item_id) for item_id in scores.columns]
+    mean_values = item_means.reindex(class_stats.index).round(2).to_numpy()
+    std_values = item_stds.reindex(class_stats.index).round(2).to_numpy()
+    classes = {}
+    for row, (name, stats) in enumerate(zip(class_stats.index, class_stats.to_dict('records'))):
+        classes[name] = {
+            'mean': _clean(stats['mean']),
+            'std': _clean(stats['std']),
+            'count': int(stats['count']),
+            'items': {
+                key: {'mean': _clean(mean_values[row, col]), 'std': _clean(std_values[row, col])}
+                for col, key in enumerate(item_keys)
+            },
+        }
+
+    return {
+        'class_name': class_name,
+        'type_weights': dict(type_weights),
+        'items': [{'id': int(item['id']), 'name': item['name'], 'type': item['type'],
+                   'parent_id': None if pd.isna(item['parent_id']) else int(item['parent_id']),
+                   'percentage': _clean(item['percentage'])} for item in item_records],
+        'classes': classes,
+        'students': student_list,
+    }
+
+
+def compute_summary(class_name=None, type_weights=None):
+    """
+    計算班級 (未指定時為全校) 的學期成績摘要.
+    回傳 dict，包含各項目的全班平均與標準差、各班平均與標準差，
+    以及每位學生的各項目分數、各類型分數、學期成績與班級排名。
+    """
+    type_weights = TYPE_WEIGHTS if type_weights is None else type_weights
+    items = load_items()
+    students, matrix = build_score_matrix(db.get_class_grade_rows(class_name), list(items['id']))
+    scores, type_scores, semester = compute_weighted_scores(matrix, items, type_weights)
+
+    # 班級統計
+    class_of = students['class_name']
+    grouped = semester.groupby(class_of)
+    class_stats = pd.DataFrame({'mean': grouped.mean(), 'std': grouped.std(ddof=0), 'count': grouped.count()})
+    item_means = scores.groupby(class_of).mean()
+    item_stds = scores.groupby(class_of).std(ddof=0)
+
+    return format_summary(class_name, type_weights, items, students, scores, type_scores, semester,
+                          class_stats, item_means, item_stds)
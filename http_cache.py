@@ -0,0 +1,252 @@
+import gzip
+import hashlib
+import os
+import threading
+import uuid
+from collections import defaultdict
+from functools import wraps
+from flask import current_app, make_response, request
+import database as db
+
+try:
+    import brotli
+except ImportError:  # 選用套件，未安裝時只使用 gzip
+    brotli = None
+
+# --- 回應快取與壓縮設定 ---
+# 小於此大小的回應不壓縮 (壓縮後可能反而變大，也不值得花 CPU)
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+# 帶有內容雜湊的靜態檔網址內容永遠不會改變，可快取一年
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+
+# --- 靜態檔指紋 ---
+
+class StaticFingerprints:
+    """
+    靜態檔的內容雜湊 (指紋).
+    以檔案修改時間與大小判斷是否需要重新計算，檔案更新後網址自然改變。
+    """
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self._lock = threading.Lock()
+        self._hashes = {}
+
+    def get(self, filename):
+        """ 回傳檔案內容的雜湊 (前 12 碼)，檔案不存在時回傳 None """
+        path = os.path.join(self.static_folder, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._hashes.get(path)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        with self._lock:
+            self._hashes[path] = (key, digest)
+        return digest
+
+
+# --- 資料版本 (API 的 ETag) ---
+
+class DataVersions:
+    """
+    每個班級的資料版本計數器，寫入 commit 後遞增.
+    學生名單或成績項目變動時遞增全域版本 (影響所有班級)。
+    epoch 在每次啟動時重新產生，重新啟動後舊的 ETag 不會誤判為未變更。
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._global = 0
+        self._classes = defaultdict(int)
+
+    def etag(self, class_name=None):
+        """ 目前資料版本對應的 ETag 值；class_name 為 None 時只看全域版本 """
+        with self._lock:
+            class_version = self._classes[class_name] if class_name is not None else 0
+            return f'{self.epoch}-{self._global}-{class_version}'
+
+    def bump(self, class_names=None):
+        """ 遞增指定班級 (未指定時為全域) 的版本 """
+        with self._lock:
+            if class_names is None:
+                self._global += 1
+            else:
+                for class_name in class_names:
+                    self._classes[class_name] += 1
+
+    def on_change(self, event, payload):
+        """ database.py 的資料變更通知 """
+        if event in ('grades', 'attendance', 'seats'):
+            student_db_ids = {row[0] for row in payload}
+            self.bump(_classes_of_students(student_db_ids))
+        elif event == 'layout':
+            self.bump([payload[0]])
+        else:
+            self.bump()
+
+
+def _classes_of_students(student_db_ids):
+    """ 查詢學生所屬的班級 """
+    if not student_db_ids:
+        return []
+    placeholders = ','.join('?' for _ in student_db_ids)
+    rows = db.get_db_connection().execute(
+        f'SELECT DISTINCT class_name FROM students WHERE id IN ({placeholders})', list(student_db_ids)
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+# 應用程式共用的資料版本
+data_versions = DataVersions()
+db.add_change_listener(data_versions.on_change)
+
+
+def conditional_json(class_arg=None):
+    """
+    API 路由的裝飾器：以資料版本作為 ETag，瀏覽器帶 If-None-Match 且資料未變更時直接回 304.
+    class_arg 為取得班級名稱的路由參數或查詢參數名稱；None 表示只依全域版本。
+    只處理 GET，ETag 在讀取資料「之前」取得，避免把舊資料標成新版本。
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            class_name = None
+            if class_arg is not None:
+                class_name = kwargs.get(class_arg) or request.args.get(class_arg)
+            etag = data_versions.etag(class_name)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # 每次使用前都需向伺服器確認，但未變更時只需傳回 304
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+# --- 回應壓縮 ---
+
+def _choose_encoding():
+    """ 依 Accept-Encoding 選擇壓縮格式 """
+    if brotli is not None and request.accept_encodings['br'] > 0:
+        return 'br'
+    if request.accept_encodings['gzip'] > 0:
+        return 'gzip'
+    return None
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class _CompressedStatic:
+    """ 壓縮後的靜態檔快取，以 (路徑, 修改時間, 大小, 壓縮格式) 為鍵 """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def get(self, path, encoding):
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size, encoding)
+        with self._lock:
+            data = self._cache.get(key)
+        if data is None:
+            with open(path, 'rb') as f:
+                data = _compress(f.read(), encoding)
+            with self._lock:
+                # 同一檔案的舊版本不再需要
+                for old_key in [k for k in self._cache if k[0] == path and k[3] == encoding]:
+                    del self._cache[old_key]
+                self._cache[key] = data
+        return data
+
+
+def _is_compressible(response):
+    mimetype = response.mimetype or ''
+    return (response.status_code == 200
+            and 'Content-Encoding' not in response.headers
+            and mimetype.startswith(COMPRESSIBLE_TYPES))
+
+
+def init_app(app):
+    """
+    在 Flask 應用程式上啟用:
+    1. 靜態檔網址自動加上內容指紋 (?v=雜湊)，帶有正確指紋的請求回應 immutable 長期快取
+    2. 超過 COMPRESS_MIN_SIZE 的文字類回應以 br / gzip 壓縮
+    """
+    fingerprints = StaticFingerprints(app.static_folder)
+    compressed_static = _CompressedStatic()
+
+    @app.url_defaults
+    def add_static_fingerprint(endpoint, values):
+        if endpoint == 'static' and 'v' not in values:
+            digest = fingerprints.get(values.get('filename', ''))
+            if digest:
+                values['v'] = digest
+
+    @app.after_request
+    def cache_and_compress(response):
+        static_path = None
+        if request.endpoint == 'static' and response.status_code == 200:
+            filename = (request.view_args or {}).get('filename', '')
+            version = request.args.get('v')
+            if version and version == fingerprints.get(filename):
+                response.cache_control.public = True
+                response.cache_control.max_age = STATIC_MAX_AGE
+                response.cache_control.immutable = True
+            static_path = os.path.join(app.static_folder, filename)
+
+        if not _is_compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = _choose_encoding()
+        if encoding is None:
+            return response
+
+        if static_path is not None:
+            if response.content_length is None or response.content_length < COMPRESS_MIN_SIZE:
+                return response
+            data = compressed_static.get(static_path, encoding)
+            if hasattr(response.response, 'close'):
+                response.response.close()
+            response.direct_passthrough = False
+        elif response.is_streamed:
+            # 串流回應 (例如報表匯出) 不在此壓縮，避免整份讀入記憶體
+            return response
+        else:
+            body = response.get_data()
+            if len(body) < COMPRESS_MIN_SIZE:
+                return response
+            data = _compress(body, encoding)
+
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        # 位元組範圍是針對未壓縮內容，壓縮後不再支援
+        response.headers.pop('Accept-Ranges', None)
+        # 壓縮後內容位元組不同，ETag 改為弱比對 (內容語意相同)
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
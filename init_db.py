@@ -1,6 +1,8 @@
 import sqlite3
-import os
+import sys
 import bcrypt
+import database as db
+import migrations
 
 # --- 設定 ---
 DATABASE_FILE = 'teacher_app.db'
@@ -16,114 +18,54 @@ def create_connection():
         print(e)
     return conn
 
-def create_table(conn, create_table_sql):
-    """ 在資料庫中建立一個資料表 """
-    try:
-        c = conn.cursor()
-        c.execute(create_table_sql)
-    except sqlite3.Error as e:
-        print(e)
-
 def setup_database():
-    """ 主要的資料庫設定函式 """
-    
-    # 如果資料庫檔案已存在，先刪除，確保是一個全新的開始
-    if os.path.exists(DATABASE_FILE):
-        os.remove(DATABASE_FILE)
-        print(f"已刪除舊的資料庫檔案: {DATABASE_FILE}")
-
+    """
+    主要的資料庫設定函式.
+    資料庫不存在時建立新的資料庫；已存在時就地升級到最新結構，不會刪除既有資料。
+    """
     conn = create_connection()
 
     if conn is not None:
-        # --- 建立資料表 ---
-        
-        # 使用者設定表 (只會有單一一筆紀錄)
-        sql_create_settings_table = """
-        CREATE TABLE IF NOT EXISTS settings (
-            id INTEGER PRIMARY KEY,
-            hashed_password TEXT NOT NULL
-        );
-        """
-        
-        # 學生資料表
-        sql_create_students_table = """
-        CREATE TABLE IF NOT EXISTS students (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id TEXT NOT NULL UNIQUE,
-            name TEXT NOT NULL,
-            class_name TEXT NOT NULL,
-            account TEXT,
-            seat_row INTEGER, -- 座位 - 列
-            seat_col INTEGER  -- 座位 - 欄
-        );
-        """
-
-        # 班級設定表
-        sql_create_class_settings_table = """
-        CREATE TABLE IF NOT EXISTS class_settings (
-            class_name TEXT PRIMARY KEY,
-            seating_layout TEXT NOT NULL DEFAULT '6x6'
-        );
-        """
-        
-        # 成績項目表
-        sql_create_grade_items_table = """
-        CREATE TABLE IF NOT EXISTS grade_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE,
-            type TEXT NOT NULL, -- '平時評量' 或 '定期評量'
-            parent_id INTEGER, -- 用於平時評量下的子項目
-            percentage REAL, -- 佔比
-            FOREIGN KEY (parent_id) REFERENCES grade_items (id)
-        );
-        """
-        
-        # 成績紀錄表
-        sql_create_grades_table = """
-        CREATE TABLE IF NOT EXISTS grades (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_db_id INTEGER NOT NULL,
-            item_id INTEGER NOT NULL,
-            score REAL,
-            is_retest BOOLEAN DEFAULT 0, -- 是否為補考成績
-            FOREIGN KEY (student_db_id) REFERENCES students (id),
-            FOREIGN KEY (item_id) REFERENCES grade_items (id)
-        );
-        """
-        
-        # 出缺席與日常表現紀錄表
-        sql_create_attendance_table = """
-        CREATE TABLE IF NOT EXISTS attendance (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_db_id INTEGER NOT NULL,
-            date TEXT NOT NULL,
-            status TEXT NOT NULL, -- '出席', '遲到', '事假', '病假', '曠課'
-            daily_performance_notes TEXT, -- 日常行為表現文字紀錄
-            FOREIGN KEY (student_db_id) REFERENCES students (id)
-        );
-        """
-        
-        create_table(conn, sql_create_settings_table)
-        create_table(conn, sql_create_students_table)
-        create_table(conn, sql_create_class_settings_table)
-        create_table(conn, sql_create_grade_items_table)
-        create_table(conn, sql_create_grades_table)
-        create_table(conn, sql_create_attendance_table)
+        # --- 建立或升級資料表 ---
+        previous_version = migrations.get_schema_version(conn)
+        migrations.migrate(conn, verbose=True)
+        if previous_version == migrations.LATEST_VERSION:
+            print(f"資料庫結構已是最新版本 ({migrations.LATEST_VERSION})。")
         
         # --- 插入初始資料 ---
         
-        # 插入預設密碼
-        hashed_password = bcrypt.hashpw(DEFAULT_PASSWORD.encode('utf-8'), bcrypt.gensalt())
+        # 尚未設定密碼時才插入預設密碼
         cursor = conn.cursor()
-        cursor.execute("INSERT INTO settings (id, hashed_password) VALUES (?, ?)", (1, hashed_password))
-        conn.commit()
-        
-        print("資料庫初始化完成，並已設定預設密碼。")
+        if cursor.execute("SELECT 1 FROM settings WHERE id = 1").fetchone() is None:
+            hashed_password = bcrypt.hashpw(DEFAULT_PASSWORD.encode('utf-8'), bcrypt.gensalt())
+            cursor.execute("INSERT INTO settings (id, hashed_password) VALUES (?, ?)", (1, hashed_password))
+            conn.commit()
+            print("資料庫初始化完成，並已設定預設密碼。")
+        else:
+            print("資料庫升級完成，既有資料與密碼均已保留。")
 
         conn.close()
     else:
         print("錯誤！無法建立資料庫連線。")
 
-if __name__ == '__main__':
-    setup_database()
+def rebuild_attendance_stats():
+    """ 由原始點名紀錄重新產生出缺席月統計表 (統計表與原始紀錄不一致時使用) """
+    conn = create_connection()
 
+    if conn is not None:
+        migrations.migrate(conn, verbose=True)
+        conn.close()
+        # 與伺服器使用同一個重建函式，統計方式只維護一份
+        db.DATABASE_FILE = DATABASE_FILE
+        count = db.rebuild_attendance_rollup()
+        print(f"出缺席月統計已重建，共 {count} 筆統計。")
+    else:
+        print("錯誤！無法建立資料庫連線。")
+
+if __name__ == '__main__':
+    # 用法: python init_db.py                     建立或升級資料庫
+    #       python init_db.py --rebuild-attendance 重建出缺席月統計表
+    if '--rebuild-attendance' in sys.argv[1:]:
+        rebuild_attendance_stats()
+    else:
+        setup_database()
@@ -0,0 +1,253 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger('teacher_app.jobs')
+
+# --- 背景工作設定 ---
+# waitress 只有少數工作執行緒，耗時的匯入、匯出與縮圖改在背景執行，請求只負責送出工作並立即回應
+MAX_WORKERS = 2
+# 排隊 + 執行中的工作上限，超過時拒絕新工作 (避免同時送出大量匯出拖垮整台電腦)
+MAX_PENDING = 8
+# 保留最近完成的工作數量 (供查詢結果與下載)，較舊的工作與其檔案會被移除
+MAX_TRACKED_JOBS = 50
+# 解析檔案等 CPU 密集工作使用的行程數；獨立行程不與處理請求的執行緒搶 GIL
+PROCESS_WORKERS = 1
+
+FINISHED_STATUSES = ('done', 'failed', 'cancelled')
+
+
+class JobCancelled(Exception):
+    """ 工作已被要求取消 """
+
+
+class JobQueueFull(Exception):
+    """ 排隊中的工作太多，暫時無法接受新工作 """
+
+
+class Job:
+    """
+    單一背景工作的狀態.
+    工作函式以 job.progress() 回報進度；該呼叫同時是取消檢查點，已要求取消時會拋出 JobCancelled。
+    """
+
+    def __init__(self, job_id, kind):
+        self.id = job_id
+        self.kind = kind
+        self.status = 'queued'
+        self.processed = 0
+        self.total = None
+        self.message = ''
+        self.result = None
+        self.file = None  # 工作產生的檔案 (路徑, 下載檔名, MIME 類型)
+        self.cleanup = None  # 工作結束 (含排隊中即被取消) 後呼叫，例如刪除上傳的暫存檔
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        """ 已要求取消時拋出 JobCancelled """
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def progress(self, processed=None, total=None, message=None):
+        """ 更新進度並檢查是否已要求取消 """
+        with self._lock:
+            if processed is not None:
+                self.processed = processed
+            if total is not None:
+                self.total = total
+            if message is not None:
+                self.message = message
+        self.check_cancelled()
+
+    def attach_file(self, path, download_name, mimetype):
+        """ 登記工作產生的檔案，工作被移除時一併刪除 """
+        self.file = (path, download_name, mimetype)
+
+    def wait(self, future, poll_interval=0.2):
+        """ 等待行程池的結果，等待期間仍可取消 """
+        while True:
+            try:
+                return future.result(timeout=poll_interval)
+            except FutureTimeoutError:
+                if self._cancel.is_set():
+                    future.cancel()
+                    raise JobCancelled()
+
+    def _finish(self, status, message=None, result=None):
+        with self._lock:
+            self.status = status
+            if message is not None:
+                self.message = message
+            self.result = result
+            self.finished = time.time()
+
+    def _run_cleanup(self):
+        cleanup, self.cleanup = self.cleanup, None
+        if cleanup is not None:
+            try:
+                cleanup()
+            except Exception:
+                logger.exception('背景工作 %s 的清理失敗', self.id)
+
+    def _discard_file(self):
+        if self.file is not None:
+            try:
+                os.remove(self.file[0])
+            except OSError:
+                pass
+            self.file = None
+
+    def to_dict(self):
+        """ 供 API 回傳的工作狀態 """
+        with self._lock:
+            return {
+                'id': self.id,
+                'kind': self.kind,
+                'status': self.status,
+                'processed': self.processed,
+                'total': self.total,
+                'message': self.message,
+                'result': self.result,
+                'has_file': self.file is not None,
+                'cancel_requested': self._cancel.is_set(),
+                'created': self.created,
+                'started': self.started,
+                'finished': self.finished,
+            }
+
+
+class JobManager:
+    """
+    有上限的背景工作執行器.
+    執行緒池與行程池都在第一次使用時才建立；工作以編號查詢狀態、進度與結果，並可要求取消。
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_pending=MAX_PENDING, max_tracked=MAX_TRACKED_JOBS,
+                 process_workers=PROCESS_WORKERS):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_tracked = max_tracked
+        self.process_workers = process_workers
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._executor = None
+        self._process_pool = None
+
+    def submit(self, kind, func, *args, job_id=None, cleanup=None, **kwargs):
+        """
+        送出工作，回傳 Job；func 的第一個參數為 Job.
+        cleanup 在工作結束後一定會被呼叫 (即使工作在排隊中就被取消)。
+        排隊中的工作已達上限時拋出 JobQueueFull。
+        """
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job.status not in FINISHED_STATUSES)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f'目前有 {pending} 個工作尚未完成，請稍後再試')
+            job = Job(job_id or uuid.uuid4().hex, kind)
+            if job.id in self._jobs:
+                raise ValueError(f'工作編號重複: {job.id}')
+            job.cleanup = cleanup
+            self._jobs[job.id] = job
+            self._trim()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='job')
+            executor = self._executor
+        executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        if job.cancel_requested:
+            job._run_cleanup()
+            job._finish('cancelled', '已取消')
+            return
+        job.status = 'running'
+        job.started = time.time()
+        try:
+            result = func(job, *args, **kwargs)
+        except JobCancelled:
+            job._discard_file()
+            job._run_cleanup()
+            job._finish('cancelled', '已取消')
+        except Exception as e:
+            logger.exception('背景工作 %s (%s) 失敗', job.id, job.kind)
+            job._discard_file()
+            job._run_cleanup()
+            job._finish('failed', str(e))
+        else:
+            job._run_cleanup()
+            job._finish('done', result=result)
+
+    def _trim(self):
+        """ 超過保留數量時移除最舊的已完成工作 (需持有 self._lock) """
+        excess = len(self._jobs) - self.max_tracked
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATUSES]:
+            if excess <= 0:
+                break
+            self._jobs.pop(job_id)._discard_file()
+            excess -= 1
+
+    def get(self, job_id):
+        """ 取得工作，找不到時回傳 None """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, kind=None):
+        """ 列出工作狀態 (新的在前) """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in reversed(jobs) if kind is None or job.kind == kind]
+
+    def cancel(self, job_id):
+        """ 要求取消工作；工作已結束或不存在時回傳 False """
+        job = self.get(job_id)
+        if job is None or job.status in FINISHED_STATUSES:
+            return False
+        job._cancel.set()
+        return True
+
+    def run_in_process(self, func, *args):
+        """
+        在行程池執行 CPU 密集的函式，回傳 Future (搭配 Job.wait 等待).
+        func 與參數需可 pickle；一律以 spawn 啟動子行程，避免在多執行緒的伺服器中 fork。
+        """
+        with self._lock:
+            if self._process_pool is None:
+                from concurrent.futures import ProcessPoolExecutor
+                self._process_pool = ProcessPoolExecutor(
+                    self.process_workers, mp_context=multiprocessing.get_context('spawn'))
+            pool = self._process_pool
+        return pool.submit(func, *args)
+
+    def shutdown(self):
+        """ 取消所有未完成的工作、停止執行緒池與行程池並刪除工作產生的檔案 """
+        with self._lock:
+            jobs = list(self._jobs.values())
+            executor, self._executor = self._executor, None
+            pool, self._process_pool = self._process_pool, None
+        for job in jobs:
+            job._cancel.set()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        for job in jobs:
+            # 排隊中被取消的工作不會執行，在此清理
+            job._run_cleanup()
+            job._discard_file()
+
+
+# 應用程式共用的背景工作執行器
+jobs = JobManager()
@@ -0,0 +1,373 @@
+import bisect
+import contextlib
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from flask import request, before_render_template, template_rendered
+
+# --- 效能統計設定 ---
+# 延遲直方圖的區間上限 (秒)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 每個請求的 SQL 指令數直方圖區間
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# 慢請求紀錄最多保留的 SQL 指令數與每條指令的長度
+MAX_LOGGED_STATEMENTS = 100
+MAX_STATEMENT_LENGTH = 300
+
+# database.py 中不計時的函式 (連線與交易管理本身，呼叫極頻繁且不代表實際工作)
+UNTIMED_DB_FUNCTIONS = {
+    'get_db_connection', 'close_db_connection', 'transaction', 'reset_transaction',
+    'add_change_listener', 'add_connection_hook', 'add_write_context_hook',
+    'queued_write', 'exclusive_write', 'write_queue_stats',
+}
+
+slow_log = logging.getLogger('teacher_app.slow_requests')
+
+
+# --- 統計資料結構 ---
+
+def _escape(value):
+    """ Prometheus 標籤值的跳脫 """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _HistogramSeries:
+    """ 直方圖中單一組標籤的資料 """
+
+    __slots__ = ('buckets', 'counts', 'total', 'count', 'lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.total += value
+            self.count += 1
+
+
+class Histogram:
+    """ 依標籤分組的直方圖 (每組記錄各區間的次數、總和與總次數) """
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def labels(self, *values):
+        """ 取得一組標籤的資料；經常記錄的地方可先取得後重複使用 """
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(values, _HistogramSeries(self.buckets))
+        return series
+
+    def observe(self, value, labels=()):
+        self.labels(*labels).observe(value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series_list = list(self._series.items())
+        snapshot = []
+        for labels, series in series_list:
+            with series.lock:
+                snapshot.append((labels, list(series.counts), series.total, series.count))
+        for labels, counts, total, count in sorted(snapshot):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _format_labels(self.label_names, labels, [('le', repr(float(bound)))])
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            le = _format_labels(self.label_names, labels, [('le', '+Inf')])
+            lines.append(f'{self.name}_bucket{le} {count}')
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f'{self.name}_sum{label_text} {total:.6f}')
+            lines.append(f'{self.name}_count{label_text} {count}')
+        return lines
+
+
+class Counter:
+    """ 依標籤分組的累計計數 """
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        for labels, value in snapshot:
+            lines.append(f'{self.name}{_format_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+class Registry:
+    """ 應用程式的所有統計項目；enabled 為 False 時計時函式直接呼叫原函式 """
+
+    def __init__(self):
+        self.enabled = True
+        self.request_seconds = Histogram(
+            'teacher_app_request_duration_seconds', '每個路由的請求處理時間', ('route', 'method'))
+        self.requests = Counter(
+            'teacher_app_requests_total', '每個路由的請求數', ('route', 'method', 'status'))
+        self.request_statements = Histogram(
+            'teacher_app_request_sql_statements', '每個請求執行的 SQL 指令數', ('route',), STATEMENT_BUCKETS)
+        self.request_part_seconds = Histogram(
+            'teacher_app_request_part_seconds', '每個請求花在資料庫、樣板與照片處理的時間', ('route', 'part'))
+        self.function_seconds = Histogram(
+            'teacher_app_function_duration_seconds', '資料庫與照片處理函式的執行時間', ('module', 'function'))
+        self.template_seconds = Histogram(
+            'teacher_app_template_render_seconds', 'Jinja 樣板的繪製時間', ('template',))
+        self.connections = Counter(
+            'teacher_app_db_connections_opened_total', '開啟的資料庫連線數')
+        self.statements = Counter(
+            'teacher_app_sql_statements_total', '執行的 SQL 指令數')
+
+    def render(self):
+        """ Prometheus 文字格式 """
+        lines = []
+        for metric in (self.request_seconds, self.requests, self.request_statements, self.request_part_seconds,
+                       self.function_seconds, self.template_seconds, self.connections, self.statements):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+# --- 每個請求的統計 ---
+
+class _RequestStats:
+    """ 目前請求累計的 SQL 指令、連線數與各部分耗時 """
+
+    __slots__ = ('start', 'status', 'statement_count', 'statements', 'connections',
+                 'part_seconds', 'active', 'template_starts', 'keep_statements')
+
+    def __init__(self, keep_statements):
+        self.start = time.perf_counter()
+        self.status = 500
+        self.statement_count = 0
+        self.statements = []
+        self.connections = 0
+        self.part_seconds = {}
+        self.active = set()
+        self.template_starts = []
+        self.keep_statements = keep_statements
+
+
+_local = threading.local()
+
+
+def _current():
+    return getattr(_local, 'stats', None)
+
+
+def _on_statement(sql):
+    """ sqlite3 trace callback：每執行一條 SQL 呼叫一次 """
+    if not registry.enabled:
+        return
+    registry.statements.inc()
+    stats = _current()
+    if stats is not None:
+        stats.statement_count += 1
+        if stats.keep_statements and len(stats.statements) < MAX_LOGGED_STATEMENTS:
+            stats.statements.append(sql[:MAX_STATEMENT_LENGTH])
+
+
+def _on_connection(conn):
+    """ database.py 開啟新連線時呼叫 """
+    registry.connections.inc()
+    stats = _current()
+    if stats is not None:
+        stats.connections += 1
+    conn.set_trace_callback(_on_statement)
+
+
+@contextlib.contextmanager
+def _bind(stats):
+    """ 在目前執行緒暫時使用另一個請求的統計 """
+    previous = _current()
+    _local.stats = stats
+    try:
+        yield
+    finally:
+        _local.stats = previous
+
+
+def _write_context():
+    """
+    寫入交給寫入執行緒時記下送出它的請求，
+    寫入執行緒執行期間的 SQL 指令與函式耗時計入同一個請求 (包括慢請求紀錄)。
+    """
+    stats = _current()
+    return _bind(stats) if stats is not None else None
+
+
+# --- 函式計時 ---
+
+def timed(module, name, func):
+    """
+    包裝函式以記錄執行時間；產生器函式計算所有迭代步驟的時間總和.
+    同一模組的巢狀呼叫 (例如 update_or_insert_grade → batch_update_grades) 只把最外層計入請求的耗時。
+    """
+    series = registry.function_seconds.labels(module, name)
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            if not registry.enabled:
+                yield from func(*args, **kwargs)
+                return
+            elapsed = 0.0
+            iterator = func(*args, **kwargs)
+            try:
+                while True:
+                    stats = getattr(_local, 'stats', None)
+                    outermost = stats is not None and module not in stats.active
+                    if outermost:
+                        stats.active.add(module)
+                    start = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        step = time.perf_counter() - start
+                        elapsed += step
+                        if outermost:
+                            stats.active.discard(module)
+                            stats.part_seconds[module] = stats.part_seconds.get(module, 0.0) + step
+                    yield item
+            finally:
+                iterator.close()
+                series.observe(elapsed)
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not registry.enabled:
+            return func(*args, **kwargs)
+        stats = getattr(_local, 'stats', None)
+        outermost = stats is not None and module not in stats.active
+        if outermost:
+            stats.active.add(module)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            series.observe(elapsed)
+            if outermost:
+                stats.active.discard(module)
+                stats.part_seconds[module] = stats.part_seconds.get(module, 0.0) + elapsed
+    return wrapper
+
+
+def instrument(target, names, module_label):
+    """ 將 target (模組或類別) 上指定名稱的函式替換為計時版本 """
+    for name in names:
+        setattr(target, name, timed(module_label, name, getattr(target, name)))
+
+
+def instrument_database(db):
+    """ 為 database.py 所有公開函式加上計時，並在新連線上計算 SQL 指令數 """
+    names = [name for name, value in vars(db).items()
+             if inspect.isfunction(value) and value.__module__ == db.__name__
+             and not name.startswith('_') and name not in UNTIMED_DB_FUNCTIONS]
+    instrument(db, names, 'database')
+    db.add_connection_hook(_on_connection)
+    db.add_write_context_hook(_write_context)
+    # 已經開啟的連線 (例如目前執行緒) 也要計算
+    conn = getattr(db._local, 'conn', None)
+    if conn is not None:
+        conn.set_trace_callback(_on_statement)
+
+
+# --- Flask 整合 ---
+
+def init_app(app):
+    """
+    在 Flask 應用程式上啟用請求計時、樣板繪製計時與慢請求紀錄.
+    app.config['SLOW_REQUEST_SECONDS'] (或環境變數 TEACHER_APP_SLOW_REQUEST_MS) 設定後，
+    超過門檻的請求會連同執行的 SQL 指令寫入 teacher_app.slow_requests 記錄器。
+    """
+    if 'SLOW_REQUEST_SECONDS' not in app.config:
+        slow_ms = os.environ.get('TEACHER_APP_SLOW_REQUEST_MS')
+        app.config['SLOW_REQUEST_SECONDS'] = float(slow_ms) / 1000 if slow_ms else None
+
+    @app.before_request
+    def start_request_stats():
+        if registry.enabled:
+            _local.stats = _RequestStats(keep_statements=app.config['SLOW_REQUEST_SECONDS'] is not None)
+
+    @app.after_request
+    def remember_status(response):
+        stats = _current()
+        if stats is not None:
+            stats.status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_request_stats(exc):
+        stats = _current()
+        if stats is None:
+            return
+        _local.stats = None
+        elapsed = time.perf_counter() - stats.start
+        route = request.endpoint or 'unmatched'
+        registry.request_seconds.observe(elapsed, (route, request.method))
+        registry.requests.inc((route, request.method, str(stats.status)))
+        registry.request_statements.observe(stats.statement_count, (route,))
+        for part, seconds in stats.part_seconds.items():
+            registry.request_part_seconds.observe(seconds, (route, part))
+
+        threshold = app.config['SLOW_REQUEST_SECONDS']
+        if threshold is not None and elapsed >= threshold:
+            parts = ', '.join(f'{part} {seconds * 1000:.1f} ms' for part, seconds in sorted(stats.part_seconds.items()))
+            slow_log.warning(
+                '慢請求 %s %s (%s) %.1f ms：%s；%d 條 SQL、開啟 %d 條連線\n%s',
+                request.method, request.full_path.rstrip('?'), route, elapsed * 1000, parts or '無資料庫存取',
+                stats.statement_count, stats.connections,
+                '\n'.join(f'  {sql}' for sql in stats.statements))
+
+    def before_render(sender, template, context, **extra):
+        stats = _current()
+        if stats is not None:
+            stats.template_starts.append(time.perf_counter())
+
+    def after_render(sender, template, context, **extra):
+        stats = _current()
+        if stats is not None and stats.template_starts:
+            elapsed = time.perf_counter() - stats.template_starts.pop()
+            registry.template_seconds.observe(elapsed, (template.name or 'string',))
+            if not stats.template_starts:
+                stats.part_seconds['template'] = stats.part_seconds.get('template', 0.0) + elapsed
+
+    before_render_template.connect(before_render, app, weak=False)
+    template_rendered.connect(after_render, app, weak=False)
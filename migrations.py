@@ -0,0 +1,249 @@
+import sqlite3
+
+# --- 資料庫結構版本 ---
+# 每個版本為 (版本號, 說明, SQL 指令列表)，依序套用並記錄在 PRAGMA user_version。
+# 新增結構變更時只能在最後加入新的版本，不可修改已發佈的版本。
+
+# 由原始點名紀錄重新產生出缺席月統計 (版本 3 建立統計表時，以及手動重建時使用)
+REBUILD_ATTENDANCE_MONTHLY = [
+    'DELETE FROM attendance_monthly;',
+    """
+    INSERT INTO attendance_monthly (student_db_id, month, status, count)
+    SELECT student_db_id, substr(date, 1, 7), status, COUNT(*)
+    FROM attendance GROUP BY student_db_id, substr(date, 1, 7), status;
+    """,
+]
+
+MIGRATIONS = [
+    (1, '建立初始資料表', [
+        # 使用者設定表 (只會有單一一筆紀錄)
+        """
+        CREATE TABLE IF NOT EXISTS settings (
+            id INTEGER PRIMARY KEY,
+            hashed_password TEXT NOT NULL
+        );
+        """,
+        # 學生資料表
+        """
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL,
+            class_name TEXT NOT NULL,
+            account TEXT,
+            seat_row INTEGER, -- 座位 - 列
+            seat_col INTEGER  -- 座位 - 欄
+        );
+        """,
+        # 班級設定表
+        """
+        CREATE TABLE IF NOT EXISTS class_settings (
+            class_name TEXT PRIMARY KEY,
+            seating_layout TEXT NOT NULL DEFAULT '6x6'
+        );
+        """,
+        # 成績項目表
+        """
+        CREATE TABLE IF NOT EXISTS grade_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            type TEXT NOT NULL, -- '平時評量' 或 '定期評量'
+            parent_id INTEGER, -- 用於平時評量下的子項目
+            percentage REAL, -- 佔比
+            FOREIGN KEY (parent_id) REFERENCES grade_items (id)
+        );
+        """,
+        # 成績紀錄表
+        """
+        CREATE TABLE IF NOT EXISTS grades (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_db_id INTEGER NOT NULL,
+            item_id INTEGER NOT NULL,
+            score REAL,
+            is_retest BOOLEAN DEFAULT 0, -- 是否為補考成績
+            FOREIGN KEY (student_db_id) REFERENCES students (id),
+            FOREIGN KEY (item_id) REFERENCES grade_items (id)
+        );
+        """,
+        # 出缺席與日常表現紀錄表
+        """
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_db_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            status TEXT NOT NULL, -- '出席', '遲到', '事假', '病假', '曠課'
+            daily_performance_notes TEXT, -- 日常行為表現文字紀錄
+            FOREIGN KEY (student_db_id) REFERENCES students (id)
+        );
+        """,
+    ]),
+    (2, '加入常用查詢的索引與唯一限制', [
+        # 舊版程式可能留下重複紀錄，建立唯一索引前只保留最新的一筆
+        """
+        DELETE FROM grades WHERE id NOT IN (
+            SELECT MAX(id) FROM grades GROUP BY student_db_id, item_id
+        );
+        """,
+        """
+        DELETE FROM attendance WHERE id NOT IN (
+            SELECT MAX(id) FROM attendance GROUP BY student_db_id, date
+        );
+        """,
+        # 班級學生列表 (WHERE class_name = ? ORDER BY student_id)
+        'CREATE INDEX IF NOT EXISTS idx_students_class ON students (class_name, student_id);',
+        # 每位學生每個成績項目只有一筆成績
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_grades_student_item ON grades (student_db_id, item_id);',
+        # 依成績項目查詢整欄成績
+        'CREATE INDEX IF NOT EXISTS idx_grades_item ON grades (item_id);',
+        # 每位學生每天只有一筆出缺席紀錄
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_student_date ON attendance (student_db_id, date);',
+    ]),
+    (3, '加入出缺席月統計表，由觸發器隨每次點名寫入更新', [
+        # 每位學生、每個月 (YYYY-MM)、每種出缺席狀態的次數
+        """
+        CREATE TABLE IF NOT EXISTS attendance_monthly (
+            student_db_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            status TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (student_db_id, month, status)
+        ) WITHOUT ROWID;
+        """,
+        # 新增點名紀錄：對應的計數加一
+        """
+        CREATE TRIGGER IF NOT EXISTS attendance_monthly_insert AFTER INSERT ON attendance
+        BEGIN
+            INSERT INTO attendance_monthly (student_db_id, month, status, count)
+            VALUES (NEW.student_db_id, substr(NEW.date, 1, 7), NEW.status, 1)
+            ON CONFLICT (student_db_id, month, status) DO UPDATE SET count = count + 1;
+        END;
+        """,
+        # 刪除點名紀錄：對應的計數減一，歸零時移除
+        """
+        CREATE TRIGGER IF NOT EXISTS attendance_monthly_delete AFTER DELETE ON attendance
+        BEGIN
+            UPDATE attendance_monthly SET count = count - 1
+            WHERE student_db_id = OLD.student_db_id AND month = substr(OLD.date, 1, 7) AND status = OLD.status;
+            DELETE FROM attendance_monthly
+            WHERE student_db_id = OLD.student_db_id AND month = substr(OLD.date, 1, 7) AND status = OLD.status
+              AND count <= 0;
+        END;
+        """,
+        # 修改點名紀錄 (例如 UPSERT 把「出席」改成「遲到」)：舊狀態減一、新狀態加一
+        """
+        CREATE TRIGGER IF NOT EXISTS attendance_monthly_update
+        AFTER UPDATE OF student_db_id, date, status ON attendance
+        WHEN OLD.student_db_id IS NOT NEW.student_db_id OR OLD.date IS NOT NEW.date OR OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE attendance_monthly SET count = count - 1
+            WHERE student_db_id = OLD.student_db_id AND month = substr(OLD.date, 1, 7) AND status = OLD.status;
+            DELETE FROM attendance_monthly
+            WHERE student_db_id = OLD.student_db_id AND month = substr(OLD.date, 1, 7) AND status = OLD.status
+              AND count <= 0;
+            INSERT INTO attendance_monthly (student_db_id, month, status, count)
+            VALUES (NEW.student_db_id, substr(NEW.date, 1, 7), NEW.status, 1)
+            ON CONFLICT (student_db_id, month, status) DO UPDATE SET count = count + 1;
+        END;
+        """,
+    ] + REBUILD_ATTENDANCE_MONTHLY),
+    (4, '加入學生與日常表現紀錄的全文檢索 (FTS5 trigram)，由觸發器同步', [
+        # trigram 斷詞以每三個字元建立索引，中文不需斷詞即可做子字串搜尋 (也涵蓋學號、帳號的前綴搜尋)；
+        # 表格自行保存一份要搜尋的文字，rowid 對應 students.id / attendance.id
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+            student_id, name, account, tokenize = 'trigram'
+        );
+        """,
+        # 只索引有文字的日常表現紀錄 (大部分點名紀錄沒有備註)
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+            notes, tokenize = 'trigram'
+        );
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS students_fts_insert AFTER INSERT ON students
+        BEGIN
+            INSERT OR REPLACE INTO students_fts (rowid, student_id, name, account)
+            VALUES (NEW.id, NEW.student_id, NEW.name, coalesce(NEW.account, ''));
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS students_fts_delete AFTER DELETE ON students
+        BEGIN
+            DELETE FROM students_fts WHERE rowid = OLD.id;
+        END;
+        """,
+        # 只在學號、姓名或帳號改變時更新 (座位異動不影響索引)
+        """
+        CREATE TRIGGER IF NOT EXISTS students_fts_update AFTER UPDATE OF student_id, name, account ON students
+        BEGIN
+            INSERT OR REPLACE INTO students_fts (rowid, student_id, name, account)
+            VALUES (NEW.id, NEW.student_id, NEW.name, coalesce(NEW.account, ''));
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON attendance
+        WHEN coalesce(NEW.daily_performance_notes, '') <> ''
+        BEGIN
+            INSERT OR REPLACE INTO notes_fts (rowid, notes) VALUES (NEW.id, NEW.daily_performance_notes);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON attendance
+        BEGIN
+            DELETE FROM notes_fts WHERE rowid = OLD.id;
+        END;
+        """,
+        # 點名的 UPSERT 會更新備註：改成空白時移出索引，否則以新內容取代
+        """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF daily_performance_notes ON attendance
+        WHEN OLD.daily_performance_notes IS NOT NEW.daily_performance_notes
+        BEGIN
+            DELETE FROM notes_fts WHERE rowid = OLD.id;
+            INSERT INTO notes_fts (rowid, notes)
+            SELECT NEW.id, NEW.daily_performance_notes WHERE coalesce(NEW.daily_performance_notes, '') <> '';
+        END;
+        """,
+        # 既有資料建立索引
+        "INSERT INTO students_fts (rowid, student_id, name, account) "
+        "SELECT id, student_id, name, coalesce(account, '') FROM students;",
+        "INSERT INTO notes_fts (rowid, notes) "
+        "SELECT id, daily_performance_notes FROM attendance WHERE coalesce(daily_performance_notes, '') <> '';",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """ 取得資料庫目前的結構版本 """
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn, verbose=False):
+    """
+    將資料庫升級到最新結構版本，回傳套用的版本號列表.
+    每個版本在各自的交易中執行，失敗時該版本完全不生效。
+    """
+    current = get_schema_version(conn)
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        # 確保由這裡明確控制交易
+        if conn.in_transaction:
+            conn.commit()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for sql in statements:
+                conn.execute(sql)
+            # PRAGMA 不支援參數綁定；version 為程式內定義的整數
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        applied.append(version)
+        if verbose:
+            print(f"已套用資料庫結構版本 {version}: {description}")
+    return applied
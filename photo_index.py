@@ -0,0 +1,103 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from xml.sax.saxutils import escape
+
+from thumbnails import PHOTO_EXTENSIONS
+
+# 照片檔名開頭的學號，例如 "109001_黃宥承.jpg"、"109001-黃宥承.JPG"、"109001.jpg"
+_STUDENT_ID_PATTERN = re.compile(r'^\s*([0-9A-Za-z]+)\s*[_\-\s]*(.*)$')
+
+# 頭像背景色 (依姓名固定挑選一種)
+AVATAR_COLORS = ('#6c757d', '#0d6efd', '#198754', '#6f42c1', '#d63384', '#fd7e14', '#20c997', '#0dcaf0')
+
+
+def _normalize(text):
+    """ 比對用：統一 Unicode 正規化、去除空白並忽略大小寫 """
+    return unicodedata.normalize('NFC', str(text)).strip().casefold()
+
+
+class PhotoIndex:
+    """
+    學號 → 照片檔名的索引.
+    啟動時掃描照片資料夾一次；之後查詢時若資料夾有變動 (新增、刪除、改名) 會自動重建。
+    比對不分大小寫，並容許檔名中姓名部分與資料庫不同或省略。
+    """
+
+    def __init__(self, photo_dir, check_interval=2.0):
+        self.photo_dir = photo_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._by_id = {}
+        self._dir_mtime = None
+        self._last_check = 0.0
+        self.rebuild()
+
+    def rebuild(self):
+        """ 重新掃描照片資料夾 """
+        by_id = {}
+        try:
+            dir_mtime = os.stat(self.photo_dir).st_mtime_ns
+            filenames = sorted(os.listdir(self.photo_dir))
+        except FileNotFoundError:
+            dir_mtime, filenames = None, []
+
+        for filename in filenames:
+            stem, extension = os.path.splitext(filename)
+            if extension.lower() not in PHOTO_EXTENSIONS:
+                continue
+            match = _STUDENT_ID_PATTERN.match(unicodedata.normalize('NFC', stem))
+            if match:
+                student_id, name = match.groups()
+                by_id.setdefault(_normalize(student_id), []).append((_normalize(name), filename))
+
+        with self._lock:
+            self._by_id = by_id
+            self._dir_mtime = dir_mtime
+            self._last_check = time.monotonic()
+
+    def _refresh_if_changed(self):
+        """ 每隔 check_interval 秒檢查一次資料夾修改時間，有變動才重建索引 """
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        try:
+            dir_mtime = os.stat(self.photo_dir).st_mtime_ns
+        except FileNotFoundError:
+            dir_mtime = None
+        if dir_mtime != self._dir_mtime:
+            self.rebuild()
+
+    def lookup(self, student_id, name=None):
+        """ 取得學生照片的檔名 (相對於照片資料夾)，找不到時回傳 None """
+        self._refresh_if_changed()
+        candidates = self._by_id.get(_normalize(student_id))
+        if not candidates:
+            return None
+        if name is not None and len(candidates) > 1:
+            wanted = _normalize(name)
+            for candidate_name, filename in candidates:
+                if candidate_name == wanted:
+                    return filename
+        return candidates[0][1]
+
+    def __len__(self):
+        return sum(len(files) for files in self._by_id.values())
+
+
+def initials_avatar_svg(name, size=128):
+    """ 產生以姓名第一個字為圖樣的 SVG 頭像，用於沒有照片的學生 (不需任何外部連線) """
+    name = (name or '').strip()
+    initial = escape(name[:1] or '?')
+    color = AVATAR_COLORS[int(hashlib.md5(name.encode('utf-8')).hexdigest(), 16) % len(AVATAR_COLORS)]
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 100 100">'
+        f'<rect width="100" height="100" fill="{color}"/>'
+        f'<text x="50" y="50" dy=".35em" text-anchor="middle" font-size="48" '
+        f'font-family="sans-serif" fill="#ffffff">{initial}</text>'
+        f'</svg>'
+    )
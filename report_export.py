@@ -0,0 +1,175 @@
+import codecs
+import csv
+import io
+import os
+import tempfile
+from itertools import groupby
+import database as db
+import grade_summary
+
+# 成績單每批計算的學生數 (以完整班級為單位，實際人數可能略多)
+EXPORT_BATCH_STUDENTS = 500
+
+# 每累積這麼多位元組就送出一次 CSV 內容
+CSV_FLUSH_BYTES = 64 * 1024
+
+# 背景匯出時每寫出這麼多列回報一次進度 (同時檢查是否已取消)
+PROGRESS_ROWS = 200
+
+# 報表種類與輸出格式
+REPORT_TITLES = {'grades': '成績單', 'attendance': '出缺席統計'}
+MIMETYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+# --- 報表內容 (逐列產生) ---
+
+def grade_sheet_rows(class_name=None):
+    """
+    產生成績單：第一列為標題，之後每位學生一列.
+    資料依班級順序分批讀取 (每批為完整的數個班級)，逐批計算加權成績與班級排名，
+    記憶體用量只與批次大小有關，與全校人數無關。
+    """
+    items = grade_summary.load_items()
+    item_ids = list(items['id'])
+    type_names = [t for t in grade_summary.TYPE_WEIGHTS if t in set(items['type'])]
+    yield ['班級', '學號', '姓名'] + list(items['name']) + type_names + ['學期成績', '班級排名']
+
+    batch = []
+    batch_students = set()
+    for _, class_rows in groupby(db.iter_grade_rows_by_class(class_name), key=lambda row: row[3]):
+        class_rows = list(class_rows)
+        batch.extend(class_rows)
+        batch_students.update(row[0] for row in class_rows)
+        if len(batch_students) >= EXPORT_BATCH_STUDENTS:
+            yield from _grade_sheet_batch(batch, items, item_ids, type_names)
+            batch = []
+            batch_students = set()
+    if batch:
+        yield from _grade_sheet_batch(batch, items, item_ids, type_names)
+
+
+def _grade_sheet_batch(rows, items, item_ids, type_names):
+    """ 計算一批 (數個完整班級) 學生的加權成績與班級排名，逐列產生 """
+    students, matrix = grade_summary.build_score_matrix(rows, item_ids)
+    _, type_scores, semester = grade_summary.compute_weighted_scores(matrix, items)
+    type_scores = type_scores.reindex(columns=type_names)
+    rank = semester.groupby(students['class_name']).rank(ascending=False, method='min')
+
+    for student_id, name, student_class, item_scores, student_types, average, student_rank in zip(
+            students['student_id'], students['name'], students['class_name'],
+            matrix.round(2).to_numpy(), type_scores.round(2).to_numpy(),
+            semester.round(2).to_numpy(), rank.to_numpy()):
+        yield ([student_class, student_id, name]
+               + [_cell(v) for v in item_scores]
+               + [_cell(v) for v in student_types]
+               + [_cell(average), _cell(student_rank)])
+
+
+def attendance_rows(class_name=None, start_date=None, end_date=None):
+    """ 產生出缺席統計：第一列為標題，之後每位學生一列 """
+    yield ['班級', '學號', '姓名'] + list(db.ATTENDANCE_STATUSES)
+    for row in db.iter_attendance_stats(class_name, start_date, end_date):
+        yield list(row)
+
+
+def report_rows(report, class_name=None, start_date=None, end_date=None):
+    """ 依報表種類產生內容列；不支援的種類拋出 KeyError """
+    if report == 'grades':
+        return grade_sheet_rows(class_name)
+    if report == 'attendance':
+        return attendance_rows(class_name, start_date, end_date)
+    raise KeyError(report)
+
+
+def _cell(value):
+    """ 缺值 (NaN) 輸出為空白；整數值不帶小數點 """
+    if value is None or value != value:
+        return None
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+# --- 輸出格式 ---
+
+def stream_csv(rows):
+    """ 將列逐批轉成 CSV 位元組，產生器可直接作為串流回應 """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # 加上 BOM，Excel 開啟時才能正確辨識 UTF-8 中文
+    yield codecs.BOM_UTF8
+    for row in rows:
+        writer.writerow(['' if v is None else v for v in row])
+        if buffer.tell() >= CSV_FLUSH_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def write_xlsx(rows, sheet_title):
+    """
+    以 openpyxl 唯寫模式寫出 .xlsx 暫存檔並回傳路徑.
+    唯寫模式每寫一列就直接寫入磁碟，不會在記憶體中保留整份工作表。
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title)
+    for row in rows:
+        sheet.append(row)
+    handle, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(handle)
+    workbook.save(path)
+    return path
+
+
+def stream_file(path, chunk_size=64 * 1024):
+    """ 逐段讀出暫存檔，傳送完畢後刪除 """
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def write_csv(rows):
+    """ 將 CSV 寫入暫存檔並回傳路徑 """
+    handle, path = tempfile.mkstemp(suffix='.csv')
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            for chunk in stream_csv(rows):
+                f.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+# --- 背景匯出 ---
+
+def _with_progress(rows, job):
+    """ 逐列轉交內容，每 PROGRESS_ROWS 列回報一次進度 (不含標題列) """
+    index = 0
+    for index, row in enumerate(rows):
+        if index and index % PROGRESS_ROWS == 0:
+            job.progress(processed=index)
+        yield row
+    job.progress(processed=index)
+
+
+def run_export_job(job, report, fmt, class_name=None, start_date=None, end_date=None):
+    """
+    背景工作：將報表寫成暫存檔並登記於工作，完成後由下載網址取得.
+    工作被取消時中止寫出，暫存檔會被刪除。
+    """
+    title = REPORT_TITLES[report]
+    rows = _with_progress(report_rows(report, class_name, start_date, end_date), job)
+    path = write_xlsx(rows, title) if fmt == 'xlsx' else write_csv(rows)
+    download_name = f'{class_name or "全校"}_{title}.{fmt}'
+    job.attach_file(path, download_name, MIMETYPES[fmt])
+    return {'rows': job.processed, 'download_name': download_name}
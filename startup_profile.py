@@ -0,0 +1,70 @@
+import builtins
+import sys
+import time
+
+# --- 啟動時間分析 (app.py --profile-startup) ---
+# 以包裝 __import__ 的方式記錄每個模組第一次載入的時間，打包成 .exe 後無法使用 python -X importtime 時也能分析
+
+_original_import = builtins.__import__
+_records = []   # (模組名稱, 巢狀深度, 含子模組的耗時, 自身耗時)
+_stack = []     # 每一層目前累計的子模組耗時
+_marks = []     # (說明, 時間點)
+_started = None
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level != 0 or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    depth = len(_stack)
+    _stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - start
+        children = _stack.pop()
+        if _stack:
+            _stack[-1] += elapsed
+        _records.append((name, depth, elapsed, elapsed - children))
+
+
+def install():
+    """ 開始記錄模組載入時間；需在其他 import 之前呼叫 """
+    global _started
+    _started = time.perf_counter()
+    builtins.__import__ = _timed_import
+
+
+def mark(label):
+    """ 記錄啟動過程中的一個時間點 """
+    _marks.append((label, time.perf_counter()))
+
+
+def report(top=15, file=None):
+    """ 輸出啟動時間分析：各階段耗時、直接載入的模組與最耗時的套件 """
+    file = file or sys.stdout
+    builtins.__import__ = _original_import
+    total = time.perf_counter() - _started
+
+    print('=' * 60, file=file)
+    print(f'啟動時間分析 (總計 {total * 1000:.0f} ms)', file=file)
+    print('=' * 60, file=file)
+
+    print('\n[各階段]', file=file)
+    previous = _started
+    for label, moment in _marks:
+        print(f'  {label:<36} {(moment - previous) * 1000:8.1f} ms', file=file)
+        previous = moment
+
+    print(f'\n[直接載入的模組] (含子模組，前 {top} 名)', file=file)
+    direct = sorted((r for r in _records if r[1] == 0), key=lambda r: r[2], reverse=True)
+    for name, _, inclusive, _ in direct[:top]:
+        print(f'  {name:<36} {inclusive * 1000:8.1f} ms', file=file)
+
+    print(f'\n[各套件自身耗時] (前 {top} 名)', file=file)
+    packages = {}
+    for name, _, _, own in _records:
+        package = name.split('.', 1)[0]
+        packages[package] = packages.get(package, 0.0) + own
+    for package, own in sorted(packages.items(), key=lambda p: p[1], reverse=True)[:top]:
+        print(f'  {package:<36} {own * 1000:8.1f} ms  {own / total * 100:5.1f}%', file=file)
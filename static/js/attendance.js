@@ -0,0 +1,127 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const container = document.getElementById('attendance-table-container');
+
+    // 如果頁面上沒有點名元件，就停止執行
+    if (!container) {
+        return;
+    }
+
+    const className = container.dataset.className;
+    const dateInput = document.getElementById('attendance-date');
+    const saveBtn = document.getElementById('save-attendance-btn');
+    const allPresentBtn = document.getElementById('attendance-all-present-btn');
+
+    // 預設為今天 (本地時間)
+    const today = new Date();
+    today.setMinutes(today.getMinutes() - today.getTimezoneOffset());
+    dateInput.value = today.toISOString().slice(0, 10);
+
+    // --- 事件監聽器 ---
+
+    dateInput.addEventListener('change', loadAttendance);
+    saveBtn.addEventListener('click', saveAttendance);
+    allPresentBtn.addEventListener('click', () => {
+        container.querySelectorAll('.attendance-status').forEach(select => { select.value = '出席'; });
+    });
+
+    // 其他老師儲存了同一班的點名：正在檢視同一天時直接更新對應的列
+    document.addEventListener('live:attendance', (event) => {
+        event.detail.changes.forEach(([studentDbId, date, status, notes]) => {
+            if (date !== dateInput.value) return;
+            const row = container.querySelector(`tr[data-student-db-id="${studentDbId}"]`);
+            // 正在編輯的列以本機的值為準
+            if (!row || row.contains(document.activeElement)) return;
+            row.querySelector('.attendance-status').value = status;
+            row.querySelector('.attendance-notes').value = notes || '';
+        });
+    });
+
+    loadAttendance();
+
+    // --- 函式 ---
+
+    /**
+     * 讀取所選日期的整班點名表
+     */
+    async function loadAttendance() {
+        container.innerHTML = '<p class="text-center text-muted">載入點名資料中...</p>';
+        try {
+            const response = await fetch(`/api/attendance/${encodeURIComponent(className)}/${dateInput.value}`);
+            if (!response.ok) throw new Error('Failed to fetch attendance.');
+            const data = await response.json();
+
+            let tableHTML = `
+                <div class="table-responsive">
+                    <table class="table table-striped table-hover table-sm align-middle">
+                        <thead>
+                            <tr>
+                                <th style="width: 15%;">學號</th>
+                                <th style="width: 15%;">姓名</th>
+                                <th style="width: 20%;">狀態</th>
+                                <th>日常表現</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+            `;
+            data.students.forEach(student => {
+                const current = student.status || '出席';
+                const options = data.statuses.map(status =>
+                    `<option value="${status}" ${status === current ? 'selected' : ''}>${status}</option>`).join('');
+                tableHTML += `
+                    <tr data-student-db-id="${student.id}">
+                        <td>${escapeHTML(student.student_id)}</td>
+                        <td>${escapeHTML(student.name)}</td>
+                        <td><select class="form-select form-select-sm attendance-status">${options}</select></td>
+                        <td><input type="text" class="form-control form-control-sm attendance-notes"
+                                   value="${escapeHTML(student.notes || '')}" placeholder="--"></td>
+                    </tr>
+                `;
+            });
+            tableHTML += '</tbody></table></div>';
+            container.innerHTML = tableHTML;
+        } catch (error) {
+            console.error('Error loading attendance:', error);
+            container.innerHTML = '<div class="alert alert-danger">載入點名資料失敗，請檢查網路連線或稍後再試。</div>';
+        }
+    }
+
+    /**
+     * 以單一請求儲存整班的點名結果
+     */
+    async function saveAttendance() {
+        const records = Array.from(container.querySelectorAll('tr[data-student-db-id]')).map(row => ({
+            student_db_id: row.dataset.studentDbId,
+            status: row.querySelector('.attendance-status').value,
+            notes: row.querySelector('.attendance-notes').value,
+        }));
+        if (records.length === 0) return;
+
+        saveBtn.disabled = true;
+        saveBtn.textContent = '儲存中...';
+        try {
+            const response = await fetch(`/api/attendance/${encodeURIComponent(className)}/${dateInput.value}`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ records: records }),
+            });
+            const data = await response.json();
+            if (response.ok && data.status === 'success') {
+                alert(`已儲存 ${data.saved} 位學生的點名紀錄！`);
+            } else {
+                throw new Error(data.message || '儲存失敗');
+            }
+        } catch (error) {
+            console.error('儲存點名時發生錯誤:', error);
+            alert('儲存點名時發生錯誤: ' + error.message);
+        } finally {
+            saveBtn.disabled = false;
+            saveBtn.textContent = '儲存點名';
+        }
+    }
+
+    function escapeHTML(text) {
+        const div = document.createElement('div');
+        div.textContent = text;
+        return div.innerHTML.replace(/"/g, '&quot;');
+    }
+});
@@ -42,8 +42,10 @@ document.addEventListener('DOMContentLoaded', function () {
             const result = await response.json();
 
             if (response.ok && result.status === 'success') {
-                alert('新增成功！頁面將會重新整理。');
-                window.location.reload();
+                // 選單由即時更新 (live:grade_items) 或此處重新載入，不需重新整理整頁
+                addGradeItemModal.hide();
+                nameInput.value = '';
+                refreshGradeItems();
             } else {
                 alert('新增失敗: ' + result.message);
             }
@@ -53,8 +55,41 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     });
 
+    // 其他老師修改了同一班的成績：直接更新目前表格中的對應欄位
+    document.addEventListener('live:grades', (event) => {
+        event.detail.changes.forEach(([studentDbId, itemId, score]) => {
+            const input = tableContainer.querySelector(
+                `.grade-input[data-student-db-id="${studentDbId}"][data-item-id="${itemId}"]`);
+            // 正在輸入或尚未送出的欄位以本機的值為準
+            if (!input || input === document.activeElement || pendingGrades.has(`${studentDbId}:${itemId}`)) return;
+            const value = score === null ? '' : String(score);
+            if (input.value === value || Number(input.value) === score) return;
+            input.value = value;
+            input.style.backgroundColor = '#cfe2ff';
+            setTimeout(() => { input.style.backgroundColor = ''; }, 1200);
+        });
+    });
+
+    document.addEventListener('live:grade_items', refreshGradeItems);
+
     // --- Functions ---
 
+    // 重新載入成績項目選單，保留目前的選擇
+    async function refreshGradeItems() {
+        try {
+            const response = await fetch('/api/grade_items');
+            if (!response.ok) throw new Error('Failed to fetch grade items.');
+            const items = await response.json();
+            const selected = gradeItemSelect.value;
+            const options = [new Option('請選擇...', '')].concat(
+                items.map(item => new Option(`${item.name} (${item.type})`, item.id)));
+            gradeItemSelect.replaceChildren(...options);
+            gradeItemSelect.value = selected;
+        } catch (error) {
+            console.error('Error refreshing grade items:', error);
+        }
+    }
+
     // 載入成績輸入表格
     async function loadGradeEntryTable(itemId) {
         const pathParts = window.location.pathname.split('/');
@@ -148,39 +183,68 @@ document.addEventListener('DOMContentLoaded', function () {
     }
 
     let saveTimeout; // 用於延遲儲存的計時器
-    // 儲存單筆成績的函式
-    async function saveGrade(inputElement) {
+    const pendingGrades = new Map(); // 尚未送出的成績變更，key 為 "學生ID:項目ID"
+
+    // 將單筆成績加入待送出佇列，短時間內的多筆變更會合併成一次批次請求
+    function saveGrade(inputElement) {
         const studentDbId = inputElement.dataset.studentDbId;
         const itemId = inputElement.dataset.itemId;
-        const score = inputElement.value;
 
         // 提供視覺回饋：變為黃色表示處理中
         inputElement.style.backgroundColor = '#fff3cd';
 
-        clearTimeout(saveTimeout); // 如果使用者連續輸入，清除上一次的計時
-        saveTimeout = setTimeout(async () => {
-            try {
-                const response = await fetch('/api/grades/update', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ student_db_id: studentDbId, item_id: itemId, score: score }),
+        // 同一格重複修改時只保留最新的值
+        pendingGrades.set(`${studentDbId}:${itemId}`, inputElement);
+
+        clearTimeout(saveTimeout); // 如果使用者連續輸入，延後送出時間
+        saveTimeout = setTimeout(flushPendingGrades, 300); // 延遲 300 毫秒後一次送出所有變更
+    }
+
+    // 以單一請求送出所有待儲存的成績
+    async function flushPendingGrades() {
+        if (pendingGrades.size === 0) return;
+
+        const inputElements = Array.from(pendingGrades.values());
+        pendingGrades.clear();
+        const changes = inputElements.map(el => ({
+            student_db_id: el.dataset.studentDbId,
+            item_id: el.dataset.itemId,
+            score: el.value,
+        }));
+
+        try {
+            const response = await fetch('/api/grades/batch', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ changes: changes }),
+            });
+            const result = await response.json();
+            if (response.ok && result.status === 'success') {
+                // 儲存成功，變為綠色，短暫停留後恢復原色
+                inputElements.forEach(el => {
+                    el.style.backgroundColor = '#d1e7dd';
+                    setTimeout(() => { el.style.backgroundColor = ''; }, 1200);
                 });
-                const result = await response.json();
-                if (response.ok && result.status === 'success') {
-                    // 儲存成功，變為綠色
-                    inputElement.style.backgroundColor = '#d1e7dd';
-                    // 短暫停留後恢復原色
-                    setTimeout(() => { inputElement.style.backgroundColor = ''; }, 1200);
-                } else {
-                    // 儲存失敗，變為紅色
-                    inputElement.style.backgroundColor = '#f8d7da';
-                    alert('儲存失敗: ' + (result.message || '未知錯誤'));
-                }
-            } catch (error) {
-                console.error('Error saving grade:', error);
-                inputElement.style.backgroundColor = '#f8d7da'; // 網路錯誤，變為紅色
-                alert('儲存成績時發生網路錯誤。');
+            } else {
+                // 儲存失敗，變為紅色
+                inputElements.forEach(el => { el.style.backgroundColor = '#f8d7da'; });
+                alert('儲存失敗: ' + (result.message || '未知錯誤'));
             }
-        }, 300); // 延遲 300 毫秒後執行，避免使用者快速輸入時造成過多請求
+        } catch (error) {
+            console.error('Error saving grades:', error);
+            inputElements.forEach(el => { el.style.backgroundColor = '#f8d7da'; }); // 網路錯誤，變為紅色
+            alert('儲存成績時發生網路錯誤。');
+        }
     }
+
+    // 離開頁面前盡量送出尚未儲存的變更
+    window.addEventListener('pagehide', () => {
+        if (pendingGrades.size === 0) return;
+        const changes = Array.from(pendingGrades.values()).map(el => ({
+            student_db_id: el.dataset.studentDbId,
+            item_id: el.dataset.itemId,
+            score: el.value,
+        }));
+        navigator.sendBeacon('/api/grades/batch', new Blob([JSON.stringify({ changes: changes })], { type: 'application/json' }));
+    });
 });
@@ -0,0 +1,30 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const element = document.getElementById('live-updates');
+
+    // 如果頁面上沒有即時更新設定 (或伺服器未啟動推播)，就停止執行
+    if (!element || !element.dataset.eventsPort || !window.EventSource) {
+        return;
+    }
+
+    // 推播由另一個連接埠提供，需帶上登入的 cookie
+    const className = element.dataset.className;
+    const url = `${window.location.protocol}//${window.location.hostname}:${element.dataset.eventsPort}`
+        + `/api/class/${encodeURIComponent(className)}/events`;
+    const source = new EventSource(url, { withCredentials: true });
+
+    // 各分頁的腳本以 document 上的 live:<事件> 接收更新，例如 live:grades、live:seats
+    ['grades', 'attendance', 'seats', 'layout', 'grade_items'].forEach(type => {
+        source.addEventListener(type, (event) => {
+            document.dispatchEvent(new CustomEvent(`live:${type}`, { detail: JSON.parse(event.data) }));
+        });
+    });
+
+    // 名單重新匯入，或斷線太久無法補送錯過的更新時，重新載入整頁
+    source.addEventListener('students', () => window.location.reload());
+    source.addEventListener('resync', () => window.location.reload());
+
+    source.addEventListener('error', () => {
+        // EventSource 會自動重新連線，並以最後收到的事件編號補送錯過的更新
+        console.warn('即時更新連線中斷，重新連線中...');
+    });
+});
@@ -0,0 +1,55 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const links = document.querySelectorAll('a[data-export-job]');
+    const statusText = document.getElementById('export-status');
+
+    // 如果頁面上沒有匯出按鈕，就停止執行
+    if (links.length === 0) {
+        return;
+    }
+
+    // 報表改在伺服器背景產生，完成後才下載；背景工作無法使用時退回原本的直接下載連結
+    links.forEach(link => {
+        link.addEventListener('click', async (event) => {
+            event.preventDefault();
+            try {
+                const response = await fetch(link.dataset.exportJob, { method: 'POST' });
+                if (!response.ok) throw new Error('Failed to start export job.');
+                const job = await response.json();
+                statusText.textContent = `正在產生「${link.textContent.trim()}」...`;
+                pollJob(job.id, link);
+            } catch (error) {
+                console.error('建立匯出工作時發生錯誤:', error);
+                window.location.href = link.href;
+            }
+        });
+    });
+
+    /**
+     * 定期查詢匯出工作，完成後開始下載
+     * @param {string} jobId - 背景工作編號
+     * @param {HTMLAnchorElement} link - 觸發匯出的按鈕
+     */
+    async function pollJob(jobId, link) {
+        link.classList.add('disabled');
+        try {
+            const response = await fetch(`/api/jobs/${jobId}`);
+            if (!response.ok) throw new Error('Failed to fetch export job.');
+            const job = await response.json();
+            if (job.status === 'done') {
+                statusText.textContent = `「${job.result.download_name}」已完成，共 ${job.result.rows} 列。`;
+                link.classList.remove('disabled');
+                window.location.href = `/api/jobs/${jobId}/download`;
+                return;
+            }
+            if (job.status === 'failed' || job.status === 'cancelled') {
+                statusText.textContent = `匯出失敗: ${job.message}`;
+                link.classList.remove('disabled');
+                return;
+            }
+            statusText.textContent = `正在產生「${link.textContent.trim()}」，已處理 ${job.processed} 列...`;
+        } catch (error) {
+            console.error('查詢匯出進度時發生錯誤:', error);
+        }
+        setTimeout(() => pollJob(jobId, link), 500);
+    }
+});
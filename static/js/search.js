@@ -0,0 +1,69 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const input = document.getElementById('search-input');
+
+    // 如果頁面上沒有搜尋欄，就停止執行
+    if (!input) {
+        return;
+    }
+
+    const results = document.getElementById('search-results');
+    const studentList = document.getElementById('search-students');
+    const noteList = document.getElementById('search-notes');
+    const statusText = document.getElementById('search-status');
+    let timer = null;
+    let controller = null;
+
+    // 輸入停頓 200ms 後才搜尋，新的搜尋會中止尚未完成的舊請求
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(search, 200);
+    });
+
+    async function search() {
+        const query = input.value.trim();
+        if (controller) controller.abort();
+        if (!query) {
+            results.hidden = true;
+            return;
+        }
+        controller = new AbortController();
+        try {
+            const url = `${input.dataset.searchUrl}?q=${encodeURIComponent(query)}`;
+            const response = await fetch(url, { signal: controller.signal });
+            if (!response.ok) throw new Error('Search request failed.');
+            render(await response.json());
+        } catch (error) {
+            if (error.name === 'AbortError') return;
+            console.error('搜尋時發生錯誤:', error);
+            statusText.textContent = '搜尋失敗，請稍後再試。';
+            results.hidden = false;
+        }
+    }
+
+    /**
+     * 顯示搜尋結果：學生在前，日常表現紀錄在後
+     * @param {object} data - /api/search 的回應
+     */
+    function render(data) {
+        studentList.replaceChildren(...data.students.map(student => item(
+            student.url, student.name, `${student.class_name} · ${student.student_id}`)));
+        noteList.replaceChildren(...data.notes.map(note => item(
+            note.url, note.excerpt, `${note.date} · ${note.class_name} ${note.name} · ${note.status}`)));
+        const total = data.students.length + data.notes.length;
+        statusText.textContent = total ? '' : `找不到符合「${data.query}」的資料。`;
+        results.hidden = false;
+    }
+
+    function item(href, title, detail) {
+        const link = document.createElement('a');
+        link.href = href;
+        link.className = 'list-group-item list-group-item-action d-flex justify-content-between';
+        const main = document.createElement('span');
+        main.textContent = title;
+        const small = document.createElement('small');
+        small.className = 'text-muted';
+        small.textContent = detail;
+        link.append(main, small);
+        return link;
+    }
+});
@@ -8,6 +8,12 @@ document.addEventListener('DOMContentLoaded', function () {
         return;
     }
 
+    const layoutMatch = grid.className.match(/layout-(\d+x\d+)/);
+    let currentLayout = layoutMatch ? layoutMatch[1] : null;
+    const unseated = new Map(); // 目前不在座位表上的學生卡片，key 為學生資料庫 ID
+    let dragging = false;
+    let deferredSeats = []; // 拖曳中收到的座位更新，放開後再套用
+
     // --- 事件監聽器 ---
 
     if (saveBtn) {
@@ -23,21 +29,43 @@ document.addEventListener('DOMContentLoaded', function () {
                     updateLayout(this.dataset.layout);
                 } else {
                     // 如果使用者取消，把按鈕切換回來
-                    window.location.reload();
+                    checkLayoutRadio(currentLayout);
                 }
             }
         });
     });
 
+    // 其他老師修改了同一班的座位或佈局：直接更新座位表，不重新載入頁面
+    document.addEventListener('live:layout', (event) => {
+        if (event.detail.layout !== currentLayout) applyLayout(event.detail.layout);
+    });
+    document.addEventListener('live:seats', (event) => {
+        if (dragging) {
+            deferredSeats = deferredSeats.concat(event.detail.changes);
+        } else {
+            applySeats(event.detail.changes);
+        }
+    });
+
     // --- SortableJS 初始化 ---
     
     // 為每一個座位格啟用 Sortable，以達成交換效果
-    const seatSlots = document.querySelectorAll('.seat-slot');
-    seatSlots.forEach(slot => {
+    grid.querySelectorAll('.seat-slot').forEach(initSortable);
+
+    function initSortable(slot) {
         new Sortable(slot, {
             group: 'students', // 必須設為相同群組才能互相拖曳
             animation: 150,
             ghostClass: 'sortable-ghost',
+            onStart: function () {
+                dragging = true;
+            },
+            onEnd: function () {
+                dragging = false;
+                const changes = deferredSeats;
+                deferredSeats = [];
+                if (changes.length) applySeats(changes);
+            },
             // 當有學生卡片被放入此座位格時觸發
             onAdd: function (evt) {
                 const fromSlot = evt.from; // 來源座位格
@@ -56,7 +84,7 @@ document.addEventListener('DOMContentLoaded', function () {
                 }
             }
         });
-    });
+    }
 
     // --- 函式 ---
     
@@ -117,14 +145,93 @@ document.addEventListener('DOMContentLoaded', function () {
             });
             const data = await response.json();
             if (data.status === 'success') {
-                window.location.reload(); 
+                // 依伺服器重新排好的座位直接更新，不重新載入整頁 (照片也不需重新下載)
+                applyLayout(data.layout);
+                applySeats(data.seats);
             } else {
                  throw new Error('更新佈局失敗');
             }
         } catch (error) {
             console.error('更新佈局時發生錯誤:', error);
             alert('更新佈局時發生錯誤。');
+            checkLayoutRadio(currentLayout);
         }
     }
+
+    function checkLayoutRadio(layout) {
+        const radio = document.querySelector(`input[name="layout-switch"][data-layout="${layout}"]`);
+        if (radio) radio.checked = true;
+    }
+
+    /**
+     * 以新的佈局重建空的座位格，原本的學生卡片暫時移出 (等待座位更新再放回)
+     * @param {string} layout - 佈局字串，例如 '8x5'
+     */
+    function applyLayout(layout) {
+        const [rows, cols] = layout.split('x').map(Number);
+        grid.querySelectorAll('.student-card-wrapper').forEach(card => {
+            unseated.set(card.dataset.studentId, card);
+            card.remove();
+        });
+        grid.querySelectorAll('.seat-slot').forEach(slot => {
+            const sortable = Sortable.get(slot);
+            if (sortable) sortable.destroy();
+        });
+
+        const slots = [];
+        for (let r = 0; r < rows; r++) {
+            for (let c = 0; c < cols; c++) {
+                const slot = document.createElement('div');
+                slot.className = 'seat-slot';
+                slot.dataset.row = r;
+                slot.dataset.col = c;
+                slots.push(slot);
+            }
+        }
+        grid.replaceChildren(...slots);
+        grid.className = `seating-chart-grid layout-${layout}`;
+        slots.forEach(initSortable);
+        currentLayout = layout;
+        checkLayoutRadio(layout);
+    }
+
+    /**
+     * 把學生卡片移到指定的座位
+     * @param {Array} changes - [學生資料庫 ID, 列, 欄] 的列表
+     */
+    function applySeats(changes) {
+        const moves = [];
+        let missing = false;
+        changes.forEach(([studentDbId, row, col]) => {
+            const id = String(studentDbId);
+            const card = grid.querySelector(`.student-card-wrapper[data-student-id="${id}"]`) || unseated.get(id);
+            if (!card) {
+                missing = true;
+                return;
+            }
+            moves.push([card, grid.querySelector(`.seat-slot[data-row="${row}"][data-col="${col}"]`)]);
+        });
+
+        // 先全部取出再放入，互換座位時才不會互相覆蓋
+        moves.forEach(([card]) => {
+            card.remove();
+            unseated.delete(card.dataset.studentId);
+        });
+        moves.forEach(([card, slot]) => {
+            if (!slot) {
+                // 座位超出目前的佈局
+                unseated.set(card.dataset.studentId, card);
+                return;
+            }
+            slot.querySelectorAll('.student-card-wrapper').forEach(other => {
+                unseated.set(other.dataset.studentId, other);
+                other.remove();
+            });
+            slot.appendChild(card);
+        });
+
+        // 頁面上沒有這位學生的卡片 (例如剛加入的學生)，只能重新載入
+        if (missing) window.location.reload();
+    }
 });
 
@@ -0,0 +1,205 @@
+document.addEventListener('DOMContentLoaded', function () {
+    const importForm = document.getElementById('student-import-form');
+
+    // 如果頁面上沒有匯入表單，就停止執行
+    if (!importForm) {
+        return;
+    }
+
+    const progressBox = document.getElementById('import-progress');
+    const progressBar = progressBox.querySelector('.progress-bar');
+    const progressText = document.getElementById('import-progress-text');
+    const cancelBtn = document.getElementById('import-cancel-btn');
+    const resultBox = document.getElementById('import-result');
+
+    // 送出表單時先顯示「上傳中」；上傳完成後伺服器在背景匯入，並轉址回本頁 (?job=工作編號)
+    importForm.addEventListener('submit', function () {
+        resultBox.classList.add('d-none');
+        progressBox.classList.remove('d-none');
+    });
+
+    const jobId = new URLSearchParams(window.location.search).get('job');
+    if (jobId) {
+        progressBox.classList.remove('d-none');
+        cancelBtn.classList.remove('d-none');
+        progressText.textContent = '等待匯入開始...';
+        cancelBtn.addEventListener('click', () => cancelJob(jobId));
+        pollJob(jobId);
+    }
+
+    /**
+     * 定期查詢背景匯入工作，更新進度列；結束後顯示結果
+     * @param {string} jobId - 背景工作編號
+     */
+    async function pollJob(jobId) {
+        try {
+            const response = await fetch(`/api/jobs/${jobId}`);
+            if (!response.ok) {
+                showResult('danger', '找不到此匯入工作，可能已過期。');
+                return;
+            }
+            const job = await response.json();
+            if (job.status === 'done') {
+                showResult('success', job.result.message);
+                return;
+            }
+            if (job.status === 'failed') {
+                showResult('danger', `匯入失敗，資料未變更: ${job.message}`);
+                return;
+            }
+            if (job.status === 'cancelled') {
+                showResult('warning', '匯入已取消，資料未變更。');
+                return;
+            }
+            updateProgress(job);
+        } catch (error) {
+            console.error('查詢匯入進度時發生錯誤:', error);
+        }
+        setTimeout(() => pollJob(jobId), 500);
+    }
+
+    /**
+     * 依工作狀態更新進度列
+     * @param {object} job - /api/jobs/<id> 的回應
+     */
+    function updateProgress(job) {
+        const label = job.message ? `${job.message}，` : '';
+        if (job.total) {
+            const percent = Math.min(100, Math.round(job.processed * 100 / job.total));
+            progressBar.style.width = percent + '%';
+            progressText.textContent = `${label}已處理 ${job.processed} / ${job.total} 列`;
+        } else {
+            progressText.textContent = `${label}已處理 ${job.processed} 列`;
+        }
+    }
+
+    /**
+     * 要求取消匯入 (尚未寫入的資料會全部復原)
+     * @param {string} jobId - 背景工作編號
+     */
+    async function cancelJob(jobId) {
+        cancelBtn.disabled = true;
+        try {
+            await fetch(`/api/jobs/${jobId}/cancel`, { method: 'POST' });
+        } catch (error) {
+            console.error('取消匯入時發生錯誤:', error);
+            cancelBtn.disabled = false;
+        }
+    }
+
+    /**
+     * 隱藏進度列並顯示匯入結果
+     * @param {string} type - Bootstrap alert 類型
+     * @param {string} message - 顯示的訊息
+     */
+    function showResult(type, message) {
+        progressBox.classList.add('d-none');
+        resultBox.className = `alert alert-${type} mt-3 mb-0`;
+        resultBox.textContent = message;
+        // 移除網址上的工作編號，重新整理時不會再次查詢
+        window.history.replaceState(null, '', window.location.pathname);
+    }
+});
+
+document.addEventListener('DOMContentLoaded', function () {
+    const archiveForm = document.getElementById('archive-form');
+
+    // 如果頁面上沒有封存表單，就停止執行
+    if (!archiveForm) {
+        return;
+    }
+
+    const progressText = document.getElementById('archive-progress-text');
+    const resultBox = document.getElementById('archive-result');
+    const archiveList = document.getElementById('archive-list');
+    const submitBtn = archiveForm.querySelector('button[type="submit"]');
+
+    archiveForm.addEventListener('submit', async function (event) {
+        event.preventDefault();
+        const label = archiveForm.elements.label.value.trim();
+        if (!confirm(`確定要封存學期 ${label}？本學期的成績與點名紀錄將搬到封存檔，目前的頁面不再顯示。`)) {
+            return;
+        }
+        submitBtn.disabled = true;
+        resultBox.classList.add('d-none');
+        try {
+            const response = await fetch('/api/jobs/archive', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ label: label }),
+            });
+            const job = await response.json();
+            if (!response.ok) {
+                showResult('danger', job.message);
+                return;
+            }
+            pollJob(job.id);
+        } catch (error) {
+            console.error('送出封存工作時發生錯誤:', error);
+            showResult('danger', '無法送出封存工作，請稍後再試。');
+        }
+    });
+
+    /**
+     * 定期查詢背景封存工作；結束後顯示結果並更新已封存的學期列表
+     * @param {string} jobId - 背景工作編號
+     */
+    async function pollJob(jobId) {
+        try {
+            const response = await fetch(`/api/jobs/${jobId}`);
+            if (!response.ok) {
+                showResult('danger', '找不到此封存工作，可能已過期。');
+                return;
+            }
+            const job = await response.json();
+            if (job.status === 'done') {
+                showResult('success', job.result.message);
+                loadArchives();
+                return;
+            }
+            if (job.status === 'failed') {
+                showResult('danger', `封存失敗，資料未變更: ${job.message}`);
+                return;
+            }
+            if (job.status === 'cancelled') {
+                showResult('warning', '封存已取消，資料未變更。');
+                return;
+            }
+            progressText.textContent = job.message || '等待封存開始...';
+        } catch (error) {
+            console.error('查詢封存進度時發生錯誤:', error);
+        }
+        setTimeout(() => pollJob(jobId), 500);
+    }
+
+    /**
+     * 列出已封存的學期
+     */
+    async function loadArchives() {
+        try {
+            const response = await fetch('/api/archives');
+            const data = await response.json();
+            archiveList.replaceChildren(...data.archives.map(info => {
+                const item = document.createElement('li');
+                item.textContent = `${info.label}：${info.counts.grades} 筆成績、${info.counts.attendance} 筆點名紀錄 (封存於 ${info.archived_at.replace('T', ' ')})`;
+                return item;
+            }));
+        } catch (error) {
+            console.error('載入封存列表時發生錯誤:', error);
+        }
+    }
+
+    /**
+     * 顯示封存結果
+     * @param {string} type - Bootstrap alert 類型
+     * @param {string} message - 顯示的訊息
+     */
+    function showResult(type, message) {
+        submitBtn.disabled = false;
+        progressText.textContent = '';
+        resultBox.className = `alert alert-${type} mt-2 mb-0`;
+        resultBox.textContent = message;
+    }
+
+    loadArchives();
+});
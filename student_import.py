@@ -0,0 +1,380 @@
+import os
+import sqlite3
+import tempfile
+import time
+import pandas as pd
+import database as db
+from jobs import jobs
+
+# 匯入檔案必須包含的欄位
+REQUIRED_COLUMNS = ['學號', '姓名', '班級', '帳號']
+
+# 顯示在畫面上的錯誤訊息上限，避免整份名單都有問題時訊息過長
+MAX_REPORTED_ERRORS = 10
+
+# 每次讀取並寫入資料庫的列數；記憶體用量只與此值有關，與檔案大小無關
+CHUNK_SIZE = 2000
+
+# 支援的檔案格式
+ALLOWED_EXTENSIONS = ('.xlsx', '.csv')
+
+# 背景匯入時，超過此大小的檔案改在行程池解析與驗證 (小檔案啟動子行程反而較慢)
+PROCESS_PARSE_MIN_BYTES = 256 * 1024
+
+
+class RosterError(Exception):
+    """ 名單內容有誤，匯入已取消 """
+
+    def __init__(self, errors):
+        super().__init__(format_errors(errors))
+        self.errors = errors
+
+
+class UnarchivedDataError(Exception):
+    """ 目前資料庫仍有尚未封存的成績或點名紀錄，匯入會清除它們，因此拒絕匯入 """
+
+    def __init__(self, counts):
+        super().__init__(f'目前仍有 {counts["grades"]} 筆成績、{counts["attendance"]} 筆點名紀錄尚未封存，'
+                         f'匯入名單會清除這些資料。請先封存本學期，或勾選「不封存，直接清除」後重新匯入。')
+        self.counts = counts
+
+
+# --- 資料整理與驗證 ---
+
+def _as_text(series):
+    """
+    將欄位轉為去除前後空白的字串；Excel 讀入的數字 (例如 111041.0) 會去掉多餘的 .0，
+    空字串視為缺值.
+    """
+    text = series.astype('string').str.strip()
+    text = text.str.replace(r'\.0$', '', regex=True)
+    return text.mask(text == '')
+
+
+def normalize_roster(df):
+    """
+    以欄為單位驗證並整理學生名單.
+    df 的 index 為資料列的順序 (從 0 開始)，用來換算 Excel / CSV 的列號。
+    回傳 (整理後的 DataFrame, 錯誤列表)；錯誤列表的元素為 (列號, 訊息)。
+    """
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        return None, [(1, f'檔案缺少必要的欄位 ({", ".join(missing)})')]
+
+    roster = pd.DataFrame({
+        'student_id': _as_text(df['學號']),
+        'name': _as_text(df['姓名']),
+        'class_name': _as_text(df['班級']),
+        'account': _as_text(df['帳號']).fillna(''),
+    })
+    # 第 1 列為標題，資料從第 2 列開始
+    file_rows = pd.Series(df.index + 2, index=df.index)
+
+    # 完全空白的列直接略過
+    blank = roster[['student_id', 'name', 'class_name']].isna().all(axis=1)
+    roster = roster[~blank]
+    file_rows = file_rows[~blank]
+
+    errors = []
+    labels = {'student_id': '學號', 'name': '姓名', 'class_name': '班級'}
+    for col, label in labels.items():
+        empty = roster[col].isna()
+        errors.extend((row, f'第 {row} 列: 缺少{label}') for row in file_rows[empty])
+
+    duplicated = roster['student_id'].notna() & roster['student_id'].duplicated(keep='first')
+    for row, student_id in zip(file_rows[duplicated], roster['student_id'][duplicated]):
+        errors.append((row, f'第 {row} 列: 學號 {student_id} 重複'))
+
+    roster['file_row'] = file_rows
+    return roster, errors
+
+
+def format_errors(errors):
+    """ 將錯誤列表整理成可顯示的訊息 """
+    messages = [message for _, message in sorted(errors, key=lambda e: e[0])]
+    shown = '；'.join(messages[:MAX_REPORTED_ERRORS])
+    if len(messages) > MAX_REPORTED_ERRORS:
+        shown += f'；…等共 {len(messages)} 個錯誤'
+    return shown
+
+
+# --- 分段讀取檔案 ---
+
+def _detect_csv_encoding(filepath):
+    """ 學校系統匯出的 CSV 可能是 UTF-8 (含 BOM) 或 Big5 """
+    with open(filepath, 'rb') as f:
+        sample = f.read(64 * 1024)
+    try:
+        sample.decode('utf-8-sig')
+        return 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        # 取樣邊界可能切斷多位元組字元
+        if e.start >= len(sample) - 3:
+            return 'utf-8-sig'
+        return 'cp950'
+
+
+def _count_csv_rows(filepath):
+    """ 以串流方式計算資料列數 (不含標題)，供進度顯示 """
+    count = 0
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            count += block.count(b'\n')
+    return max(count - 1, 0)
+
+
+def _iter_csv_chunks(filepath, chunk_size):
+    """ 分段讀取 CSV，只保留必要欄位 """
+    encoding = _detect_csv_encoding(filepath)
+    header = pd.read_csv(filepath, nrows=0, encoding=encoding).columns
+    missing = [col for col in REQUIRED_COLUMNS if col not in header]
+    if missing:
+        raise RosterError([(1, f'檔案缺少必要的欄位 ({", ".join(missing)})')])
+    # chunksize 讀取時 index 會跨段連續編號，正好對應資料列順序
+    yield from pd.read_csv(filepath, usecols=REQUIRED_COLUMNS, dtype=str, encoding=encoding,
+                           chunksize=chunk_size, skip_blank_lines=False)
+
+
+def _iter_xlsx_chunks(filepath, chunk_size):
+    """ 以 openpyxl 唯讀模式逐列讀取第一個工作表，只保留必要欄位 """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+        missing = [col for col in REQUIRED_COLUMNS if col not in header]
+        if missing:
+            raise RosterError([(1, f'檔案缺少必要的欄位 ({", ".join(missing)})')])
+        positions = [header.index(col) for col in REQUIRED_COLUMNS]
+
+        start = 0
+        buffer = []
+        for row in rows:
+            buffer.append([row[i] if i < len(row) else None for i in positions])
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=REQUIRED_COLUMNS, index=range(start, start + len(buffer)))
+                start += len(buffer)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=REQUIRED_COLUMNS, index=range(start, start + len(buffer)))
+    finally:
+        workbook.close()
+
+
+def _xlsx_row_count(filepath):
+    """ 由工作表的 dimension 取得大約的資料列數 (不需讀完整個檔案) """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filepath, read_only=True)
+    try:
+        max_row = workbook.worksheets[0].max_row
+        return max(max_row - 1, 0) if max_row else None
+    finally:
+        workbook.close()
+
+
+def iter_roster_chunks(filepath, chunk_size=CHUNK_SIZE):
+    """ 依副檔名選擇讀取方式，逐段產生只含必要欄位的 DataFrame """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension == '.csv':
+        return _iter_csv_chunks(filepath, chunk_size)
+    if extension == '.xlsx':
+        return _iter_xlsx_chunks(filepath, chunk_size)
+    raise RosterError([(1, f'不支援的檔案格式 ({extension or "無副檔名"})，請上傳 .xlsx 或 .csv')])
+
+
+def count_roster_rows(filepath):
+    """ 估計檔案中的資料列數，無法得知時回傳 None """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension == '.csv':
+        return _count_csv_rows(filepath)
+    if extension == '.xlsx':
+        return _xlsx_row_count(filepath)
+    return None
+
+
+# --- 匯入 ---
+
+def _validated_rows(chunks, errors):
+    """
+    逐段驗證名單 (含跨段的學號重複檢查)，產生 (已處理列數, 可寫入的列).
+    發現的錯誤加入 errors；出現任何錯誤後不再產生可寫入的列。
+    """
+    processed = 0
+    seen_ids = set()
+    for chunk in chunks:
+        roster, chunk_errors = normalize_roster(chunk)
+        errors.extend(chunk_errors)
+        processed += len(chunk)
+        if roster is None:
+            yield processed, []
+            return
+
+        # 跨段檢查學號重複
+        ids = roster['student_id']
+        repeated = ids.notna() & ids.isin(seen_ids)
+        errors.extend((row, f'第 {row} 列: 學號 {sid} 重複')
+                      for row, sid in zip(roster['file_row'][repeated], ids[repeated]))
+        seen_ids.update(ids.dropna())
+
+        if errors:
+            yield processed, []
+        else:
+            yield processed, list(roster[['student_id', 'name', 'class_name', 'account']].itertuples(index=False, name=None))
+
+
+# 驗證後的名單先逐段寫入暫存的資料庫檔案 (不影響目前的資料)，全部通過後才在寫入執行緒一次取代學生資料：
+# 讀檔與驗證不會在寫入交易中進行，其他老師的寫入只需等待最後的取代；記憶體用量也只與每段的列數有關
+
+def _new_staging_path():
+    """ 建立暫存名單用的空白資料庫檔案路徑 """
+    fd, path = tempfile.mkstemp(prefix='roster-', suffix='.db')
+    os.close(fd)
+    return path
+
+
+def _remove_staging(path):
+    for suffix in ('', '-journal'):
+        try:
+            os.remove(path + suffix)
+        except OSError:
+            pass
+
+
+def stage_roster(chunks, staging_path, job=None):
+    """
+    逐段驗證名單並寫入暫存資料庫檔案，回傳 (已處理列數, 錯誤列表).
+    每段驗證後立即寫入並釋放；有錯誤時暫存檔的內容不會被使用。
+    """
+    errors = []
+    processed = 0
+    conn = sqlite3.connect(staging_path)
+    try:
+        conn.execute('CREATE TABLE roster (student_id TEXT, name TEXT, class_name TEXT, account TEXT)')
+        try:
+            for processed, rows in _validated_rows(chunks, errors):
+                if rows:
+                    conn.executemany('INSERT INTO roster VALUES (?, ?, ?, ?)', rows)
+                if job is not None:
+                    job.check_cancelled()
+                    job.progress(processed=processed)
+        except RosterError as e:
+            errors.extend(e.errors)
+        conn.commit()
+    finally:
+        conn.close()
+    return processed, errors
+
+
+def check_unarchived(discard_unarchived=False):
+    """ 目前資料庫有尚未封存的成績或點名紀錄且未指定 discard_unarchived 時拋出 UnarchivedDataError """
+    if discard_unarchived:
+        return
+    counts = db.count_semester_data()
+    if counts['grades'] or counts['attendance']:
+        raise UnarchivedDataError(counts)
+
+
+@db.exclusive_write
+def _replace_roster(staging_path, discard_unarchived=False):
+    """
+    在單一交易中清空舊資料並寫入暫存檔中驗證過的名單，回傳寫入筆數.
+    由寫入執行緒獨佔執行 (需要 ATTACH 暫存檔)，匯入期間其他老師的寫入會排隊等候，而不是等到逾時失敗。
+    清除前在同一輪寫入中再檢查一次未封存的資料，解析名單期間寫入的成績也不會被清除。
+    """
+    check_unarchived(discard_unarchived)
+    conn = db.get_db_connection()
+    conn.execute('ATTACH DATABASE ? AS staging', (staging_path,))
+    try:
+        with db.transaction():
+            # clear_students_data 已通知名單變動，commit 後快取與推播會一併更新
+            db.clear_students_data()
+            imported = conn.execute(
+                'INSERT INTO students (student_id, name, class_name, account) '
+                'SELECT student_id, name, class_name, account FROM staging.roster ORDER BY rowid').rowcount
+    finally:
+        conn.execute('DETACH DATABASE staging')
+    return imported
+
+
+def _import_chunks(chunks, job=None, discard_unarchived=False):
+    """ 驗證逐段讀入的名單並取代現有學生資料；名單有誤時資料不變 """
+    start = time.perf_counter()
+    check_unarchived(discard_unarchived)
+    staging_path = _new_staging_path()
+    try:
+        _, errors = stage_roster(chunks, staging_path, job)
+        imported = 0 if errors else _replace_roster(staging_path, discard_unarchived)
+    finally:
+        _remove_staging(staging_path)
+    return {'imported': imported, 'errors': errors, 'seconds': time.perf_counter() - start}
+
+
+def import_roster(df, job=None, discard_unarchived=False):
+    """
+    驗證已載入記憶體的名單並取代現有學生資料.
+    回傳 dict: {'imported': 筆數, 'errors': [(列號, 訊息), ...], 'seconds': 花費秒數}
+    匯入會清除成績與點名紀錄；仍有尚未封存的資料時拋出 UnarchivedDataError，
+    除非 discard_unarchived=True (不封存，直接清除)。
+    """
+    if job is not None:
+        job.progress(processed=0, total=len(df))
+    return _import_chunks([df.reset_index(drop=True)], job, discard_unarchived)
+
+
+def import_roster_file(filepath, job=None, chunk_size=CHUNK_SIZE, discard_unarchived=False):
+    """
+    以分段串流的方式匯入 .xlsx 或 .csv 名單，記憶體用量與檔案大小無關.
+    回傳值與 import_roster 相同。
+    """
+    start = time.perf_counter()
+    try:
+        if job is not None:
+            job.progress(processed=0, total=count_roster_rows(filepath))
+        result = _import_chunks(iter_roster_chunks(filepath, chunk_size), job, discard_unarchived)
+    except RosterError as e:
+        result = {'imported': 0, 'errors': e.errors}
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def parse_roster_file(filepath, staging_path, chunk_size=CHUNK_SIZE):
+    """
+    讀取並驗證整份名單，逐段寫入暫存資料庫檔案 (於行程池執行)，回傳 (已處理列數, 錯誤列表).
+    名單不經行程間傳遞，子行程與主行程的記憶體用量都與檔案大小無關；
+    RosterError 無法正確 pickle，因此錯誤一律以回傳值傳回。
+    """
+    try:
+        return stage_roster(iter_roster_chunks(filepath, chunk_size), staging_path)
+    except RosterError as e:
+        return 0, e.errors
+
+
+def run_import_job(job, filepath, discard_unarchived=False):
+    """
+    背景工作：匯入名單檔案.
+    大檔案在行程池解析與驗證，不與處理請求的執行緒搶 GIL；小檔案直接在工作執行緒串流匯入。
+    名單有誤時拋出 RosterError、有尚未封存的資料時拋出 UnarchivedDataError (工作狀態為失敗)，資料不會變更。
+    """
+    start = time.perf_counter()
+    check_unarchived(discard_unarchived)
+    job.progress(processed=0, total=count_roster_rows(filepath))
+    staging_path = _new_staging_path()
+    try:
+        if os.path.getsize(filepath) >= PROCESS_PARSE_MIN_BYTES:
+            job.progress(message='解析檔案中')
+            _, errors = job.wait(jobs.run_in_process(parse_roster_file, filepath, staging_path))
+        else:
+            _, errors = stage_roster(iter_roster_chunks(filepath, CHUNK_SIZE), staging_path, job)
+        if errors:
+            raise RosterError(errors)
+        job.check_cancelled()
+        job.progress(message='寫入資料庫中')
+        imported = _replace_roster(staging_path, discard_unarchived)
+    finally:
+        _remove_staging(staging_path)
+    seconds = time.perf_counter() - start
+    # 已經 commit，之後不再檢查取消
+    return {'imported': imported, 'seconds': round(seconds, 3),
+            'message': f'學生資料匯入成功！共 {imported} 筆，耗時 {seconds:.2f} 秒。'}
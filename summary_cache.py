@@ -0,0 +1,214 @@
+import threading
+import numpy as np
+import pandas as pd
+import database as db
+import grade_summary
+
+
+class _ColumnStats:
+    """ 每一欄的 筆數 / 總和 / 平方和，可在單格變動時以差值更新 """
+
+    def __init__(self, matrix):
+        present = ~np.isnan(matrix)
+        values = np.where(present, matrix, 0.0)
+        self.count = present.sum(axis=0).astype(float)
+        self.total = values.sum(axis=0)
+        self.squares = (values * values).sum(axis=0)
+
+    def replace(self, old_row, new_row):
+        """ 以一列的舊值與新值更新統計 """
+        for row, sign in ((old_row, -1.0), (new_row, 1.0)):
+            present = ~np.isnan(row)
+            values = np.where(present, row, 0.0)
+            self.count += sign * present
+            self.total += sign * values
+            self.squares += sign * values * values
+
+    def mean(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 0, self.total / self.count, np.nan)
+
+    def std(self):
+        """ 母體標準差 """
+        mean = self.mean()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = np.where(self.count > 0, self.squares / self.count - mean * mean, np.nan)
+        return np.sqrt(np.clip(variance, 0.0, None))
+
+
+class _ClassEntry:
+    """ 單一班級的快取：學生 × 項目的分數矩陣、各欄統計與整理好的輸出 """
+
+    def __init__(self, class_name, type_weights):
+        self.class_name = class_name
+        self.type_weights = type_weights
+        self.items = grade_summary.load_items()
+        self.students, raw = grade_summary.build_score_matrix(
+            db.get_class_grade_rows(class_name), list(self.items['id']))
+        self.raw = raw.to_numpy(dtype=float, copy=True)
+        self.plan = grade_summary.WeightPlan(self.items, type_weights)
+        self.scores, self.type_scores, self.semester = self.plan.apply(self.raw)
+        self.type_columns = self.plan.type_names
+        self.row_of = {student_db_id: row for row, student_db_id in enumerate(self.students.index)}
+        self.col_of = {item_id: col for col, item_id in enumerate(self.items['id'])}
+        self.item_stats = _ColumnStats(self.scores)
+        self.semester_stats = _ColumnStats(self.semester.reshape(-1, 1))
+        # 每次更新加一，用來判斷在鎖外整理好的輸出是否仍是最新的
+        self.version = 0
+        self.summary = None
+
+    def apply(self, row, col, score):
+        """ 更新單一格成績，只以 NumPy 重新計算該學生的加權成績並以差值調整統計 """
+        self.raw[row, col] = np.nan if score is None else score
+        scores, type_scores, semester = self.plan.apply(self.raw[row:row + 1])
+        self.item_stats.replace(self.scores[row], scores[0])
+        self.scores[row] = scores[0]
+        self.type_scores[row] = type_scores[0]
+        self.semester_stats.replace(self.semester[row:row + 1], semester)
+        self.semester[row] = semester[0]
+        self.version += 1
+        self.summary = None
+
+    def summary_args(self):
+        """ 複製目前的矩陣與統計 (需持有快取的鎖)，回傳 format_summary 的參數，之後可在鎖外整理輸出 """
+        index = self.students.index
+        item_ids = list(self.items['id'])
+        class_index = pd.Index([self.class_name])
+        class_stats = pd.DataFrame({
+            'mean': self.semester_stats.mean(),
+            'std': self.semester_stats.std(),
+            'count': self.semester_stats.count.copy(),
+        }, index=class_index)
+        return (
+            self.class_name, self.type_weights, self.items, self.students,
+            pd.DataFrame(self.scores, index=index, columns=item_ids, copy=True),
+            pd.DataFrame(self.type_scores, index=index, columns=self.type_columns, copy=True),
+            pd.Series(self.semester, index=index, copy=True),
+            class_stats,
+            pd.DataFrame([self.item_stats.mean()], index=class_index, columns=item_ids),
+            pd.DataFrame([self.item_stats.std()], index=class_index, columns=item_ids),
+        )
+
+
+class SummaryCache:
+    """
+    班級學期成績摘要的快取.
+    成績寫入後只更新受影響的學生與欄位統計；成績項目或學生名單變動時整個快取失效。
+    on_change 由寫入執行緒呼叫，因此讀取資料庫與整理輸出都在鎖外進行，鎖只保護快取內容的讀寫。
+    """
+
+    def __init__(self, type_weights=None):
+        self.type_weights = grade_summary.TYPE_WEIGHTS if type_weights is None else type_weights
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._class_of_student = {}
+        # 正在鎖外建立的快取 {token: 建立期間收到的成績變更}；名單或成績項目變動時改為 None (不放入快取)
+        self._building = {}
+        self.hits = 0
+        self.misses = 0
+        self.incremental_updates = 0
+        self.invalidations = 0
+
+    def get_summary(self, class_name):
+        """ 取得班級摘要，沒有快取時從資料庫計算 """
+        with self._lock:
+            entry = self._entries.get(class_name)
+            if entry is not None:
+                self.hits += 1
+                return self._summary_of(entry)
+            self.misses += 1
+            # 先登記再讀取資料庫：讀取之後才 commit 的成績變更會記在這裡，放入快取前補上
+            token = object()
+            self._building[token] = []
+        try:
+            entry = _ClassEntry(class_name, self.type_weights)
+        except BaseException:
+            with self._lock:
+                del self._building[token]
+            raise
+        with self._lock:
+            changes = self._building.pop(token)
+            # 不存在的班級、或建立期間名單與成績項目有變動時不放入快取
+            if changes is not None and entry.row_of and self._replay(entry, changes):
+                installed = self._entries.setdefault(class_name, entry)
+                if installed is entry:
+                    for student_db_id in entry.row_of:
+                        self._class_of_student[student_db_id] = class_name
+                entry = installed
+            return self._summary_of(entry)
+
+    @staticmethod
+    def _replay(entry, changes):
+        """ 補上建立期間收到的成績變更；有未知的成績項目時回傳 False (快取已過期) """
+        for student_db_id, item_id, score in changes:
+            row = entry.row_of.get(student_db_id)
+            if row is None:
+                continue
+            col = entry.col_of.get(item_id)
+            if col is None:
+                return False
+            entry.apply(row, col, score)
+        return True
+
+    def _summary_of(self, entry):
+        """
+        取得 entry 的輸出 (呼叫時需持有鎖).
+        需要重新整理時暫時釋放鎖：複製資料在鎖內，整理輸出在鎖外；期間資料又有變動時不保存結果。
+        """
+        if entry.summary is not None:
+            return entry.summary
+        version, args = entry.version, entry.summary_args()
+        self._lock.release()
+        try:
+            summary = grade_summary.format_summary(*args)
+        finally:
+            self._lock.acquire()
+        if entry.version == version:
+            entry.summary = summary
+        return summary
+
+    def invalidate(self):
+        """ 清除所有快取 """
+        with self._lock:
+            self._entries.clear()
+            self._class_of_student.clear()
+            for token in self._building:
+                self._building[token] = None
+            self.invalidations += 1
+
+    def on_change(self, event, payload):
+        """ database.py 的資料變更通知 """
+        if event == 'grades':
+            with self._lock:
+                for changes in self._building.values():
+                    if changes is not None:
+                        changes.extend(payload)
+                for student_db_id, item_id, score in payload:
+                    entry = self._entries.get(self._class_of_student.get(student_db_id))
+                    if entry is None:
+                        continue
+                    col = entry.col_of.get(item_id)
+                    if col is None:
+                        # 未知的成績項目，快取已過期
+                        del self._entries[entry.class_name]
+                        continue
+                    entry.apply(entry.row_of[student_db_id], col, score)
+                    self.incremental_updates += 1
+        elif event in ('students', 'grade_items'):
+            self.invalidate()
+
+    def stats(self):
+        """ 快取命中統計 """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'incremental_updates': self.incremental_updates,
+                'invalidations': self.invalidations,
+                'cached_classes': len(self._entries),
+            }
+
+
+# 應用程式共用的快取
+summary_cache = SummaryCache()
+db.add_change_listener(summary_cache.on_change)
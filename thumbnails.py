@@ -0,0 +1,131 @@
+import hashlib
+import os
+import sys
+import threading
+from PIL import Image, ImageOps, features
+
+# --- 縮圖設定 ---
+# 座位表卡片的大頭照顯示為 80px，128px 供一般螢幕使用，256px 供高解析度螢幕使用
+THUMBNAIL_SIZES = (128, 256)
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+WEBP_SUPPORTED = features.check('webp')
+
+
+def photo_version(source_path):
+    """
+    以來源檔案的修改時間與大小產生版本字串.
+    來源照片被替換時版本會改變，舊的快取與瀏覽器快取自然失效。
+    """
+    stat = os.stat(source_path)
+    return f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+
+def _cache_key(source_path, size, fmt):
+    """ 縮圖快取檔名：由來源路徑、版本、尺寸與格式雜湊而成 """
+    raw = f'{os.path.abspath(source_path)}|{photo_version(source_path)}|{size}|{fmt}'
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _render(source_path, size, fmt, target_path):
+    """ 產生正方形縮圖 (置中裁切，與 CSS 的 object-fit: cover 一致) 並原子性地寫入快取 """
+    with Image.open(source_path) as image:
+        # JPEG 可直接以縮小比例解碼，大幅減少大照片的解碼時間
+        image.draft('RGB', (size * 2, size * 2))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+
+    temp_path = f'{target_path}.{threading.get_ident()}.tmp'
+    if fmt == 'webp':
+        thumbnail.save(temp_path, 'WEBP', quality=WEBP_QUALITY, method=4)
+    else:
+        thumbnail.save(temp_path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    os.replace(temp_path, target_path)
+
+
+def get_thumbnail(source_path, size, cache_dir, fmt='jpeg'):
+    """
+    取得縮圖檔案路徑與 ETag，快取中沒有時才產生.
+    回傳 (縮圖路徑, etag)。
+    """
+    if size not in THUMBNAIL_SIZES:
+        raise ValueError(f'不支援的縮圖尺寸: {size}')
+    if fmt == 'webp' and not WEBP_SUPPORTED:
+        fmt = 'jpeg'
+
+    key = _cache_key(source_path, size, fmt)
+    target_path = os.path.join(cache_dir, f'{key}.{"webp" if fmt == "webp" else "jpg"}')
+    if not os.path.exists(target_path):
+        # 多個請求同時產生同一張縮圖也沒關係，暫存檔以 os.replace 原子性地覆蓋
+        os.makedirs(cache_dir, exist_ok=True)
+        _render(source_path, size, fmt, target_path)
+    return target_path, key
+
+
+def iter_photos(photo_dir):
+    """ 列出照片資料夾中的所有照片檔名 """
+    for filename in sorted(os.listdir(photo_dir)):
+        if os.path.splitext(filename)[1].lower() in PHOTO_EXTENSIONS:
+            yield filename
+
+
+def prewarm(photo_dir, cache_dir, verbose=True, job=None):
+    """
+    批次產生所有照片的各尺寸縮圖，並移除已失效的快取檔案.
+    回傳 (原始照片總位元組數, {尺寸: 縮圖總位元組數})。
+    job 為背景工作時每張照片回報一次進度；取消時中止，已產生的縮圖保留，不清除舊快取。
+    """
+    formats = ('jpeg', 'webp') if WEBP_SUPPORTED else ('jpeg',)
+    original_bytes = 0
+    thumbnail_bytes = {size: 0 for size in THUMBNAIL_SIZES}
+    in_use = set()
+    photos = list(iter_photos(photo_dir))
+
+    for index, filename in enumerate(photos, start=1):
+        source_path = os.path.join(photo_dir, filename)
+        original_bytes += os.path.getsize(source_path)
+        for size in THUMBNAIL_SIZES:
+            for fmt in formats:
+                path, _ = get_thumbnail(source_path, size, cache_dir, fmt)
+                in_use.add(os.path.basename(path))
+                if fmt == formats[-1]:
+                    thumbnail_bytes[size] += os.path.getsize(path)
+        if verbose and index % 50 == 0:
+            print(f'已處理 {index} / {len(photos)} 張照片')
+        if job is not None:
+            job.progress(processed=index, total=len(photos))
+
+    # 清除來源已變更或刪除的舊縮圖
+    removed = 0
+    if os.path.isdir(cache_dir):
+        for filename in os.listdir(cache_dir):
+            if filename not in in_use:
+                os.remove(os.path.join(cache_dir, filename))
+                removed += 1
+
+    if verbose:
+        print(f'共 {len(photos)} 張照片，清除 {removed} 個過期縮圖。')
+        print(f'原始照片: {original_bytes / 1024 / 1024:.1f} MB')
+        per_photo = original_bytes / max(len(photos), 1)
+        for size, total in thumbnail_bytes.items():
+            saved = per_photo - total / max(len(photos), 1)
+            print(f'{size}px 縮圖 ({formats[-1]}): {total / 1024 / 1024:.1f} MB，'
+                  f'每張節省 {saved / 1024:.0f} KB，36 人座位表每次載入約節省 {saved * 36 / 1024 / 1024:.1f} MB')
+    return original_bytes, thumbnail_bytes
+
+
+def run_prewarm_job(job, photo_dir, cache_dir):
+    """ 背景工作：批次產生縮圖 """
+    if not os.path.isdir(photo_dir):
+        return {'photos': 0, 'original_bytes': 0, 'thumbnail_bytes': {}}
+    original_bytes, thumbnail_bytes = prewarm(photo_dir, cache_dir, verbose=False, job=job)
+    return {'photos': job.processed, 'original_bytes': original_bytes, 'thumbnail_bytes': thumbnail_bytes}
+
+
+if __name__ == '__main__':
+    # 用法: python thumbnails.py [照片資料夾] [快取資料夾]
+    photo_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join('static', 'photos')
+    cache_dir = sys.argv[2] if len(sys.argv) > 2 else 'thumbnail_cache'
+    prewarm(photo_dir, cache_dir)